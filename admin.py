@@ -1,20 +1,48 @@
-from datetime import datetime
-from collections import defaultdict
-
+import os
+import sqlite3
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from archive import months_back
+from assignment import AssignmentEngine
+from bulk_import import PatientImporter
 from doctor import Doctor
+from instrumentation import add_rows, instrument_methods, instruments
+from loader import ENCODING, iter_patient_source
 from patient import Patient
+from schedule import WORKDAY_START, parse_time
+from sharing import ConflictError
 
 
 class Appointment:
     """Simple Appointment structure used for reports and GUI"""
 
-    def __init__(self, doctor: Doctor, patient: Patient, date):
+    __slots__ = ('doctor', 'patient', 'start', 'end')
+
+    DEFAULT_LENGTH = timedelta(minutes=30)
+
+    def __init__(self, doctor: Doctor, patient: Patient, start, end=None):
+        """
+        Args:
+            doctor (Doctor): the doctor
+            patient (Patient): the patient
+            start (datetime): start time; a plain date means the start of the working day
+            end (datetime, optional): end time. Defaults to DEFAULT_LENGTH after start
+        """
+        if not isinstance(start, datetime):
+            start = datetime.combine(start, WORKDAY_START)
         self.doctor = doctor
         self.patient = patient
-        self.date = date
+        self.start = start
+        self.end = end if end is not None else start + self.DEFAULT_LENGTH
+
+    @property
+    def date(self):
+        return self.start.date()
 
     def __str__(self):
-        return f"{self.date} | {self.doctor.full_name()} | {self.patient.full_name()}"
+        return (f"{self.date} {self.start:%H:%M}-{self.end:%H:%M} | "
+                f"{self.doctor.full_name()} | {self.patient.full_name()}")
 
 
 class Admin:
@@ -33,10 +61,11 @@ class Admin:
 
     # ---------- General / helper methods ----------
 
-    def view(self, a_list):
-        """Print a list of items with numeric IDs."""
-        for index, item in enumerate(a_list):
-            print(f'{index+1:3}|{item}')
+    def view(self, records):
+        """Print a mapping of ID -> item, one per line."""
+        for record_id, item in records.items():
+            print(f'{record_id:3}|{item}')
+        add_rows(len(records))
 
     def login(self):
         """Console login used in main.py."""
@@ -58,9 +87,41 @@ class Admin:
     def set_address(self, address):
         self.__address = address
 
-    def find_index(self, index, collection):
-        """Check if index is valid for a list/collection."""
-        return index in range(0, len(collection))
+    def read_id(self, prompt):
+        """Read a numeric record ID from the console, or None if it is not a number."""
+        try:
+            return int(input(prompt))
+        except ValueError:
+            return None
+
+    def read_ids(self, prompt, existing):
+        """Read several record IDs ("3, 7, 10-20"), or None if any part is not a number or range.
+
+        Ranges only cover the IDs in `existing`; single IDs are kept as typed.
+        """
+        ids = {}
+        known = None
+        for part in input(prompt).replace(',', ' ').split():
+            first, _, last = part.partition('-')
+            try:
+                first = int(first)
+                last = int(last) if last else None
+            except ValueError:
+                return None
+            if last is None:
+                ids[first] = None
+                continue
+            if last < first:
+                print(f"Range {first}-{last} is reversed; did you mean {last}-{first}?")
+                return None
+            if known is None:
+                known = sorted(existing)
+            matched = known[bisect_left(known, first):bisect_right(known, last)]
+            if not matched:
+                print(f"No records in range {first}-{last}.")
+            for record_id in matched:
+                ids[record_id] = None
+        return list(ids) or None
 
     # ---------- Doctor management ----------
 
@@ -71,7 +132,7 @@ class Admin:
         speciality = input("Enter Speciality: ")
         return first_name, surname, speciality
 
-    def doctor_management(self, doctors):
+    def doctor_management(self, store):
         """Registering, viewing, updating, deleting doctors (console menu)."""
         print("-----Doctor Management-----")
         print('Choose the operation:')
@@ -86,35 +147,29 @@ class Admin:
             print("-----Register-----")
             first_name, surname, speciality = self.get_doctor_details()
 
-            name_exists = False
-            for doctor in doctors:
-                if first_name == doctor.get_first_name() and surname == doctor.get_surname():
-                    print('Name already exists.')
-                    name_exists = True
-                    break
-
-            if not name_exists:
-                doctors.append(Doctor(first_name, surname, speciality))
+            if store.find_doctor_by_name(f"{first_name} {surname}") is not None:
+                print('Name already exists.')
+            else:
+                store.add_doctor(Doctor(first_name, surname, speciality))
                 print('Doctor registered.')
 
         elif op == '2':
             print("-----List of Doctors-----")
             print('ID |          Full name            |  Speciality')
-            self.view(doctors)
+            self.view(store.doctor_items())
 
         elif op == '3':
             while True:
                 print("-----Update Doctor`s Details-----")
                 print('ID |          Full name            |  Speciality')
-                self.view(doctors)
-                try:
-                    index = int(input('Enter the ID of the doctor: ')) - 1
-                    if self.find_index(index, doctors):
-                        break
-                    else:
-                        print("Doctor not found")
-                except ValueError:
+                self.view(store.doctor_items())
+                doctor_id = self.read_id('Enter the ID of the doctor: ')
+                if doctor_id is None:
                     print('The ID entered is incorrect')
+                elif store.get_doctor(doctor_id) is not None:
+                    break
+                else:
+                    print("Doctor not found")
 
             print('Choose the field to be updated:')
             print(' 1 First name')
@@ -122,16 +177,15 @@ class Admin:
             print(' 3 Speciality')
             try:
                 op = int(input('Input: '))
-                doctor = doctors[index]
                 if op == 1:
                     new_first_name = input("Enter new first name: ")
-                    doctor.set_first_name(new_first_name)
+                    store.update_doctor(doctor_id, first_name=new_first_name)
                 elif op == 2:
                     new_surname = input("Enter new surname: ")
-                    doctor.set_surname(new_surname)
+                    store.update_doctor(doctor_id, surname=new_surname)
                 elif op == 3:
                     new_spec = input("Enter new speciality: ")
-                    doctor.set_speciality(new_spec)
+                    store.update_doctor(doctor_id, speciality=new_spec)
                 else:
                     print("Invalid selection")
             except ValueError:
@@ -140,17 +194,15 @@ class Admin:
         elif op == '4':
             print("-----Delete Doctor-----")
             print('ID |          Full Name            |  Speciality')
-            self.view(doctors)
+            self.view(store.doctor_items())
 
-            try:
-                doctor_index = int(input('Enter the ID of the doctor to be deleted: ')) - 1
-                if self.find_index(doctor_index, doctors):
-                    doctors.pop(doctor_index)
-                    print("Doctor deleted.")
-                else:
-                    print("Doctor not found.")
-            except ValueError:
+            doctor_id = self.read_id('Enter the ID of the doctor to be deleted: ')
+            if doctor_id is None:
                 print('The id entered is incorrect')
+            elif store.remove_doctor(doctor_id) is not None:
+                print("Doctor deleted.")
+            else:
+                print("Doctor not found.")
 
         else:
             print('Invalid operation chosen. Check your spelling!')
@@ -158,70 +210,142 @@ class Admin:
     # ---------- Patient viewing / assigning ----------
 
     def view_patient(self, patients):
-        """Print a list of patients (console)."""
+        """Print a mapping of patient ID -> patient (console)."""
         print("-----View Patients-----")
         print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode ')
         self.view(patients)
 
-    def assign_doctor_to_patient(self, patients, doctors):
+    def search_patients(self, store):
+        """Find active patients by name, mobile, postcode or symptom (console)."""
+        print("-----Search Patients-----")
+        query = input('Search for: ').strip()
+        if not query:
+            return
+        results = store.search_patients(query)
+        if not results:
+            print('No matching patients.')
+            return
+        self.view_patient({patient_id: store.get_patient(patient_id) for patient_id in results})
+
+    def assign_doctor_to_patient(self, store):
         """Allow the admin to assign a doctor to a patient (console)."""
         print("-----Assign-----")
         print("-----Patients-----")
         print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode ')
-        self.view(patients)
+        self.view(store.patient_items())
 
-        try:
-            patient_index = int(input('Please enter the patient ID: ')) - 1
-            if patient_index not in range(len(patients)):
-                print('The id entered was not found.')
-                return
-        except ValueError:
+        patient_id = self.read_id('Please enter the patient ID: ')
+        if patient_id is None:
             print('The id entered is incorrect')
             return
+        patient = store.get_patient(patient_id)
+        if patient is None:
+            print('The id entered was not found.')
+            return
+        # another process may change the patient while the doctor is being picked
+        version = store.version('patient', patient_id)
 
         print("-----Doctors Select-----")
         print('Select the doctor that fits these symptoms:')
-        patients[patient_index].print_symptoms()
+        patient.print_symptoms()
+        matches = store.matching_specialities(patient_id)
+        if matches:
+            print('Specialities treating these symptoms: '
+                  + ', '.join(f'{speciality} ({count})' for speciality, count in matches.items()))
         print('--------------------------------------------------')
         print('ID |          Full Name            |  Speciality   ')
-        self.view(doctors)
+        self.view(store.doctor_items())
 
-        try:
-            doctor_index = int(input('Please enter the doctor ID: ')) - 1
-            if self.find_index(doctor_index, doctors):
-                doctor = doctors[doctor_index]
-                patient = patients[patient_index]
-                doctor.add_patient(patient)
-                patient.link(doctor.full_name())
-                print('The patient is now assigned to the doctor.')
-            else:
-                print('The id entered was not found.')
-        except ValueError:
+        doctor_id = self.read_id('Please enter the doctor ID: ')
+        if doctor_id is None:
             print('The id entered is incorrect')
+            return
+        try:
+            with store.transaction([('patient', patient_id, version)]):
+                assigned = store.assign_patient(patient_id, doctor_id)
+        except ConflictError:
+            print('The patient was changed by another user in the meantime. Please try again.')
+            return
+        if assigned:
+            print('The patient is now assigned to the doctor.')
+        else:
+            print('The id entered was not found.')
+
+    def auto_assign(self, store):
+        """Assign every patient without a doctor automatically, after showing the plan."""
+        print("-----Automatic Assignment-----")
+        plan = AssignmentEngine(store).plan()
+        if not plan:
+            print('Every patient already has a doctor.' if store.doctor_items()
+                  else 'There are no doctors to assign patients to.')
+            return
+        print(f'{len(plan)} patient(s) would be assigned:')
+        print(plan.preview(limit=50), end='')
+        if input('Make these assignments? (Y/N): ').lower() not in ('yes', 'y'):
+            print('Nothing was assigned.')
+            return
+        try:
+            assigned = plan.apply()
+        except ConflictError:
+            print('Patients were changed by another user in the meantime. Please try again.')
+            return
+        print(f'{assigned} patient(s) assigned.')
 
     # ---------- Discharge & discharged list ----------
 
-    def discharge(self, patients, discharge_patients):
+    def discharge(self, store):
         """Allow the admin to discharge a patient when treatment is done."""
         print("-----Discharge Patient-----")
-        self.view_patient(patients)
+        self.view_patient(store.patient_items())
 
-        try:
-            patient_index = int(input('Please enter the patient ID: ')) - 1
-            if patient_index in range(len(patients)):
-                p = patients.pop(patient_index)
-                discharge_patients.append(p)
-                print("Patient Discharged.")
-            else:
-                print("Patient not found.")
-        except ValueError:
+        patient_ids = self.read_ids('Please enter the patient ID(s), e.g. 3 or 3, 7, 10-20: ',
+                                    store.patient_items())
+        if patient_ids is None:
             print("Invalid ID")
+            return
+        discharged = store.discharge_patients(patient_ids)
+        if len(patient_ids) == 1:
+            print("Patient Discharged." if discharged else "Patient not found.")
+            return
+        print(f"{len(discharged)} patient(s) discharged.")
+        if len(discharged) < len(patient_ids):
+            missing = sorted(set(patient_ids) - set(discharged))
+            print(f"Not found: {', '.join(map(str, missing))}")
 
-    def view_discharge(self, discharged_patients):
-        """Prints the list of all discharged patients."""
+    def view_discharge(self, store):
+        """Prints the discharged patients: archived months on request, then those not archived yet."""
         print("-----Discharged Patients-----")
-        print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode ')
-        self.view(discharged_patients)
+        archive = store.archive
+        if archive is None:
+            print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode ')
+            self.view(store.discharged_items())
+            return
+
+        months = archive.months()
+        since = until = None
+        if months:
+            print(f'Archived discharges from {months[0]} to {months[-1]}.')
+            answer = input('Months to show (YYYY-MM, or YYYY-MM:YYYY-MM; Enter for recent only): ').strip()
+            if answer:
+                since, _, until = answer.partition(':')
+                since, until = since.strip(), until.strip() or since.strip()
+        self.print_discharged(store, since, until)
+
+    def print_discharged(self, store, since=None, until=None):
+        """Prints the patients archived in the months since..until (none without `since`), then the rest."""
+        archive = store.archive
+        print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode '
+              '| Discharged')
+        rows = 0
+        if since:
+            # streamed from the partitions asked for only
+            for patient_id, patient, at in archive.patients(since, until):
+                print(f'{patient_id:3}|{patient}| {at or "unknown"}')
+                rows += 1
+        for patient_id, patient in store.unarchived_items().items():
+            print(f'{patient_id:3}|{patient}| {store.discharged_at(patient_id) or "unknown"}')
+            rows += 1
+        add_rows(rows)
 
     # ---------- Admin details ----------
 
@@ -256,48 +380,59 @@ class Admin:
 
     # ---------- Relocate patient ----------
 
-    def relocate_patient(self, patients, doctors):
+    def relocate_patient(self, store):
         """Relocating patients from one doctor to another."""
         print("-----Relocate Patient-----")
-        print("Select Patient to Relocate:")
-        self.view_patient(patients)
+        print("Select Patient(s) to Relocate:")
+        self.view_patient(store.patient_items())
 
-        try:
-            p_index = int(input("Enter Patient ID: ")) - 1
-            if p_index not in range(len(patients)):
-                print("Patient not found.")
-                return
-            patient = patients[p_index]
-
-            print("Select New Doctor:")
-            print('ID |          Full Name            |  Speciality   ')
-            self.view(doctors)
-            d_index = int(input("Enter New Doctor ID: ")) - 1
-
-            if self.find_index(d_index, doctors):
-                new_doctor = doctors[d_index]
-                # remove patient from any current doctor
-                for doc in doctors:
-                    doc.remove_patient(patient)
-                new_doctor.add_patient(patient)
-                patient.link(new_doctor.full_name())
-                print("Patient Relocated Successfully.")
-            else:
-                print("Doctor not found.")
-        except ValueError:
+        patient_ids = self.read_ids("Enter Patient ID(s), e.g. 3 or 3, 7, 10-20: ", store.patient_items())
+        if patient_ids is None:
+            print("Invalid Input")
+            return
+        missing = [i for i in patient_ids if store.get_patient(i) is None]
+        if missing:
+            print(f"Patient not found: {', '.join(map(str, missing))}")
+            return
+        # another process may change the patients while the doctor is being picked
+        expect = [('patient', i, store.version('patient', i)) for i in patient_ids]
+
+        print("Select New Doctor:")
+        print('ID |          Full Name            |  Speciality   ')
+        self.view(store.doctor_items())
+        doctor_id = self.read_id("Enter New Doctor ID: ")
+
+        if doctor_id is None:
             print("Invalid Input")
+            return
+        try:
+            with store.transaction(expect):
+                relocated = store.assign_patients(patient_ids, doctor_id)
+        except ConflictError:
+            print("A patient was changed by another user in the meantime. Please try again.")
+            return
+        if not relocated:
+            print("Doctor not found.")
+        elif len(relocated) == 1:
+            print("Patient Relocated Successfully.")
+        else:
+            print(f"{len(relocated)} Patients Relocated Successfully.")
 
     # ---------- Management report ----------
 
-    def management_report(self, doctors, patients, appointments):
+    def management_report(self, store):
         """
         Management Report (console):
         1) Total doctors
         2) Patients per doctor
         3) Appointments per month per doctor
         4) Patients by illness type
+        5) Appointments by weekday
+        6) Discharges per month
         """
         print("-----Management Report-----")
+        doctors = store.doctors()
+        report = store.report
 
         # 1. Total number of doctors
         print(f"1. Total Doctors: {len(doctors)}")
@@ -310,13 +445,9 @@ class Admin:
 
         # 3. Total number of appointments per month per doctor
         print("3. Appointments per Month per Doctor:")
-        appts_per_month = defaultdict(lambda: defaultdict(int))
-        for appt in appointments:
-            doctor_name = appt.doctor.full_name()
-            ym = appt.date.strftime("%Y-%m")
-            appts_per_month[doctor_name][ym] += 1
+        appts_per_month = report.appointments_per_month()
 
-        if not appointments:
+        if not report.appointment_total():
             print("   No appointments have been scheduled yet.")
         else:
             for doctor_name, months in appts_per_month.items():
@@ -327,10 +458,7 @@ class Admin:
 
         # 4. Total number of patients based on illness type (symptoms)
         print("4. Patients by Illness Type:")
-        illness_count = defaultdict(int)
-        for p in patients:
-            for s in p.get_symptoms():
-                illness_count[s] += 1
+        illness_count = report.illness_count()
 
         if not illness_count:
             print("   No symptoms/illness data recorded yet.")
@@ -339,54 +467,61 @@ class Admin:
                 print(f"   - {illness}: {count} patient(s)")
         print()
 
+        # 5. Appointments by weekday, over the full history
+        if report.appointment_total():
+            print("5. Appointments by Weekday:")
+            weekdays = report.appointments_per_weekday()
+            print("   " + "  ".join(f"{day}: {count}" for day, count in weekdays.items()))
+            print()
+
+        # 6. Discharges over the last year; older archive partitions are not read
+        discharges = store.discharges_per_month(since=months_back(11))
+        if discharges:
+            print("6. Discharges per Month (last 12 months):")
+            for month, count in discharges.items():
+                print(f"   {month or 'unknown'}: {count} patient(s)")
+            print()
+
         return illness_count, appts_per_month
 
     # ---------- File save/load ----------
 
     def save_patients_to_file(self, patients, filename='patients.txt'):
-        """Save all patient data to a file."""
+        """Save all patient data to a file.
+
+        Writes to a temporary file first and renames it over `filename`, so a
+        crash mid-save never leaves a half-written file behind.
+        """
         try:
-            with open(filename, 'w') as f:
+            tmp_name = filename + '.tmp'
+            rows = 0
+            with open(tmp_name, 'w', encoding=ENCODING) as f:
                 for p in patients:
                     symptoms_str = ";".join(p.get_symptoms())
                     line = f"{p.get_first_name()},{p.get_surname()},{p.get_age()},{p.get_mobile()},{p.get_postcode()},{p.get_doctor()},{symptoms_str}\n"
                     f.write(line)
+                    rows += 1
+            os.replace(tmp_name, filename)
+            add_rows(rows)
             print("Data Saved Successfully.")
         except Exception as e:
             print(f"Error saving file: {e}")
 
+    def iter_patients_from_file(self, filename='patients.txt', workers=None):
+        """Yield patients from a file, or a directory of shard files, as they are parsed.
+
+        Large inputs are parsed by `workers` processes (default: one per core).
+        Raises FileNotFoundError when the file does not exist.
+        """
+        return iter_patient_source(filename, workers)
+
     def load_patients_from_file(self, filename='patients.txt'):
         """Load patient data from a file."""
         loaded_patients = []
         try:
-            with open(filename, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    parts = line.split(',')
-                    if len(parts) < 6:
-                        continue
-                    first_name, surname, age_str, mobile, postcode, doctor_name = parts[:6]
-                    symptoms_str = ",".join(parts[6:])  # in case there are extra commas
-
-                    try:
-                        age = int(age_str)
-                    except ValueError:
-                        age = 0
-
-                    patient = Patient(first_name, surname, age, mobile, postcode)
-
-                    if doctor_name and doctor_name != 'None':
-                        patient.link(doctor_name)
-
-                    if symptoms_str:
-                        for symptom in symptoms_str.split(';'):
-                            symptom = symptom.strip()
-                            if symptom:
-                                patient.add_symptom(symptom)
-
-                    loaded_patients.append(patient)
+            for patient in self.iter_patients_from_file(filename):
+                loaded_patients.append(patient)
+            add_rows(len(loaded_patients))
             print("Data Loaded.")
         except FileNotFoundError:
             print("No save file found.")
@@ -394,62 +529,81 @@ class Admin:
             print(f"Error loading file: {e}")
         return loaded_patients
 
+    def import_patients(self, store):
+        """Bulk import patients from a CSV or JSONL file (console)."""
+        print("-----Import Patients-----")
+        filename = input('File to import (.csv or .jsonl): ').strip()
+        if not filename:
+            return
+        importer = PatientImporter(store)
+        try:
+            summary = importer.run(filename)
+        except FileNotFoundError:
+            print('File not found.')
+            return
+        except (OSError, sqlite3.Error) as e:
+            print(f'Import stopped: {e}')
+            summary = importer.summary
+        print(summary)
+        if summary.rejected:
+            print(f'Rejected rows were written to {importer.rejects_filename}')
+
     # ---------- Grouping by surname ----------
 
-    def view_patients_by_surname(self, patients):
+    def view_patients_by_surname(self, store):
         """View patients grouped by family (surname) in the console."""
         print("-----Patients Grouped by Surname (Family)-----")
-        if not patients:
+        surnames = store.family_surnames()
+        if not surnames:
             print("No patients to display.")
             return
 
-        families = defaultdict(list)
-        for p in patients:
-            families[p.get_surname()].append(p)
-
-        for surname, members in families.items():
+        for surname in surnames:
             print(f"\nFamily: {surname}")
             print('ID |          Full Name            |      Doctor`s Full Name       | Age |    Mobile     | Postcode ')
-            for idx, patient in enumerate(members, start=1):
-                print(f"{idx:3}|{patient}")
+            print(store.family_block(surname, self.family_lines), end='')
+            add_rows(store.family_size(surname))
         print()
 
+    @staticmethod
+    def family_lines(surname, members):
+        """The console lines for one family (memoised by the store, see family_block)."""
+        return "".join(f"{idx:3}|{patient}\n" for idx, patient in enumerate(members, start=1))
+
     # ---------- Schedule appointment (console) ----------
 
-    def schedule_appointment(self, doctors, patients, appointments):
+    def schedule_appointment(self, store):
         """Create a new appointment between a doctor and a patient (console)."""
         print("-----Schedule Appointment-----")
-        if not doctors:
+        if not store.doctor_items():
             print("No doctors available.")
             return
-        if not patients:
+        if not store.patient_items():
             print("No patients available.")
             return
 
         print("Select Patient:")
-        self.view_patient(patients)
-        try:
-            p_index = int(input("Enter Patient ID: ")) - 1
-            if p_index not in range(len(patients)):
-                print("Patient not found.")
-                return
-        except ValueError:
+        self.view_patient(store.patient_items())
+        patient_id = self.read_id("Enter Patient ID: ")
+        if patient_id is None:
             print("Invalid input.")
             return
-        patient = patients[p_index]
+        patient = store.get_patient(patient_id)
+        if patient is None:
+            print("Patient not found.")
+            return
 
         print("Select Doctor:")
         print('ID |          Full Name            |  Speciality   ')
-        self.view(doctors)
-        try:
-            d_index = int(input("Enter Doctor ID: ")) - 1
-            if d_index not in range(len(doctors)):
-                print("Doctor not found.")
-                return
-        except ValueError:
+        self.view(store.doctor_items())
+        doctor_id = self.read_id("Enter Doctor ID: ")
+        if doctor_id is None:
             print("Invalid input.")
             return
-        doctor = doctors[d_index]
+        doctor = store.get_doctor(doctor_id)
+        if doctor is None:
+            print("Doctor not found.")
+            return
 
         date_str = input("Enter appointment date (YYYY-MM-DD): ")
         try:
@@ -458,9 +612,48 @@ class Admin:
             print("Invalid date format. Use YYYY-MM-DD.")
             return
 
-        appointment = Appointment(doctor, patient, date_obj)
-        appointments.append(appointment)
-        doctor.add_appointment(appointment)
+        print(f"Free slots for {doctor.full_name()} on {date_obj}:")
+        for slot_start, slot_end in store.free_slots(doctor_id, date_obj):
+            print(f"   {slot_start:%H:%M}-{slot_end:%H:%M}")
+
+        try:
+            start_time = parse_time(input("Enter start time (HH:MM): "))
+            length_str = input("Enter length in minutes [30]: ").strip()
+            length = int(length_str) if length_str else 30
+            if length <= 0:
+                raise ValueError
+        except ValueError:
+            print("Invalid time or length.")
+            return
+
+        start = datetime.combine(date_obj, start_time)
+        appointment = Appointment(doctor, patient, start, start + timedelta(minutes=length))
+        if store.add_appointment(appointment) is None:
+            print("That time clashes with an existing appointment:")
+            print(store.find_conflict(doctor, patient, appointment.start, appointment.end))
+            return
         print("Appointment scheduled:")
         print(appointment)
 
+    # ---------- Diagnostics ----------
+
+    def diagnostics(self):
+        """Print the operation timings (set HOSPITAL_PROFILE=1 to collect them)."""
+        print("-----Diagnostics-----")
+        print(instruments.report())
+        if instruments.profiler is not None:
+            filename = input('Save the cProfile data to (blank to skip): ').strip()
+            if filename:
+                try:
+                    instruments.dump_profile(filename)
+                except OSError as e:
+                    print(f'Error saving profile: {e}')
+                    return
+                print(f'Profile written to {filename}.')
+
+
+# timed when HOSPITAL_PROFILE is set; the menu operations that wait on input() are left out
+# so prompt time does not swamp the figures (their work shows up in view/report/save)
+instrument_methods(Admin, 'admin', names=(
+    'view', 'view_patient', 'print_discharged', 'management_report', 'save_patients_to_file',
+    'load_patients_from_file', 'view_patients_by_surname'))
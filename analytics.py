@@ -0,0 +1,141 @@
+from array import array
+from collections import Counter
+from datetime import date
+
+from symptoms import normalize_symptom
+
+try:
+    import numpy as np
+except ImportError:  # everything below has a pure-Python path
+    np = None
+
+
+# date.toordinal() of 1970-01-01, the zero of numpy's datetime64
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+class ReportEngine:
+    """Report counts over integer columns, vectorised with NumPy when it is installed.
+
+    Built from the full history by from_store(); the everyday report is ReportAggregator.
+    """
+
+    def __init__(self, use_numpy=True):
+        self.use_numpy = use_numpy and np is not None
+        self.doctor_names = {}  # doctor ID -> name
+        self.appt_doctor = array('i')
+        self.appt_day = array('i')
+        self.appt_minute = array('i')
+        self.symptom_codes = {}  # normalized symptom -> code
+        self.symptoms = []       # code -> symptom
+        self.symptom_patient = array('i')
+        self.symptom_code = array('i')
+
+    @classmethod
+    def from_store(cls, store, use_numpy=True):
+        """Copy the store's appointments and active patients' symptoms into columns."""
+        engine = cls(use_numpy)
+        doctor_id_of = {}
+        for doctor_id, doctor in store.doctor_items().items():
+            engine.doctor_names[doctor_id] = doctor.full_name()
+            doctor_id_of[doctor] = doctor_id
+
+        # removed doctors keep their appointments; give them IDs past the live ones
+        next_id = max(engine.doctor_names, default=0) + 1
+        for a in store.appointment_items().values():
+            doctor_id = doctor_id_of.get(a.doctor)
+            if doctor_id is None:
+                doctor_id = doctor_id_of[a.doctor] = next_id
+                engine.doctor_names[next_id] = a.doctor.full_name()
+                next_id += 1
+            engine.appt_doctor.append(doctor_id)
+            engine.appt_day.append(a.start.toordinal())
+            engine.appt_minute.append(a.start.hour * 60 + a.start.minute)
+
+        # counted like symptoms.SymptomIndex: by normalized symptom, once per patient
+        codes = engine.symptom_codes
+        for row, patient in enumerate(store.patient_items().values()):
+            seen = set()
+            for symptom in patient.get_symptoms():
+                key = normalize_symptom(symptom)
+                code = codes.get(key)
+                if code is None:
+                    if not key:
+                        continue
+                    code = codes[key] = len(engine.symptoms)
+                    engine.symptoms.append(' '.join(symptom.split()))
+                if code not in seen:
+                    seen.add(code)
+                    engine.symptom_patient.append(row)
+                    engine.symptom_code.append(code)
+        return engine
+
+    # ---------- appointments ----------
+
+    def appointments_per_month(self):
+        """Doctor name -> {"YYYY-MM": count}, doctors and months in ascending order."""
+        if not self.appt_day:
+            return {}
+        if self.use_numpy:
+            doctors = np.frombuffer(self.appt_doctor, dtype=np.int32).astype(np.int64)
+            days = np.frombuffer(self.appt_day, dtype=np.int32).astype(np.int64) - UNIX_EPOCH_ORDINAL
+            months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            month_base = months.min()
+            # one integer per (doctor, month) so a single unique() does the grouping
+            keys, counts = np.unique((doctors << 32) | (months - month_base), return_counts=True)
+            grouped = []
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                # months since 1970-01 back to (year, month)
+                years, month = divmod((key & 0xFFFFFFFF) + int(month_base), 12)
+                grouped.append((key >> 32, (1970 + years, month + 1), count))
+        else:
+            month_of = {}
+            counter = Counter()
+            for doctor_id, day in zip(self.appt_doctor, self.appt_day):
+                month = month_of.get(day)
+                if month is None:
+                    d = date.fromordinal(day)
+                    month = month_of[day] = (d.year, d.month)
+                counter[doctor_id, month] += 1
+            grouped = ((doctor_id, month, counter[doctor_id, month]) for doctor_id, month in sorted(counter))
+
+        result = {}
+        for doctor_id, (year, month), count in grouped:
+            months = result.setdefault(self.doctor_names[doctor_id], {})
+            key = f"{year:04d}-{month:02d}"
+            months[key] = months.get(key, 0) + count
+        return result
+
+    def histogram(self, by='weekday'):
+        """Appointment counts by 'weekday' (Mon..Sun) or 'hour' (0..23)."""
+        if by == 'weekday':
+            # ordinal 1 (0001-01-01) was a Monday
+            column, size, labels = self.appt_day, 7, WEEKDAYS
+            key = lambda values: (values - 1) % 7
+        elif by == 'hour':
+            column, size, labels = self.appt_minute, 24, range(24)
+            key = lambda values: values // 60
+        else:
+            raise ValueError(f"unknown histogram {by!r}")
+        if self.use_numpy:
+            values = np.frombuffer(column, dtype=np.int32)
+            counts = np.bincount(key(values), minlength=size).tolist()
+        else:
+            counter = Counter(key(v) for v in column)
+            counts = [counter[i] for i in range(size)]
+        return dict(zip(labels, counts))
+
+    # ---------- symptoms ----------
+
+    def illness_count(self):
+        """Symptom -> number of active patients reporting it."""
+        if not self.symptom_code:
+            return {}
+        if self.use_numpy:
+            counts = np.bincount(np.frombuffer(self.symptom_code, dtype=np.int32),
+                                 minlength=len(self.symptoms)).tolist()
+        else:
+            counter = Counter(self.symptom_code)
+            counts = [counter[code] for code in range(len(self.symptoms))]
+        return {symptom: count for symptom, count in zip(self.symptoms, counts) if count}
@@ -0,0 +1,150 @@
+import contextlib
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+from loader import patient_from_record, patient_record
+
+
+def month_of(moment):
+    """"YYYY-MM" of a date or datetime."""
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def months_back(count, today=None):
+    """"YYYY-MM" of the month `count` months before today's."""
+    today = today or date.today()
+    years, month = divmod(today.year * 12 + today.month - 1 - count, 12)
+    return f"{years:04d}-{month + 1:02d}"
+
+
+class DischargeArchive:
+    """Append-only history of discharged patients, one JSON-lines file per month.
+
+    Past months are gzipped; `archived.seq` is the last journal record archived.
+    """
+
+    PLAIN = '.jsonl'
+    COMPRESSED = '.jsonl.gz'
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (string): where the partitions live (created on the first write)
+        """
+        self.directory = directory
+        self.seq_path = os.path.join(directory, 'archived.seq')
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def _path(self, month, compressed):
+        return os.path.join(self.directory, month + (self.COMPRESSED if compressed else self.PLAIN))
+
+    def months(self):
+        """The archived months, oldest first."""
+        months = set()
+        with contextlib.suppress(FileNotFoundError):
+            for name in os.listdir(self.directory):
+                for suffix in (self.COMPRESSED, self.PLAIN):
+                    if name.endswith(suffix):
+                        months.add(name[:-len(suffix)])
+                        break
+        return sorted(months)
+
+    def last_seq(self):
+        """The last journal record whose discharge has been archived (0 if none)."""
+        try:
+            with open(self.seq_path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    # ---------- writing ----------
+
+    def append(self, rows, seq=None):
+        """Archive (patient_id, patient, discharged_at) rows; `seq` is the journal record they go up to.
+
+        A discharge time of None (a patient discharged before the archive
+        existed) is filed under the current month.
+        """
+        by_month = {}
+        now = datetime.now()
+        for patient_id, patient, at in rows:
+            record = dict(patient_record(patient), id=patient_id,
+                          discharged=at.isoformat(timespec='seconds') if at is not None else None)
+            line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+            by_month.setdefault(month_of(at or now), []).append(line)
+        os.makedirs(self.directory, exist_ok=True)
+        for month, lines in sorted(by_month.items()):
+            compressed = os.path.exists(self._path(month, True))
+            opener = gzip.open if compressed else open
+            with opener(self._path(month, compressed), 'ab') as f:
+                f.write(b''.join(lines))
+                f.flush()
+                if not compressed:
+                    os.fsync(f.fileno())
+        if seq is not None and seq > self.last_seq():
+            tmp_name = self.seq_path + '.tmp'
+            with open(tmp_name, 'w') as f:
+                f.write(f"{seq}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, self.seq_path)
+
+    def compress_old(self, today=None):
+        """Gzip the partitions of months before the current one; returns the months compressed."""
+        current = month_of(today or date.today())
+        done = []
+        for month in self.months():
+            plain = self._path(month, False)
+            if month >= current or not os.path.exists(plain):
+                continue
+            target = self._path(month, True)
+            tmp_name = target + '.tmp'
+            with open(plain, 'rb') as src, gzip.open(tmp_name, 'wb') as dst:
+                if os.path.exists(target):  # records already compressed for that month go first
+                    with gzip.open(target, 'rb') as old:
+                        dst.writelines(old)
+                dst.writelines(src)
+            os.replace(tmp_name, target)
+            os.remove(plain)
+            done.append(month)
+        return done
+
+    # ---------- reading ----------
+
+    def records(self, since=None, until=None):
+        """Archived records discharged in the months since..until ("YYYY-MM", inclusive), oldest first."""
+        seen = set()
+        for month in self.months():
+            if (since is not None and month < since) or (until is not None and month > until):
+                continue
+            for compressed in (True, False):
+                path = self._path(month, compressed)
+                with contextlib.suppress(FileNotFoundError), \
+                        (gzip.open if compressed else open)(path, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # a write cut short by a crash
+                        if record['id'] not in seen:
+                            seen.add(record['id'])
+                            yield record
+
+    def patients(self, since=None, until=None):
+        """(patient_id, Patient, discharged_at or None) for the archived records, see records()."""
+        for record in self.records(since, until):
+            at = record['discharged']
+            yield record['id'], patient_from_record(record), datetime.fromisoformat(at) if at else None
+
+    def discharges_per_month(self, since=None, until=None):
+        """"YYYY-MM" -> patients discharged that month, for the months since..until."""
+        counts = {}
+        for record in self.records(since, until):
+            at = record['discharged']
+            month = at[:7] if at else None
+            counts[month] = counts.get(month, 0) + 1
+        return counts
@@ -0,0 +1,165 @@
+import heapq
+
+from symptoms import normalize_symptom
+
+
+# symptom -> speciality that usually treats it; the store's own history
+# (which specialities look after patients with the symptom) decides the rest
+SPECIALITY_FOR_SYMPTOM = {
+    'chest pain': 'Cardiology', 'palpitations': 'Cardiology',
+    'headache': 'Neurology', 'dizziness': 'Neurology', 'blurred vision': 'Neurology',
+    'cough': 'Respiratory', 'shortness of breath': 'Respiratory', 'sore throat': 'Respiratory',
+    'rash': 'Dermatology',
+    'back pain': 'Orthopaedics', 'joint pain': 'Orthopaedics',
+    'fever': 'General Practice', 'fatigue': 'General Practice', 'nausea': 'General Practice',
+    'insomnia': 'General Practice', 'abdominal pain': 'General Practice',
+}
+
+
+class Proposal:
+    """One planned assignment (see AssignmentEngine.plan)."""
+
+    __slots__ = ('patient_id', 'doctor_id', 'speciality', 'reason')
+
+    def __init__(self, patient_id, doctor_id, speciality, reason):
+        self.patient_id = patient_id
+        self.doctor_id = doctor_id
+        self.speciality = speciality
+        self.reason = reason
+
+
+class AssignmentPlan:
+    """Assignments worked out by AssignmentEngine, not yet made."""
+
+    def __init__(self, store, proposals, loads, versions):
+        self.store = store
+        self.proposals = proposals
+        # doctor ID -> (patients before, patients after)
+        self.loads = loads
+        self.__versions = versions
+
+    def __len__(self):
+        return len(self.proposals)
+
+    def preview(self, limit=None):
+        """The plan as text: one line per assignment, then each doctor's patient count before -> after."""
+        store = self.store
+        lines = []
+        for proposal in self.proposals[:limit]:
+            patient = store.get_patient(proposal.patient_id)
+            doctor = store.get_doctor(proposal.doctor_id)
+            symptoms = ', '.join(patient.get_symptoms()) or 'no symptoms'
+            lines.append(f"  + {patient.full_name()} [{symptoms}] -> {doctor.full_name()} "
+                         f"({doctor.get_speciality()}; {proposal.reason})\n")
+        if limit is not None and len(self.proposals) > limit:
+            lines.append(f"  ... and {len(self.proposals) - limit} more\n")
+        lines.append("Patients per doctor:\n")
+        for doctor_id, (before, after) in self.loads.items():
+            doctor = store.get_doctor(doctor_id)
+            lines.append(f"  {doctor.full_name()} ({doctor.get_speciality()}): {before} -> {after}\n")
+        return "".join(lines)
+
+    def apply(self):
+        """Make the assignments in one transaction; returns how many were made.
+
+        Raises ConflictError (nothing assigned) if one of the patients was
+        changed, e.g. by another process, after the plan was drawn.
+        """
+        store = self.store
+        expect = [('patient', p.patient_id, self.__versions[p.patient_id]) for p in self.proposals]
+        assigned = 0
+        with store.transaction(expect):
+            for proposal in self.proposals:
+                # patients discharged or given a doctor since are left as they are
+                patient = store.get_patient(proposal.patient_id)
+                if patient is not None and store.doctor_of(patient) is None:
+                    assigned += store.assign_patient(proposal.patient_id, proposal.doctor_id)
+        return assigned
+
+
+class AssignmentEngine:
+    """Assign patients to the least-loaded doctor of the speciality matching their symptoms.
+
+    Load is patients / (1 + experience / EXPERIENCE_SCALE). Doctors sit in
+    heaps keyed by load; stale entries are dropped when popped.
+    """
+
+    EXPERIENCE_SCALE = 10
+
+    def __init__(self, store, specialities=None):
+        """
+        Args:
+            store (HospitalStore): the hospital
+            specialities (dict, optional): symptom -> speciality. Defaults to SPECIALITY_FOR_SYMPTOM
+        """
+        self.store = store
+        specialities = SPECIALITY_FOR_SYMPTOM if specialities is None else specialities
+        self.specialities = {normalize_symptom(s): normalize_symptom(spec) for s, spec in specialities.items()}
+
+    def unassigned(self):
+        """IDs of the active patients with no doctor, in the order they were added."""
+        return [i for i, p in self.store.patient_items().items() if self.store.doctor_of(p) is None]
+
+    def weight(self, doctor):
+        return 1 + max(doctor.get_experience(), 0) / self.EXPERIENCE_SCALE
+
+    def match(self, symptoms, available):
+        """(speciality key, reason) for a patient's symptoms, among the `available` ones; None if none fits."""
+        votes = {}
+        for symptom in symptoms:
+            speciality = self.specialities.get(normalize_symptom(symptom))
+            if speciality is not None and speciality in available:
+                votes[speciality] = votes.get(speciality, 0) + 1
+        if votes:
+            return max(votes, key=votes.get), "symptoms"
+        for speciality in self.store.symptoms.specialities_for(symptoms):
+            speciality = normalize_symptom(speciality)
+            if speciality in available:
+                return speciality, "similar patients"
+        return None
+
+    def plan(self, patient_ids=None):
+        """Work out assignments for `patient_ids` (default: every unassigned patient) without making them.
+
+        Patients who already have a doctor, or are no longer active, are left out.
+        """
+        store = self.store
+        if patient_ids is None:
+            patient_ids = self.unassigned()
+        before = {}
+        load = {}  # doctor ID -> patients, counting the planned ones
+        heaps = {None: []}
+        for doctor_id, doctor in store.doctor_items().items():
+            before[doctor_id] = load[doctor_id] = doctor.get_total_patients()
+            entry = (load[doctor_id] / self.weight(doctor), doctor_id, load[doctor_id])
+            heaps.setdefault(normalize_symptom(doctor.get_speciality()), []).append(entry)
+            heaps[None].append(entry)
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        proposals = []
+        versions = {}
+        for patient_id in patient_ids:
+            patient = store.get_patient(patient_id)
+            if (patient is None or store.doctor_of(patient) is not None
+                    or patient_id in versions or not load):
+                continue
+            matched = self.match(patient.get_symptoms(), heaps)
+            speciality, reason = matched if matched else (None, "no matching speciality")
+            heap = heaps[speciality]
+            while heap[0][2] != load[heap[0][1]]:
+                heapq.heappop(heap)  # stale: the doctor has been given patients since
+            doctor_id = heap[0][1]
+            doctor = store.get_doctor(doctor_id)
+            load[doctor_id] += 1
+            entry = (load[doctor_id] / self.weight(doctor), doctor_id, load[doctor_id])
+            heapq.heapreplace(heap, entry)
+            # the doctor's entry in their other heap is now stale; give it the new load too
+            heapq.heappush(heaps[None] if speciality is not None
+                           else heaps[normalize_symptom(doctor.get_speciality())], entry)
+            proposals.append(Proposal(patient_id, doctor_id, doctor.get_speciality(), reason))
+            versions[patient_id] = store.version('patient', patient_id)
+
+        changes = {doctor_id: (count, load[doctor_id]) for doctor_id, count in before.items()
+                   if count != load[doctor_id]}
+        return AssignmentPlan(store, proposals, changes, versions)
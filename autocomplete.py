@@ -0,0 +1,86 @@
+from bisect import bisect_left
+
+
+def name_keys(name):
+    """Keys a name is found under: the whole name and each later word onwards.
+
+    "Jone Smith" -> ["jone smith", "smith"], so typing a surname works too.
+    """
+    words = name.casefold().split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class NameIndex:
+    """Sorted (key, ID) pairs for type-ahead on names."""
+
+    def __init__(self):
+        self.__entries = []   # sorted (key, id)
+        self.__new = []       # (key, id) waiting to be merged
+        self.__names = {}     # id -> indexed name
+
+    def add(self, record_id, name):
+        self.__names[record_id] = name
+        self.__new.extend((key, record_id) for key in name_keys(name))
+
+    def remove(self, record_id):
+        name = self.__names.pop(record_id, None)
+        if name is None:
+            return
+        self._merge()
+        for key in name_keys(name):
+            i = bisect_left(self.__entries, (key, record_id))
+            if i < len(self.__entries) and self.__entries[i] == (key, record_id):
+                del self.__entries[i]
+
+    def rename(self, record_id, name):
+        self.remove(record_id)
+        self.add(record_id, name)
+
+    def _merge(self):
+        if self.__new:
+            # the list is already sorted, so this is a merge rather than a full sort
+            self.__entries.extend(self.__new)
+            self.__entries.sort()
+            self.__new = []
+
+    def complete(self, prefix, k=10):
+        """IDs of up to `k` names with a word starting with `prefix`, in name order."""
+        self._merge()
+        prefix = ' '.join(prefix.casefold().split())
+        entries = self.__entries
+        found = {}
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and len(found) < k:
+            key, record_id = entries[i]
+            if not key.startswith(prefix):
+                break
+            found[record_id] = None
+            i += 1
+        return list(found)
+
+    def __len__(self):
+        return len(self.__names)
+
+
+class DoctorNameIndex(NameIndex):
+    """NameIndex of doctors, kept up to date as a HospitalStore listener."""
+
+    def on_doctor_added(self, doctor_id, doctor):
+        self.add(doctor_id, doctor.full_name())
+
+    def on_doctor_updated(self, doctor_id, doctor, old_name):
+        if doctor.full_name() != old_name:
+            self.rename(doctor_id, doctor.full_name())
+
+    def on_doctor_removed(self, doctor_id, doctor, released_patients):
+        self.remove(doctor_id)
+
+
+class PatientNameIndex(NameIndex):
+    """NameIndex of active patients, kept up to date as a HospitalStore listener."""
+
+    def on_patient_added(self, patient_id, patient):
+        self.add(patient_id, patient.full_name())
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        self.remove(patient_id)
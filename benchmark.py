@@ -0,0 +1,288 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from admin import Admin, Appointment
+from analytics import np
+from doctor import Doctor
+from patient import Patient
+from store import HospitalStore
+
+
+FIRST_NAMES = ('Oliver', 'Amelia', 'George', 'Isla', 'Harry', 'Ava', 'Noah', 'Mia', 'Jack', 'Ivy',
+               'Leo', 'Lily', 'Arthur', 'Freya', 'Muhammad', 'Grace', 'Oscar', 'Sophia', 'Charlie',
+               'Ella', 'Jacob', 'Rosie', 'Thomas', 'Evie', 'Henry', 'Florence', 'William', 'Poppy')
+SURNAMES = ('Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson', 'Davies', 'Patel',
+            'Robinson', 'Wright', 'Thompson', 'Evans', 'Walker', 'White', 'Roberts', 'Green', 'Hall',
+            'Wood', 'Jackson', 'Clarke', 'Khan', 'Lewis', 'Hughes', 'Edwards', 'Turner', 'Hill',
+            'Moore', 'Cooper', 'Ward', 'Morris', 'King', 'Watson', 'Harris', 'Baker', 'Young')
+SPECIALITIES = ('Cardiology', 'Paediatrics', 'Oncology', 'Neurology', 'Dermatology',
+                'Orthopaedics', 'General Practice', 'Respiratory')
+SYMPTOMS = ('Headache', 'Fever', 'Cough', 'Fatigue', 'Back pain', 'Chest pain', 'Nausea',
+            'Dizziness', 'Rash', 'Shortness of breath', 'Sore throat', 'Joint pain',
+            'Insomnia', 'Palpitations', 'Abdominal pain', 'Blurred vision')
+POSTCODE_AREAS = ('B', 'M', 'L', 'LS', 'S', 'NE', 'CV', 'NG', 'BS', 'E', 'N', 'SW')
+
+
+def zipf_weights(n, s=1.1):
+    """Weights 1/rank**s: a few values are common and the rest get rarer (names, illnesses)."""
+    return [1 / rank ** s for rank in range(1, n + 1)]
+
+
+def generate_hospital(doctors=20, patients=10000, years=2, appointments_per_day=4,
+                      max_symptoms=3, unassigned=0.1, seed=0, end=None):
+    """Build a HospitalStore filled with synthetic but realistic-looking data.
+
+    Surnames and symptoms follow a skewed (Zipf-like) distribution, so
+    families and common illnesses look like real data. Each doctor gets
+    `appointments_per_day` non-overlapping appointments on every weekday
+    of the `years` up to `end` (default today).
+
+    Args:
+        doctors (int): number of doctors
+        patients (int): number of active patients
+        years (int): years of appointment history
+        appointments_per_day (int): appointments per doctor per weekday
+        max_symptoms (int): most symptoms one patient can have
+        unassigned (float): share of patients with no doctor
+        seed (int): random seed, so runs are repeatable
+        end (date, optional): last day of appointments
+    """
+    rng = random.Random(seed)
+    store = HospitalStore()
+
+    doctor_ids = []
+    for i in range(doctors):
+        doctor = Doctor(FIRST_NAMES[i % len(FIRST_NAMES)], f"{SURNAMES[i % len(SURNAMES)]}{i}",
+                        rng.choice(SPECIALITIES), rng.randint(1, 35))
+        doctor_ids.append(store.add_doctor(doctor))
+    doctor_names = [store.get_doctor(i).full_name() for i in doctor_ids]
+
+    surname_weights = zipf_weights(len(SURNAMES))
+    symptom_weights = zipf_weights(len(SYMPTOMS))
+    batch = []
+    for _ in range(patients):
+        patient = Patient(rng.choice(FIRST_NAMES), rng.choices(SURNAMES, surname_weights)[0],
+                          rng.randint(0, 99), f"07{rng.randrange(10 ** 9):09d}",
+                          f"{rng.choice(POSTCODE_AREAS)}{rng.randint(1, 30)} "
+                          f"{rng.randint(1, 9)}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}"
+                          f"{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}")
+        if doctor_names and rng.random() >= unassigned:
+            patient.link(rng.choice(doctor_names))
+        for symptom in set(rng.choices(SYMPTOMS, symptom_weights, k=rng.randint(0, max_symptoms))):
+            patient.add_symptom(symptom)
+        batch.append(patient)
+    store.load_patients(batch)
+
+    if doctor_ids and batch and appointments_per_day:
+        end = end or date.today()
+        day = end - timedelta(days=365 * years)
+        slots = range(9 * 60, 17 * 60, 30)
+        while day <= end:
+            if day.weekday() < 5:
+                for doctor_id in doctor_ids:
+                    doctor = store.get_doctor(doctor_id)
+                    for minute in rng.sample(slots, min(appointments_per_day, len(slots))):
+                        start = datetime(day.year, day.month, day.day, minute // 60, minute % 60)
+                        store.add_appointment(Appointment(doctor, rng.choice(batch), start),
+                                              check_conflicts=False)
+            day += timedelta(days=1)
+    store.take_changes()
+    return store
+
+
+def measure(fn, repeat=5, setup=None):
+    """Time `fn` `repeat` times (after `setup`, which is not timed); returns seconds stats."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times),
+            'mean': statistics.mean(times), 'max': max(times), 'repeat': repeat}
+
+
+class Benchmarks:
+    """The hot operations of the console and GUI, timed against one synthetic hospital."""
+
+    def __init__(self, store, workdir, repeat=5, relocations=1000, seed=0):
+        """
+        Args:
+            store (HospitalStore): the hospital to run against (see generate_hospital)
+            workdir (string): directory for the files written by the save/load benchmarks
+            repeat (int): runs per benchmark
+            relocations (int): patients moved per run of the relocate benchmark
+            seed (int): random seed for the relocations
+        """
+        self.store = store
+        self.admin = Admin('admin', '123', 'B1 1AB')
+        self.filename = os.path.join(workdir, 'patients.txt')
+        self.repeat = repeat
+        self.relocations = relocations
+        self.rng = random.Random(seed)
+
+    def quietly(self, fn, *args):
+        # the console methods report through print(); keep that out of the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+
+    def save_patients_to_file(self):
+        patients = self.store.patients()
+        return measure(lambda: self.quietly(self.admin.save_patients_to_file, patients, self.filename),
+                       self.repeat)
+
+    def load_patients_from_file(self):
+        if not os.path.exists(self.filename):
+            self.quietly(self.admin.save_patients_to_file, self.store.patients(), self.filename)
+        return measure(lambda: self.quietly(self.admin.load_patients_from_file, self.filename),
+                       self.repeat)
+
+    def relocate_patients(self):
+        patient_ids = list(self.store.patient_items())
+        doctor_ids = list(self.store.doctor_items())
+        moves = []
+
+        def pick():
+            moves[:] = [(self.rng.choice(patient_ids), self.rng.choice(doctor_ids))
+                        for _ in range(self.relocations)]
+
+        def relocate():
+            for patient_id, doctor_id in moves:
+                self.store.assign_patient(patient_id, doctor_id)
+
+        result = measure(relocate, self.repeat, setup=pick)
+        result['operations'] = self.relocations
+        self.store.take_changes()
+        return result
+
+    def management_report(self):
+        return measure(lambda: self.quietly(self.admin.management_report, self.store), self.repeat)
+
+    def surname_grouping(self):
+        return measure(self.store.families, self.repeat)
+
+    def gui_tree_refresh(self):
+        """Fill the Patients table and page through it on a hidden Tk root."""
+        import tkinter as tk
+        from gui_main import HospitalGUI
+        from widgets import VirtualTable
+
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            return {'skipped': f"no display for Tk: {e}"}
+        root.withdraw()
+        try:
+            # the table asks the GUI's own row function for each visible row
+            rows = type('Rows', (), {'patient_row': HospitalGUI.patient_row})()
+            rows.store = self.store
+            cols = ("name", "doctor", "age", "mobile", "postcode", "symptoms")
+            table = VirtualTable(root, cols, rows.patient_row)
+            table.pack()
+
+            def refresh():
+                table.set_keys(self.store.patient_items())
+                for _ in range(20):
+                    table.scroll(1, "pages")
+                root.update()
+
+            return measure(refresh, self.repeat)
+        finally:
+            root.destroy()
+
+    NAMES = ('load_patients_from_file', 'save_patients_to_file', 'relocate_patients',
+             'management_report', 'surname_grouping', 'gui_tree_refresh')
+
+    def run(self, names=None, progress=None):
+        results = {}
+        for name in names or self.NAMES:
+            if progress:
+                progress(name)
+            results[name] = getattr(self, name)()
+        return results
+
+
+def environment():
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__ if np is not None else None}
+
+
+def compare(results, baseline):
+    """Median time ratios (current / baseline) for the benchmarks both runs have."""
+    ratios = {}
+    for name, result in results['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name, {})
+        if 'median' in result and old.get('median'):
+            ratios[name] = result['median'] / old['median']
+    return ratios
+
+
+def main(argv=None):
+    """Command line: python benchmark.py [--patients N] [--output results.json] [--compare old.json]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the hot operations on a synthetic hospital.")
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--years', type=int, default=2, help="years of appointment history")
+    parser.add_argument('--appointments-per-day', type=int, default=4, help="per doctor, on weekdays")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--relocations', type=int, default=1000)
+    parser.add_argument('--only', nargs='+', choices=Benchmarks.NAMES, help="run just these benchmarks")
+    parser.add_argument('--label', default='', help="name for this run, e.g. a version or commit")
+    parser.add_argument('--output', help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    config = {k: getattr(args, k) for k in ('doctors', 'patients', 'years', 'appointments_per_day',
+                                            'seed', 'repeat', 'relocations')}
+    print(f"Generating hospital: {args.doctors} doctors, {args.patients} patients, "
+          f"{args.years} years of appointments...", file=sys.stderr)
+    start = time.perf_counter()
+    store = generate_hospital(args.doctors, args.patients, args.years, args.appointments_per_day,
+                              seed=args.seed)
+    generated = time.perf_counter() - start
+
+    workdir = tempfile.mkdtemp(prefix='hospital-bench-')
+    try:
+        benchmarks = Benchmarks(store, workdir, args.repeat, args.relocations, args.seed)
+        timings = benchmarks.run(args.only, lambda name: print(f"  {name}...", file=sys.stderr))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {'label': args.label, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+               'environment': environment(), 'config': config,
+               'data': {'doctors': len(store.doctor_items()), 'patients': len(store.patient_items()),
+                        'appointments': len(store.appointment_items()), 'generate_seconds': generated},
+               'benchmarks': timings}
+    if args.compare:
+        with open(args.compare) as f:
+            results['compared_to'] = {'file': args.compare, 'ratios': compare(results, json.load(f))}
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    for name, ratio in results.get('compared_to', {}).get('ratios', {}).items():
+        print(f"  {name}: {ratio:.2f}x {'slower' if ratio > 1 else 'faster'} than baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import csv
+import gc
+import json
+import operator
+import re
+import sqlite3
+import sys
+
+from patient import Patient
+
+
+FIELDS = ('first_name', 'surname', 'age', 'mobile', 'postcode', 'doctor', 'symptoms')
+
+MOBILE_RE = re.compile(r'\+?\d{10,15}$')
+# loose on purpose: the existing data holds partial postcodes such as "B1 234"
+POSTCODE_RE = re.compile(r'[A-Z]{1,2}\d[A-Z\d]?(?: ?[A-Z\d]{1,3})?$')
+MAX_AGE = 150
+
+
+def patient_key(first_name, surname, mobile):
+    """Key two records must share to count as the same person."""
+    return (first_name.casefold(), surname.casefold(), mobile)
+
+
+class ImportSummary:
+    """Counts for one import run."""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def __str__(self):
+        return (f"Read {self.read} rows: {self.imported} imported, "
+                f"{self.duplicates} duplicates skipped, {self.rejected} rejected.")
+
+
+class PatientImporter:
+    """Bulk import of patients from a CSV or JSONL file.
+
+    Bad rows go to a rejects CSV next to the source file. read_batches() may
+    run on a worker thread; commit() must run on the thread that owns the store.
+    """
+
+    def __init__(self, store, batch_size=10000, rejects_filename=None):
+        """
+        Args:
+            store (HospitalStore): the store to import into
+            batch_size (int): rows validated and committed together
+            rejects_filename (string): where to write rejected rows
+                (default: the source file name + '.rejects.csv')
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.rejects_filename = rejects_filename
+        self.summary = ImportSummary()
+        self.__doctor_names = {d.full_name() for d in store.doctors()}
+        self.__seen = set()
+        self.__symptom_lists = {}
+        for items in (store.patient_items(), store.discharged_items()):
+            for p in items.values():
+                self.__seen.add(patient_key(p.get_first_name(), p.get_surname(), p.get_mobile()))
+
+    # ---------- reading ----------
+
+    def read_batches(self, filename, task=None):
+        """Yield lists of new, valid Patients from `filename`.
+
+        `task` is an optional workers.Task used for cancellation and progress.
+        """
+        if self.rejects_filename is None:
+            self.rejects_filename = filename + '.rejects.csv'
+        with open(filename, 'r', newline='', encoding='utf-8') as source, \
+                open(self.rejects_filename, 'w', newline='', encoding='utf-8') as rejects_file:
+            rejects = csv.writer(rejects_file)
+            rejects.writerow(('line', 'reason') + FIELDS)
+
+            batch = []
+            for line_no, row in self._rows(filename, source):
+                batch.append((line_no, row))
+                if len(batch) == self.batch_size:
+                    yield self._validate(batch, rejects)
+                    batch = []
+                    if task is not None:
+                        task.check_cancelled()
+                        task.progress(self.summary.read, None, f"Importing... {self.summary.read} rows")
+            if batch:
+                yield self._validate(batch, rejects)
+
+    def _rows(self, filename, source):
+        """Yield (line number, row) with each row a tuple in FIELDS order."""
+        if filename.lower().endswith(('.jsonl', '.ndjson')):
+            for line_no, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield line_no, tuple(record.get(f) for f in FIELDS)
+                except (ValueError, AttributeError):
+                    yield line_no, None
+            return
+
+        reader = csv.reader(source)
+        order = None  # column index per field once a header has been seen
+        pick = None   # fast path when the header names every field
+        first = True
+        for row in reader:
+            if not row or not any(row):
+                continue
+            if first:
+                first = False
+                header = [c.strip().lower() for c in row]
+                if 'first_name' in header and 'surname' in header:
+                    order = [header.index(f) if f in header else None for f in FIELDS]
+                    if None not in order:
+                        pick = operator.itemgetter(*order)
+                        width = max(order) + 1
+                    continue
+            if order is None:
+                # patients.txt order; extra columns are symptoms split by stray commas
+                yield reader.line_num, tuple(row[:6]) + (';'.join(row[6:]),)
+            elif pick is not None and len(row) >= width:
+                yield reader.line_num, pick(row)
+            else:
+                yield reader.line_num, tuple(row[i] if i is not None and i < len(row) else None
+                                             for i in order)
+
+    def _validate(self, batch, rejects):
+        """Turn one batch of raw rows into Patients, writing rejects as it goes."""
+        summary = self.summary
+        seen = self.__seen
+        doctor_names = self.__doctor_names
+        patients = []
+        bad = []
+        for line_no, row in batch:
+            summary.read += 1
+            if row is None:
+                bad.append((line_no, 'unreadable row'))
+                continue
+            if not self._well_typed(row):
+                bad.append((line_no, 'bad field type') + row)
+                continue
+            first_name, surname, age, mobile, postcode, doctor, symptoms = row
+            first_name = (first_name or '').strip()
+            surname = (surname or '').strip()
+            mobile = str(mobile or '')
+            if not mobile.isdigit():
+                mobile = mobile.replace(' ', '').replace('-', '')
+            postcode = (postcode or '').strip().upper()
+            doctor = (doctor or '').strip()
+
+            try:
+                # a JSON true would otherwise pass as 1
+                years = None if isinstance(age, bool) else int(age)
+            except (TypeError, ValueError):
+                years = None
+
+            if not first_name or not surname:
+                reason = 'missing name'
+            elif years is None:
+                reason = f'bad age {age!r}'
+            elif not 0 <= years <= MAX_AGE:
+                reason = f'age out of range {age!r}'
+            elif not MOBILE_RE.match(mobile):
+                reason = f'bad mobile {mobile!r}'
+            elif not POSTCODE_RE.match(postcode):
+                reason = f'bad postcode {postcode!r}'
+            elif doctor and doctor != 'None' and doctor not in doctor_names:
+                reason = f'unknown doctor {doctor!r}'
+            else:
+                reason = None
+            if reason is not None:
+                bad.append((line_no, reason) + row)
+                continue
+
+            key = patient_key(first_name, surname, mobile)
+            if key in seen:
+                summary.duplicates += 1
+                continue
+            seen.add(key)
+
+            patient = Patient(sys.intern(first_name), sys.intern(surname), years, mobile,
+                              sys.intern(postcode))
+            if doctor and doctor != 'None':
+                patient.link(doctor)
+            if symptoms:
+                for s in self._symptom_list(symptoms):
+                    patient.add_symptom(s)
+            patients.append(patient)
+
+        summary.rejected += len(bad)
+        rejects.writerows(bad)
+        return patients
+
+    @staticmethod
+    def _well_typed(row):
+        """False if a JSON row has a field of the wrong type (e.g. a number for a name)."""
+        first_name, surname, age, mobile, postcode, doctor, symptoms = row
+        text = (str, type(None))
+        return (all(isinstance(v, text) for v in (first_name, surname, postcode, doctor))
+                and isinstance(age, text + (int,)) and isinstance(mobile, text + (int,))
+                and (isinstance(symptoms, text)
+                     or isinstance(symptoms, list) and all(isinstance(v, str) for v in symptoms)))
+
+    def _symptom_list(self, symptoms):
+        if not isinstance(symptoms, str):
+            return [s for s in (str(s).strip() for s in symptoms) if s]
+        # the same few symptom strings repeat across a file; split each one once
+        parsed = self.__symptom_lists.get(symptoms)
+        if parsed is None:
+            parsed = [s for s in (s.strip() for s in symptoms.split(';')) if s]
+            if len(self.__symptom_lists) < 10000:
+                self.__symptom_lists[symptoms] = parsed
+        return parsed
+
+    # ---------- committing ----------
+
+    def commit(self, patients):
+        """Add one validated batch to the store and save it if the store has a backend."""
+        self.store.load_patients(patients)
+        self.summary.imported += len(patients)
+        if self.store.backend is not None:
+            self.store.backend.save(self.store)
+
+    def run(self, filename):
+        """Import `filename` on the calling thread; returns the ImportSummary."""
+        # the import allocates no reference cycles; collections would only
+        # rescan the growing roster again and again
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for patients in self.read_batches(filename):
+                self.commit(patients)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return self.summary
+
+
+def import_patients(store, filename, batch_size=10000, rejects_filename=None):
+    """Import patients from a CSV or JSONL file into `store`; returns an ImportSummary."""
+    return PatientImporter(store, batch_size, rejects_filename).run(filename)
+
+
+def main(argv=None):
+    """Command line: python bulk_import.py FILE [--rejects PATH] [--db PATH]"""
+    import argparse
+    from admin import Admin
+    from store import create_default_store, save_store
+
+    parser = argparse.ArgumentParser(description="Bulk import patients from a CSV or JSONL file.")
+    parser.add_argument('file')
+    parser.add_argument('--rejects', help="rejects file (default: FILE.rejects.csv)")
+    parser.add_argument('--db', help="SQLite database to import into (default: patients.txt)")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    admin = Admin('admin', '123', 'B1 1AB')
+    store = create_default_store(admin, 'patients.txt', args.db)
+    try:
+        summary = import_patients(store, args.file, args.batch_size, args.rejects)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Import failed: {e}")
+        return 1
+    print(summary)
+    if store.backend is None:
+        save_store(admin, store, 'patients.txt')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+from datetime import date, datetime, time, timedelta
+
+from admin import Appointment
+from doctor import Doctor
+from loader import patient_from_fields
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS doctors (
+    id          INTEGER PRIMARY KEY,
+    first_name  TEXT NOT NULL,
+    surname     TEXT NOT NULL,
+    speciality  TEXT NOT NULL,
+    experience  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patients (
+    id          INTEGER PRIMARY KEY,
+    first_name  TEXT NOT NULL,
+    surname     TEXT NOT NULL,
+    age         INTEGER NOT NULL,
+    mobile      TEXT NOT NULL,
+    postcode    TEXT NOT NULL,
+    doctor_id   INTEGER,
+    doctor_name TEXT NOT NULL,
+    symptoms    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS discharged_patients (
+    id          INTEGER PRIMARY KEY,
+    first_name  TEXT NOT NULL,
+    surname     TEXT NOT NULL,
+    age         INTEGER NOT NULL,
+    mobile      TEXT NOT NULL,
+    postcode    TEXT NOT NULL,
+    doctor_name TEXT NOT NULL,
+    symptoms    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    id          INTEGER PRIMARY KEY,
+    doctor_id   INTEGER NOT NULL,
+    patient_id  INTEGER NOT NULL,
+    date        TEXT NOT NULL,
+    start_time  TEXT,
+    end_time    TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (first_name, surname);
+CREATE INDEX IF NOT EXISTS idx_doctors_speciality ON doctors (speciality);
+CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (first_name, surname);
+CREATE INDEX IF NOT EXISTS idx_patients_surname ON patients (surname);
+CREATE INDEX IF NOT EXISTS idx_patients_postcode ON patients (postcode);
+CREATE INDEX IF NOT EXISTS idx_patients_doctor ON patients (doctor_id);
+CREATE INDEX IF NOT EXISTS idx_discharged_surname ON discharged_patients (surname);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, date);
+CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id);
+CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (date);
+"""
+
+UPSERT_DOCTOR = "INSERT OR REPLACE INTO doctors VALUES (?, ?, ?, ?, ?)"
+UPSERT_PATIENT = "INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+UPSERT_DISCHARGED = "INSERT OR REPLACE INTO discharged_patients VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+UPSERT_APPOINTMENT = "INSERT OR REPLACE INTO appointments VALUES (?, ?, ?, ?, ?, ?)"
+
+
+class SQLiteBackend:
+    """Optional SQLite persistence for a HospitalStore."""
+
+    def __init__(self, path='hospital.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        # last journal record the database holds (see store.attach_journal)
+        self.journal_seq = 0
+        # isolation_level=None: transactions are managed explicitly below
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Bring databases created by older versions up to the current schema."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(appointments)")}
+        for column in ("start_time", "end_time"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE appointments ADD COLUMN {column} TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        row = self.conn.execute("SELECT EXISTS (SELECT 1 FROM doctors) OR EXISTS (SELECT 1 FROM patients)").fetchone()
+        return not row[0]
+
+    # ---------- loading ----------
+
+    def load(self, store):
+        """Fill `store` from the database. Rows are streamed from the cursor."""
+        for doctor_id, first_name, surname, speciality, experience in self.conn.execute(
+                "SELECT id, first_name, surname, speciality, experience FROM doctors ORDER BY id"):
+            store.add_doctor(Doctor(first_name, surname, speciality, experience), doctor_id)
+
+        for row in self.conn.execute(
+                "SELECT id, first_name, surname, age, mobile, postcode, doctor_id, doctor_name, symptoms "
+                "FROM patients ORDER BY id"):
+            patient_id, doctor_id = row[0], row[6]
+            store.add_patient(self._row_to_patient(row[1:6], row[7], row[8]), patient_id)
+            if doctor_id is not None:
+                store.assign_patient(patient_id, doctor_id)
+
+        for row in self.conn.execute(
+                "SELECT id, first_name, surname, age, mobile, postcode, doctor_name, symptoms "
+                "FROM discharged_patients ORDER BY id"):
+            store.add_discharged(self._row_to_patient(row[1:6], row[6], row[7]), row[0])
+
+        for appointment_id, doctor_id, patient_id, date_str, start_str, end_str in self.conn.execute(
+                "SELECT id, doctor_id, patient_id, date, start_time, end_time FROM appointments ORDER BY id"):
+            doctor = store.get_doctor(doctor_id)
+            patient = store.get_any_patient(patient_id)
+            if doctor is None or patient is None:
+                continue
+            day = date.fromisoformat(date_str)
+            # rows saved before appointments had times get the default slot
+            start = datetime.combine(day, time.fromisoformat(start_str)) if start_str else day
+            end = datetime.combine(day, time.fromisoformat(end_str)) if end_str else None
+            if end is not None and end <= start:
+                end += timedelta(days=1)  # ran past midnight
+            store.add_appointment(Appointment(doctor, patient, start, end), appointment_id,
+                                  check_conflicts=False)
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+        self.journal_seq = store.journal_seq = row[0] if row else 0
+        # everything just loaded is already on disk
+        store.take_changes()
+
+    @staticmethod
+    def _row_to_patient(fields, doctor_name, symptoms):
+        return patient_from_fields(tuple(fields) + (doctor_name, [s for s in symptoms.split(';') if s]))
+
+    # ---------- saving ----------
+
+    def save(self, store):
+        """Write the records changed since the last load/save in one transaction."""
+        with self.lock:
+            return self._save(store)
+
+    def _save(self, store):
+        changes = store.take_changes()
+        journal_seq = store.journal_seq
+
+        doctor_rows, doctor_deletes = [], []
+        for doctor_id in changes['doctor']:
+            d = store.get_doctor(doctor_id)
+            if d is None:
+                doctor_deletes.append((doctor_id,))
+            else:
+                doctor_rows.append((doctor_id, d.get_first_name(), d.get_surname(),
+                                    d.get_speciality(), d.get_experience()))
+
+        patient_rows, discharged_rows, patient_deletes = [], [], []
+        for patient_id in changes['patient']:
+            p = store.get_patient(patient_id)
+            if p is not None:
+                doctor = store.doctor_of(p)
+                patient_rows.append((patient_id, p.get_first_name(), p.get_surname(), p.get_age(),
+                                     p.get_mobile(), p.get_postcode(),
+                                     store.doctor_id(doctor) if doctor is not None else None,
+                                     p.get_doctor(), ";".join(p.get_symptoms())))
+                continue
+            patient_deletes.append((patient_id,))
+            p = store.get_any_patient(patient_id)
+            if p is not None:
+                discharged_rows.append((patient_id, p.get_first_name(), p.get_surname(), p.get_age(),
+                                        p.get_mobile(), p.get_postcode(), p.get_doctor(),
+                                        ";".join(p.get_symptoms())))
+
+        appointment_rows = []
+        for appointment_id in changes['appointment']:
+            a = store.get_appointment(appointment_id)
+            if a is not None:
+                appointment_rows.append((appointment_id, store.doctor_id(a.doctor),
+                                         store.patient_id(a.patient), a.date.isoformat(),
+                                         a.start.time().isoformat("minutes"), a.end.time().isoformat("minutes")))
+
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            cur.executemany("DELETE FROM doctors WHERE id = ?", doctor_deletes)
+            cur.executemany(UPSERT_DOCTOR, doctor_rows)
+            cur.executemany("DELETE FROM patients WHERE id = ?", patient_deletes)
+            cur.executemany(UPSERT_PATIENT, patient_rows)
+            cur.executemany(UPSERT_DISCHARGED, discharged_rows)
+            cur.executemany(UPSERT_APPOINTMENT, appointment_rows)
+            cur.execute("INSERT OR REPLACE INTO meta VALUES ('journal_seq', ?)", (journal_seq,))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            store.restore_changes(changes)
+            raise
+        self.journal_seq = journal_seq
+        return len(doctor_rows) + len(doctor_deletes) + len(patient_rows) + len(patient_deletes) \
+            + len(discharged_rows) + len(appointment_rows)
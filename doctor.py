@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 
 
 class Doctor:
@@ -16,7 +16,8 @@ class Doctor:
         self.__surname = surname
         self.__speciality = speciality
         self.__experience = experience
-        self.__patients: List["Patient"] = []
+        # dicts keep insertion order, so this is an ordered set of patients
+        self.__patients: Dict["Patient", None] = {}
         self.__appointments: List["Appointment"] = []
 
     def full_name(self) -> str:
@@ -26,7 +27,7 @@ class Doctor:
         return self.__first_name
 
     def set_first_name(self, new_first_name: str) -> None:
-        self.__first_name = new_first_first_name
+        self.__first_name = new_first_name
 
     def get_surname(self) -> str:
         return self.__surname
@@ -43,16 +44,25 @@ class Doctor:
     def get_experience(self) -> int:
         return self.__experience
 
+    def set_experience(self, new_experience: int) -> None:
+        self.__experience = new_experience
+
     def add_patient(self, patient: "Patient") -> None:
-        if patient not in self.__patients:
-            self.__patients.append(patient)
+        self.__patients[patient] = None
 
     def remove_patient(self, patient: "Patient") -> None:
-        if patient in self.__patients:
-            self.__patients.remove(patient)
+        self.__patients.pop(patient, None)
+
+    def release_patients(self) -> None:
+        """Drop every patient, e.g. when the doctor is deleted."""
+        self.__patients.clear()
+
+    def has_patient(self, patient: "Patient") -> bool:
+        return patient in self.__patients
 
-    def get_patients(self):
-        return self.__patients
+    def get_patients(self) -> List["Patient"]:
+        """Patients in the order they were assigned."""
+        return list(self.__patients)
 
     def get_total_patients(self) -> int:
         return len(self.__patients)
@@ -0,0 +1,43 @@
+class FamilyBlocks:
+    """Rendered family blocks (active patients sharing a surname), per surname and render function."""
+
+    def __init__(self):
+        self.__blocks = {}  # surname -> {render: block}
+
+    def get(self, surname, render):
+        return self.__blocks.get(surname, {}).get(render)
+
+    def put(self, surname, render, block):
+        self.__blocks.setdefault(surname, {})[render] = block
+
+    def invalidate(self, surname):
+        self.__blocks.pop(surname, None)
+
+    def clear(self):
+        self.__blocks.clear()
+
+    def __len__(self):
+        return len(self.__blocks)
+
+    # ---------- store listener ----------
+
+    def on_doctor_updated(self, doctor_id, doctor, old_name):
+        if doctor.full_name() != old_name:
+            for patient in doctor.get_patients():
+                self.invalidate(patient.get_surname())
+
+    def on_doctor_removed(self, doctor_id, doctor, released_patients):
+        for patient in released_patients:
+            self.invalidate(patient.get_surname())
+
+    def on_patient_added(self, patient_id, patient):
+        self.invalidate(patient.get_surname())
+
+    def on_patient_assigned(self, patient_id, patient, old_doctor, new_doctor):
+        self.invalidate(patient.get_surname())
+
+    def on_symptom_added(self, patient_id, patient, symptom):
+        self.invalidate(patient.get_surname())
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        self.invalidate(patient.get_surname())
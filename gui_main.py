@@ -1,13 +1,110 @@
+import os
+import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime, timedelta
 
 from admin import Admin, Appointment
+from archive import months_back
+from assignment import AssignmentEngine
+from bulk_import import PatientImporter
 from doctor import Doctor
+from instrumentation import ENABLED as INSTRUMENTED, add_rows, instrument_methods, instruments
 from patient import Patient
+from schedule import parse_time
+from sharing import ConflictError
+from snapshot import pack_snapshot
+from store import attach_journal, ensure_patients, open_default_store, save_store
+from widgets import AutocompleteBox, VirtualTable
+from workers import BackgroundRunner
+
+
+def read_patient_batches(task, admin, filename, batch_size=5000):
+    """Worker: parse the patients file and send it to the Tk thread in batches."""
+    batch = []
+    total = 0
+    for patient in admin.iter_patients_from_file(filename):
+        batch.append(patient)
+        if len(batch) == batch_size:
+            task.check_cancelled()
+            task.send(batch)
+            total += len(batch)
+            task.progress(total, None, f"Loading patients... {total}")
+            batch = []
+    if batch:
+        task.send(batch)
+        total += len(batch)
+    return total
+
+
+def prepare_report(task, report, doctors, archive=None, since=None):
+    """Worker: build the report text and the chart data from the maintained counts.
+
+    Also returns the archive's discharges per month since `since`, for discharge_lines().
+    """
+    patients_per_doc, appts_per_month, illness_count = report.snapshot(doctors)
+    task.check_cancelled()
+
+    lines = [f"1. Total Doctors: {len(doctors)}\n\n", "2. Patients per Doctor:\n"]
+    for name, count in patients_per_doc.items():
+        lines.append(f"   - {name}: {count}\n")
+    lines.append("\n")
+
+    lines.append("3. Appointments per Month per Doctor:\n")
+    if not appts_per_month:
+        lines.append("   No appointments have been scheduled yet.\n\n")
+    else:
+        for doctor_name, months in appts_per_month.items():
+            lines.append(f"   - {doctor_name}:\n")
+            for ym, count in months.items():
+                lines.append(f"       {ym}: {count} appointment(s)\n")
+        lines.append("\n")
+
+    lines.append("4. Patients by Illness Type:\n")
+    if not illness_count:
+        lines.append("   No symptoms/illness data recorded yet.\n")
+    else:
+        for illness, count in illness_count.items():
+            lines.append(f"   - {illness}: {count} patient(s)\n")
+
+    if report.appointment_total():
+        weekdays = report.appointments_per_weekday()
+        lines.append("\n5. Appointments by Weekday:\n")
+        lines.append("   " + "  ".join(f"{day}: {count}" for day, count in weekdays.items()) + "\n")
+
+    # only the partitions since `since` are read
+    archived = archive.discharges_per_month(since) if archive is not None else None
+
+    # chart data: blank doctor names labelled, appointments flattened per doctor/month
+    pd_clean = {k if k else "No doctor": v for k, v in patients_per_doc.items()}
+    appt_dict = {f"{doctor} {ym}": count
+                 for doctor, months in appts_per_month.items() for ym, count in months.items()}
+    return "".join(lines), (pd_clean, dict(illness_count), appt_dict), archived
+
+
+def discharge_lines(discharges):
+    """The report's discharges section, from HospitalStore.discharges_per_month."""
+    if not discharges:
+        return ""
+    return "\n6. Discharges per Month (last 12 months):\n" + "".join(
+        f"   {month or 'unknown'}: {count} patient(s)\n" for month, count in discharges.items())
+
+
+def family_rows(surname, members):
+    """Tree rows for one family: (name, (doctor, age, mobile, postcode)) per member."""
+    return [(p.full_name(), (p.get_doctor(), p.get_age(), p.get_mobile(), p.get_postcode()))
+            for p in members]
 
 
 class HospitalGUI:
+    # how often the change journal is synced to disk
+    CHECKPOINT_MS = 1000
+    # patient search: pause in typing before searching, and most rows shown
+    SEARCH_DELAY_MS = 150
+    SEARCH_LIMIT = 500
+    # families added to the Families tree per page as it scrolls
+    FAMILY_PAGE = 200
+
     def __init__(self, root):
         self.root = root
         self.root.title("Hospital Management System")
@@ -16,32 +113,11 @@ class HospitalGUI:
         # --- data setup (same as console main) ---
         self.admin = Admin('admin', '123', 'B1 1AB')
 
-        self.doctors = [
-            Doctor('John', 'Smith', 'Internal Med.'),
-            Doctor('Jone', 'Smith', 'Pediatrics'),
-            Doctor('Jone', 'Carlos', 'Cardiology')
-        ]
-
-        try:
-            self.patients = self.admin.load_patients_from_file('patients.txt')
-            if not self.patients:
-                raise FileNotFoundError
-        except (FileNotFoundError, Exception):
-            self.patients = [
-                Patient('Sara', 'Smith', 20, '07012345678', 'B1 234'),
-                Patient('Mike', 'Jones', 37, '07555551234', 'L2 2AB'),
-                Patient('Daivd', 'Smith', 15, '07123456789', 'C1 ABC')
-            ]
-
-        # link any loaded patients to doctors based on stored doctor name
-        doctor_lookup = {d.full_name(): d for d in self.doctors}
-        for p in self.patients:
-            doc_name = p.get_doctor()
-            if doc_name in doctor_lookup:
-                doctor_lookup[doc_name].add_patient(p)
-
-        self.discharged_patients = []
-        self.appointments = []
+        # patients are read on a worker thread once the window is up
+        self.store, patients_pending = open_default_store(
+            self.admin, 'patients.txt', os.environ.get('HOSPITAL_DB'))
+        self.patients_loaded = not patients_pending
+        self.workers = BackgroundRunner(self.root)
 
         # frames
         self.login_frame = None
@@ -49,7 +125,110 @@ class HospitalGUI:
         self.nav_frame = None
         self.content_frame = None
 
+        # tables are kept up to date row by row from the store's change events;
+        # during a store batch the changes are collected here and drawn once
+        self.batch_changes = None
+        self.store.add_listener(self)
+
+        self.build_status_bar()
         self.build_login_screen()
+        if patients_pending:
+            self.load_patients_in_background('patients.txt')
+        else:
+            attach_journal(self.store, 'patients.txt')
+        self.root.after(self.CHECKPOINT_MS, self.checkpoint)
+
+    # ==================== BACKGROUND TASKS ====================
+
+    def build_status_bar(self):
+        self.status_frame = ttk.Frame(self.root)
+        self.status_frame.pack(side="bottom", fill="x")
+
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(self.status_frame, textvariable=self.status_var).pack(side="left", padx=5)
+
+        self.cancel_button = ttk.Button(self.status_frame, text="Cancel", command=self.workers.cancel_all,
+                                        state="disabled")
+        self.cancel_button.pack(side="right", padx=5)
+        self.progress_bar = ttk.Progressbar(self.status_frame, mode="indeterminate", length=200)
+        self.progress_bar.pack(side="right", padx=5)
+
+    def task_started(self, text):
+        self.status_var.set(text)
+        self.progress_bar.start(10)
+        self.cancel_button.config(state="normal")
+
+    def task_progress(self, done, total, message):
+        self.status_var.set(message or f"{done} / {total}")
+
+    def task_finished(self, text):
+        self.status_var.set(text)
+        if not self.workers.active_tasks():
+            self.progress_bar.stop()
+            self.cancel_button.config(state="disabled")
+
+    def load_patients_in_background(self, filename):
+        """Parse the patients file on a worker; batches are added to the store on the Tk thread."""
+        def done(total):
+            ensure_patients(self.store)
+            attach_journal(self.store, filename)
+            self.patients_loaded = True
+            self.task_finished(f"Loaded {self.store.patient_count()} patients.")
+
+        def failed(error):
+            ensure_patients(self.store)
+            if isinstance(error, FileNotFoundError):
+                attach_journal(self.store, filename)
+                self.patients_loaded = True
+                self.task_finished("No save file found.")
+            else:
+                self.task_finished(f"Error loading file: {error}")
+
+        def cancelled():
+            self.task_finished(f"Loading cancelled after {self.store.patient_count()} patients.")
+
+        self.workers.submit("load", read_patient_batches, self.admin, filename,
+                            on_partial=self.store.load_patients, on_progress=self.task_progress,
+                            on_done=done, on_error=failed, on_cancel=cancelled)
+        self.task_started("Loading patients...")
+
+    def checkpoint(self):
+        """Make journalled changes durable; fold a long journal into the base files on a worker."""
+        journal = self.store.journal
+        try:
+            if journal is not None:
+                journal.sync()
+                # show what other processes changed; skipped this time if one is writing
+                journal.catch_up(wait=False)
+                if journal.needs_compaction() and not self.workers.active_tasks():
+                    self.save_in_background("compact", on_done=lambda _: self.task_finished("Saved."),
+                                            on_error=lambda e: self.task_finished(f"Save failed: {e}"))
+                    self.task_started("Saving...")
+        except Exception as e:
+            self.status_var.set(f"Checkpoint failed: {e}")
+        finally:
+            self.root.after(self.CHECKPOINT_MS, self.checkpoint)
+
+    def save_in_background(self, name, on_done, on_error, on_cancel=None):
+        """Archive the discharged patients, then save the store, both on workers.
+
+        The copies are taken on the Tk thread; the workers only write files.
+        """
+        store = self.store
+        rows, journal_seq = store.archive_rows(), store.journal_seq
+
+        def archived(_):
+            store.forget_archived(rows)
+            patients = store.patients()
+            snapshot = pack_snapshot(store) if store.backend is None else None
+            saved_seq = store.journal_seq
+            self.workers.submit(name, lambda task: save_store(self.admin, store, 'patients.txt',
+                                                              patients, snapshot, saved_seq),
+                                on_done=on_done, on_error=on_error, on_cancel=on_cancel)
+
+        self.workers.submit("archive", lambda task: store.write_archive(rows, journal_seq),
+                            on_done=archived, on_error=on_error,
+                            on_cancel=lambda: self.task_finished("Save cancelled."))
 
     # ==================== LOGIN ====================
 
@@ -99,11 +278,13 @@ class HospitalGUI:
             ("Patients", self.show_patients),
             ("Discharged", self.show_discharged),
             ("Assign Doctor", self.show_assign),
+            ("Auto Assign", self.show_auto_assign),
             ("Relocate Patient", self.show_relocate),
             ("Appointments", self.show_appointments),
             ("Families (Surname)", self.show_families),
             ("Reports", self.show_reports),
             ("Admin Details", self.show_admin_details),
+            ("Diagnostics", self.show_diagnostics),
             ("Save & Quit", self.save_and_quit)
         ]
 
@@ -116,6 +297,130 @@ class HospitalGUI:
         for widget in self.content_frame.winfo_children():
             widget.destroy()
 
+    def live_table(self, name):
+        """Return the named VirtualTable if it is currently on screen, else None."""
+        table = getattr(self, name, None)
+        if table is not None and table.winfo_exists():
+            return table
+        return None
+
+    # ==================== STORE EVENTS -> TABLE DIFFS ====================
+
+    def on_doctor_added(self, doctor_id, doctor):
+        for name in ("doctor_tree", "assign_doctor_tree"):
+            table = self.live_table(name)
+            if table:
+                table.insert_row(doctor_id)
+
+    def on_doctor_updated(self, doctor_id, doctor, old_name):
+        for name in ("doctor_tree", "assign_doctor_tree"):
+            table = self.live_table(name)
+            if table:
+                table.update_row(doctor_id)
+        if doctor.full_name() != old_name:
+            self._update_patient_rows(doctor.get_patients())
+
+    def on_doctor_removed(self, doctor_id, doctor, released_patients):
+        for name in ("doctor_tree", "assign_doctor_tree"):
+            table = self.live_table(name)
+            if table:
+                table.delete_row(doctor_id)
+        self._update_patient_rows(released_patients)
+
+    def on_patient_added(self, patient_id, patient):
+        for name in ("patient_tree", "assign_patient_tree"):
+            table = self.live_table(name)
+            if table and not (name == "patient_tree" and self.patient_filter()):
+                table.insert_row(patient_id)
+        self._update_families([patient.get_surname()])
+
+    def on_patient_assigned(self, patient_id, patient, old_doctor, new_doctor):
+        if self.batch_changes is not None:
+            self.batch_changes["assigned"].append(patient)
+            return
+        self._update_patient_rows([patient])
+
+    def on_symptom_added(self, patient_id, patient, symptom):
+        self._update_patient_rows([patient])
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        if self.batch_changes is not None:
+            self.batch_changes["discharged"].append((patient_id, patient))
+            return
+        for name in ("patient_tree", "assign_patient_tree"):
+            table = self.live_table(name)
+            if table:
+                table.delete_row(patient_id)
+        self._update_families([patient.get_surname()])
+
+    def on_batch_started(self):
+        self.batch_changes = {"assigned": [], "discharged": []}
+
+    def on_batch_finished(self):
+        changes, self.batch_changes = self.batch_changes, None
+        discharged = changes["discharged"]
+        if discharged:
+            for name in ("patient_tree", "assign_patient_tree"):
+                table = self.live_table(name)
+                if table:
+                    table.delete_rows(patient_id for patient_id, _ in discharged)
+            self._update_families({patient.get_surname() for _, patient in discharged})
+        # rows of patients discharged later in the batch are already gone
+        assigned = [p for p in changes["assigned"] if self.store.patient_id(p) in self.store.patient_items()]
+        if assigned:
+            self._update_patient_rows(assigned)
+
+    def on_appointment_added(self, appointment_id, appointment):
+        table = self.live_table("appt_tree")
+        if table:
+            table.insert_row(appointment_id)
+
+    def _update_patient_rows(self, patients):
+        tables = [t for t in (self.live_table("patient_tree"), self.live_table("assign_patient_tree")) if t]
+        for p in patients:
+            patient_id = self.store.patient_id(p)
+            for table in tables:
+                table.update_row(patient_id)
+        if self.live_table("family_tree"):
+            self._update_families({p.get_surname() for p in patients})
+
+    # ==================== ROW VALUES ====================
+
+    def doctor_row(self, doctor_id):
+        d = self.store.get_doctor(doctor_id)
+        return (d.full_name(), d.get_speciality(), d.get_experience())
+
+    def patient_row(self, patient_id):
+        p = self.store.get_patient(patient_id)
+        return (p.full_name(), p.get_doctor(), p.get_age(),
+                p.get_mobile(), p.get_postcode(), "; ".join(p.get_symptoms()))
+
+    def discharged_row(self, patient_id):
+        p, at = self.discharged_rows[patient_id]
+        return (p.full_name(), p.get_doctor(), p.get_age(), p.get_mobile(), p.get_postcode(),
+                at.strftime("%Y-%m-%d %H:%M") if at else "")
+
+    def assign_patient_row(self, patient_id):
+        p = self.store.get_patient(patient_id)
+        return (p.full_name(), p.get_doctor())
+
+    def assign_doctor_row(self, doctor_id):
+        d = self.store.get_doctor(doctor_id)
+        return (d.full_name(), d.get_speciality())
+
+    def doctor_label(self, doctor_id):
+        d = self.store.get_doctor(doctor_id)
+        return f"{d.full_name()} - {d.get_speciality()} (#{doctor_id})"
+
+    def patient_label(self, patient_id):
+        p = self.store.get_patient(patient_id)
+        return f"{p.full_name()} - {p.get_mobile()} (#{patient_id})"
+
+    def appointment_row(self, appointment_id):
+        a = self.store.get_appointment(appointment_id)
+        return (a.date.strftime("%Y-%m-%d"), f"{a.start:%H:%M}-{a.end:%H:%M}",
+                a.doctor.full_name(), a.patient.full_name())
+
     # ==================== DOCTORS ====================
 
     def show_doctors(self):
@@ -123,10 +428,9 @@ class HospitalGUI:
         ttk.Label(self.content_frame, text="Doctors", font=("Arial", 16)).pack(pady=10)
 
         cols = ("name", "speciality", "experience")
-        self.doctor_tree = ttk.Treeview(self.content_frame, columns=cols, show="headings")
-        self.doctor_tree.heading("name", text="Full Name")
-        self.doctor_tree.heading("speciality", text="Speciality")
-        self.doctor_tree.heading("experience", text="Experience (yrs)")
+        self.doctor_tree = VirtualTable(self.content_frame, cols, self.doctor_row,
+                                        headings={"name": "Full Name", "speciality": "Speciality",
+                                                  "experience": "Experience (yrs)"})
         self.doctor_tree.pack(expand=True, fill="both", pady=5)
 
         self.refresh_doctor_tree()
@@ -139,11 +443,7 @@ class HospitalGUI:
         ttk.Button(btn_frame, text="Delete Selected", command=self.delete_doctor).grid(row=0, column=2, padx=5)
 
     def refresh_doctor_tree(self):
-        for item in self.doctor_tree.get_children():
-            self.doctor_tree.delete(item)
-        for idx, d in enumerate(self.doctors):
-            self.doctor_tree.insert("", "end", iid=str(idx),
-                                    values=(d.full_name(), d.get_speciality(), d.get_experience()))
+        self.doctor_tree.set_keys(self.store.doctor_items())
 
     def add_doctor_window(self):
         win = tk.Toplevel(self.root)
@@ -171,19 +471,17 @@ class HospitalGUI:
                 messagebox.showerror("Error", "Experience must be a number")
                 return
             d = Doctor(fn_var.get(), sn_var.get(), spec_var.get(), exp)
-            self.doctors.append(d)
-            self.refresh_doctor_tree()
+            self.store.add_doctor(d)
             win.destroy()
 
         ttk.Button(win, text="Save", command=save).grid(row=4, column=0, columnspan=2, pady=10)
 
     def edit_doctor_window(self):
-        sel = self.doctor_tree.focus()
-        if not sel:
+        doctor_id = self.doctor_tree.focus_key()
+        if doctor_id is None:
             messagebox.showwarning("Select", "Please select a doctor to edit.")
             return
-        idx = int(sel)
-        doctor = self.doctors[idx]
+        doctor = self.store.get_doctor(doctor_id)
 
         win = tk.Toplevel(self.root)
         win.title("Edit Doctor")
@@ -209,24 +507,19 @@ class HospitalGUI:
             except ValueError:
                 messagebox.showerror("Error", "Experience must be a number")
                 return
-            doctor.set_first_name(fn_var.get())
-            doctor.set_surname(sn_var.get())
-            doctor.set_speciality(spec_var.get())
-            doctor._Doctor__experience = exp  # quick update
-            self.refresh_doctor_tree()
+            self.store.update_doctor(doctor_id, first_name=fn_var.get(), surname=sn_var.get(),
+                                     speciality=spec_var.get(), experience=exp)
             win.destroy()
 
         ttk.Button(win, text="Save", command=save).grid(row=4, column=0, columnspan=2, pady=10)
 
     def delete_doctor(self):
-        sel = self.doctor_tree.focus()
-        if not sel:
+        doctor_id = self.doctor_tree.focus_key()
+        if doctor_id is None:
             messagebox.showwarning("Select", "Please select a doctor to delete.")
             return
-        idx = int(sel)
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this doctor?"):
-            self.doctors.pop(idx)
-            self.refresh_doctor_tree()
+            self.store.remove_doctor(doctor_id)
 
     # ==================== PATIENTS ====================
 
@@ -234,10 +527,17 @@ class HospitalGUI:
         self.clear_content()
         ttk.Label(self.content_frame, text="Patients", font=("Arial", 16)).pack(pady=10)
 
+        search_frame = ttk.Frame(self.content_frame)
+        search_frame.pack(fill="x", pady=5)
+        ttk.Label(search_frame, text="Search:").pack(side="left", padx=5)
+        self.patient_query = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=self.patient_query, width=40).pack(side="left")
+        ttk.Label(search_frame, text="name, mobile, postcode or symptom").pack(side="left", padx=5)
+        self.patient_query.trace_add("write", lambda *_: self.schedule_patient_search())
+        self.search_job = None
+
         cols = ("name", "doctor", "age", "mobile", "postcode", "symptoms")
-        self.patient_tree = ttk.Treeview(self.content_frame, columns=cols, show="headings")
-        for c in cols:
-            self.patient_tree.heading(c, text=c.capitalize())
+        self.patient_tree = VirtualTable(self.content_frame, cols, self.patient_row, selectmode="extended")
         self.patient_tree.pack(expand=True, fill="both", pady=5)
 
         self.refresh_patient_tree()
@@ -247,22 +547,33 @@ class HospitalGUI:
 
         ttk.Button(btn_frame, text="Add Patient", command=self.add_patient_window).grid(row=0, column=0, padx=5)
         ttk.Button(btn_frame, text="Discharge Selected", command=self.discharge_patient).grid(row=0, column=1, padx=5)
+        ttk.Button(btn_frame, text="Import...", command=self.import_patients).grid(row=0, column=2, padx=5)
 
     def refresh_patient_tree(self):
-        """Refresh the patient table (Patients tab)."""
-        if not hasattr(self, "patient_tree"):
-            return
-
-        for item in self.patient_tree.get_children():
-            self.patient_tree.delete(item)
-
-        for idx, p in enumerate(self.patients):
-            symptoms_str = "; ".join(p.get_symptoms())
-            self.patient_tree.insert(
-                "", "end", iid=str(idx),
-                values=(p.full_name(), p.get_doctor(), p.get_age(),
-                        p.get_mobile(), p.get_postcode(), symptoms_str)
-            )
+        """Refresh the patient table (Patients tab), filtered by the search box."""
+        table = self.live_table("patient_tree")
+        if table:
+            query = self.patient_filter()
+            if query:
+                table.set_keys(self.store.search_patients(query, self.SEARCH_LIMIT))
+            else:
+                table.set_keys(self.store.patient_items())
+
+    def patient_filter(self):
+        """The text in the Patients search box, or "" when there is none on screen."""
+        if self.live_table("patient_tree") is None:
+            return ""
+        return self.patient_query.get().strip()
+
+    def schedule_patient_search(self):
+        """Search once typing pauses rather than on every keystroke."""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.SEARCH_DELAY_MS, self.run_patient_search)
+
+    def run_patient_search(self):
+        self.search_job = None
+        self.refresh_patient_tree()
 
     def add_patient_window(self):
         win = tk.Toplevel(self.root)
@@ -289,40 +600,113 @@ class HospitalGUI:
                     s = s.strip()
                     if s:
                         p.add_symptom(s)
-            self.patients.append(p)
-            self.refresh_patient_tree()
+            self.store.add_patient(p)
             win.destroy()
 
         ttk.Button(win, text="Save", command=save).grid(row=len(labels), column=0, columnspan=2, pady=10)
 
+    def import_patients(self):
+        """Bulk import a CSV/JSONL file: validated on a worker, committed batch by batch here."""
+        filename = filedialog.askopenfilename(
+            title="Import patients",
+            filetypes=[("CSV or JSONL", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+        if not filename:
+            return
+        importer = PatientImporter(self.store)
+
+        def read(task):
+            for batch in importer.read_batches(filename, task):
+                task.send(batch)
+
+        def commit(batch):
+            try:
+                importer.commit(batch)
+            except sqlite3.Error as e:
+                task.cancel()
+                messagebox.showerror("Error", f"Import stopped, could not save: {e}")
+
+        def done(_):
+            self.task_finished(str(importer.summary))
+            if importer.summary.rejected:
+                messagebox.showinfo("Import", f"{importer.summary}\n\n"
+                                              f"Rejected rows were written to {importer.rejects_filename}")
+
+        def failed(error):
+            self.task_finished(f"Import stopped: {error}")
+            messagebox.showerror("Error", f"Import stopped: {error}")
+
+        task = self.workers.submit("import", read, on_partial=commit, on_progress=self.task_progress,
+                                   on_done=done, on_error=failed,
+                                   on_cancel=lambda: self.task_finished(f"Import cancelled. {importer.summary}"))
+        self.task_started("Importing patients...")
+
     def discharge_patient(self):
-        sel = self.patient_tree.focus()
-        if not sel:
+        """Discharge the selected patients (Ctrl/Shift-click selects several) in one batch."""
+        patient_ids = self.patient_tree.selected_keys()
+        if not patient_ids:
             messagebox.showwarning("Select", "Please select a patient to discharge.")
             return
-        idx = int(sel)
-        patient = self.patients.pop(idx)
-        self.discharged_patients.append(patient)
-        for d in self.doctors:
-            d.remove_patient(patient)
-        self.refresh_patient_tree()
-        messagebox.showinfo("Discharged", "Patient discharged.")
+        if len(patient_ids) > 1 and not messagebox.askyesno(
+                "Discharge", f"Discharge the {len(patient_ids)} selected patients?"):
+            return
+        discharged = self.store.discharge_patients(patient_ids)
+        if len(discharged) == 1:
+            messagebox.showinfo("Discharged", "Patient discharged.")
+        else:
+            messagebox.showinfo("Discharged", f"{len(discharged)} patients discharged.")
 
     # ==================== DISCHARGED ====================
 
+    RECENT_DISCHARGES = "Not archived yet"
+
     def show_discharged(self):
+        """Discharged patients, one archive month at a time (see archive.py)."""
         self.clear_content()
         ttk.Label(self.content_frame, text="Discharged Patients", font=("Arial", 16)).pack(pady=10)
 
-        cols = ("name", "doctor", "age", "mobile", "postcode")
-        tree = ttk.Treeview(self.content_frame, columns=cols, show="headings")
-        for c in cols:
-            tree.heading(c, text=c.capitalize())
-        tree.pack(expand=True, fill="both", pady=5)
-
-        for p in self.discharged_patients:
-            tree.insert("", "end",
-                        values=(p.full_name(), p.get_doctor(), p.get_age(), p.get_mobile(), p.get_postcode()))
+        archive = self.store.archive
+        if archive is not None:
+            bar = ttk.Frame(self.content_frame)
+            bar.pack(pady=5)
+            ttk.Label(bar, text="Show:").pack(side="left")
+            self.discharged_month = tk.StringVar(value=self.RECENT_DISCHARGES)
+            box = ttk.Combobox(bar, textvariable=self.discharged_month, state="readonly",
+                               values=[self.RECENT_DISCHARGES] + archive.months()[::-1])
+            box.pack(side="left", padx=5)
+            box.bind("<<ComboboxSelected>>", lambda e: self.refresh_discharged())
+
+        # patient ID -> (Patient, discharged at) for the rows on show
+        self.discharged_rows = {}
+        cols = ("name", "doctor", "age", "mobile", "postcode", "discharged")
+        self.discharged_tree = VirtualTable(self.content_frame, cols, self.discharged_row)
+        self.discharged_tree.pack(expand=True, fill="both", pady=5)
+        self.refresh_discharged()
+
+    def refresh_discharged(self):
+        store = self.store
+        if store.archive is None:
+            self.discharged_rows = {i: (p, None) for i, p in store.discharged_items().items()}
+        elif self.discharged_month.get() == self.RECENT_DISCHARGES:
+            self.discharged_rows = {i: (p, store.discharged_at(i)) for i, p in store.unarchived_items().items()}
+        else:
+            # a month's partition is read (and decompressed) on a worker
+            month = self.discharged_month.get()
+
+            def loaded(rows):
+                if self.live_table("discharged_tree") and self.discharged_month.get() == month:
+                    self.discharged_rows = rows
+                    self.discharged_tree.set_keys(rows)
+                self.task_finished(f"{len(rows)} patients discharged in {month}.")
+
+            def failed(error):
+                self.task_finished(f"Could not read the archive: {error}")
+
+            self.workers.submit("archive", lambda task: {i: (p, at) for i, p, at in
+                                                         store.archive.patients(month, month)},
+                                on_done=loaded, on_error=failed)
+            self.task_started(f"Reading discharges for {month}...")
+            return
+        self.discharged_tree.set_keys(self.discharged_rows)
 
     # ==================== ASSIGN / RELOCATE ====================
 
@@ -336,21 +720,24 @@ class HospitalGUI:
 
         ttk.Label(frame, text="Patients").grid(row=0, column=0, pady=5)
         p_cols = ("name", "doctor")
-        self.assign_patient_tree = ttk.Treeview(frame, columns=p_cols, show="headings", height=10)
-        for c in p_cols:
-            self.assign_patient_tree.heading(c, text=c.capitalize())
+        self.assign_patient_tree = VirtualTable(frame, p_cols, self.assign_patient_row, height=10,
+                                                selectmode="extended")
         self.assign_patient_tree.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
 
         ttk.Label(frame, text="Doctors").grid(row=0, column=1, pady=5)
         d_cols = ("name", "speciality")
-        self.assign_doctor_tree = ttk.Treeview(frame, columns=d_cols, show="headings", height=10)
-        for c in d_cols:
-            self.assign_doctor_tree.heading(c, text=c.capitalize())
+        self.assign_doctor_tree = VirtualTable(frame, d_cols, self.assign_doctor_row, height=10)
         self.assign_doctor_tree.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
 
         frame.columnconfigure(0, weight=1)
         frame.columnconfigure(1, weight=1)
 
+        # the selected patient's symptoms and the specialities that treat them
+        self.assign_hint = ttk.Label(self.content_frame, text="Select a patient to see matching specialities.",
+                                     wraplength=700, justify="left")
+        self.assign_hint.pack(pady=5)
+        self.assign_patient_tree.tree.bind("<<TreeviewSelect>>", self.show_matching_specialities, add="+")
+
         self.refresh_assign_lists()
 
         ttk.Button(
@@ -360,47 +747,119 @@ class HospitalGUI:
         ).pack(pady=10)
 
     def refresh_assign_lists(self):
-        for item in self.assign_patient_tree.get_children():
-            self.assign_patient_tree.delete(item)
-        for idx, p in enumerate(self.patients):
-            self.assign_patient_tree.insert(
-                "", "end", iid=str(idx),
-                values=(p.full_name(), p.get_doctor())
-            )
-
-        for item in self.assign_doctor_tree.get_children():
-            self.assign_doctor_tree.delete(item)
-        for idx, d in enumerate(self.doctors):
-            self.assign_doctor_tree.insert(
-                "", "end", iid=str(idx),
-                values=(d.full_name(), d.get_speciality())
-            )
+        self.assign_patient_tree.set_keys(self.store.patient_items())
+        self.assign_doctor_tree.set_keys(self.store.doctor_items())
+
+    def show_matching_specialities(self, event=None):
+        """List the specialities that treat the selected patient's symptoms and put their doctors first."""
+        patient_id = self.assign_patient_tree.focus_key()
+        patient = self.store.get_patient(patient_id) if patient_id is not None else None
+        if patient is None:
+            return
+        symptoms = patient.get_symptoms()
+        matches = self.store.matching_specialities(patient_id)
+        if not symptoms:
+            text = f"{patient.full_name()} has no symptoms recorded."
+        elif not matches:
+            text = (f"Symptoms: {', '.join(symptoms)}\n"
+                    "No other patient with these symptoms is assigned yet.")
+        else:
+            text = (f"Symptoms: {', '.join(symptoms)}\nMatching specialities: "
+                    + ", ".join(f"{speciality} ({count})" for speciality, count in matches.items()))
+        self.assign_hint.config(text=text)
+
+        rank = {speciality: i for i, speciality in enumerate(matches)}
+        doctors = self.store.doctor_items()
+        self.assign_doctor_tree.set_keys(
+            sorted(doctors, key=lambda i: rank.get(doctors[i].get_speciality(), len(rank))))
 
     def assign_selected(self):
-        """Assign selected doctor to selected patient (and update all data)."""
-        p_sel = self.assign_patient_tree.focus()
-        d_sel = self.assign_doctor_tree.focus()
+        """Assign the selected doctor to the selected patients (several at once move in one batch)."""
+        patient_ids = self.assign_patient_tree.selected_keys()
+        doctor_id = self.assign_doctor_tree.focus_key()
 
-        if not p_sel or not d_sel:
+        if not patient_ids or doctor_id is None:
             messagebox.showwarning("Select", "Select both a patient and a doctor.")
             return
 
-        p_idx = int(p_sel)
-        d_idx = int(d_sel)
+        # the rows may be stale: another screen or process can have removed either one
+        doctor = self.store.get_doctor(doctor_id)
+        if doctor is None:
+            messagebox.showerror("Error", "That doctor no longer exists.")
+            return
+        if len(patient_ids) == 1:
+            patient = self.store.get_patient(patient_ids[0])
+            if patient is None or not self.store.assign_patient(patient_ids[0], doctor_id):
+                messagebox.showerror("Error", "That patient no longer exists.")
+                return
+            messagebox.showinfo("Assigned", f"{patient.full_name()} assigned to {doctor.full_name()}.")
+        else:
+            moved = self.store.assign_patients(patient_ids, doctor_id)
+            skipped = len(patient_ids) - len(moved)
+            messagebox.showinfo("Assigned", f"{len(moved)} patients assigned to {doctor.full_name()}."
+                                + (f"\n{skipped} of the selected patient(s) no longer exist." if skipped else ""))
 
-        patient = self.patients[p_idx]
-        doctor = self.doctors[d_idx]
+    def show_auto_assign(self):
+        """Screen to assign every patient without a doctor at once, after previewing the plan."""
+        self.clear_content()
+        ttk.Label(self.content_frame, text="Automatic Assignment", font=("Arial", 16)).pack(pady=10)
 
-        for d in self.doctors:
-            d.remove_patient(patient)
+        self.auto_summary = ttk.Label(self.content_frame, text="")
+        self.auto_summary.pack(pady=5)
 
-        doctor.add_patient(patient)
-        patient.link(doctor.full_name())
+        cols = ("patient", "symptoms", "doctor", "speciality", "reason")
+        self.auto_tree = VirtualTable(self.content_frame, cols, self.auto_assign_row, height=12,
+                                      headings={"reason": "Matched by"})
+        self.auto_tree.pack(expand=True, fill="both", pady=5)
 
-        self.refresh_assign_lists()
-        self.refresh_patient_tree()
+        ttk.Label(self.content_frame, text="Patients per doctor").pack()
+        load_cols = ("doctor", "speciality", "before", "after")
+        self.auto_loads = ttk.Treeview(self.content_frame, columns=load_cols, show="headings", height=6)
+        for c in load_cols:
+            self.auto_loads.heading(c, text=c.capitalize())
+        self.auto_loads.pack(fill="x", pady=5)
 
-        messagebox.showinfo("Assigned", f"{patient.full_name()} assigned to {doctor.full_name()}.")
+        btn_frame = ttk.Frame(self.content_frame)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="Recompute", command=self.plan_auto_assign).grid(row=0, column=0, padx=5)
+        ttk.Button(btn_frame, text="Apply", command=self.apply_auto_assign).grid(row=0, column=1, padx=5)
+
+        self.plan_auto_assign()
+
+    def auto_assign_row(self, index):
+        proposal = self.auto_plan.proposals[index]
+        patient = self.store.get_patient(proposal.patient_id)
+        doctor = self.store.get_doctor(proposal.doctor_id)
+        if patient is None or doctor is None:
+            return ("(changed since the plan)", "", "", "", "")
+        return (patient.full_name(), ", ".join(patient.get_symptoms()), doctor.full_name(),
+                proposal.speciality, proposal.reason)
+
+    def plan_auto_assign(self):
+        self.auto_plan = AssignmentEngine(self.store).plan()
+        self.auto_tree.set_keys(range(len(self.auto_plan)))
+        self.auto_loads.delete(*self.auto_loads.get_children())
+        for doctor_id, (before, after) in self.auto_plan.loads.items():
+            doctor = self.store.get_doctor(doctor_id)
+            self.auto_loads.insert("", "end", values=(doctor.full_name(), doctor.get_speciality(), before, after))
+        if self.auto_plan:
+            self.auto_summary.config(text=f"{len(self.auto_plan)} patient(s) without a doctor would be assigned.")
+        elif not self.store.doctor_items():
+            self.auto_summary.config(text="There are no doctors to assign patients to.")
+        else:
+            self.auto_summary.config(text="Every patient already has a doctor.")
+
+    def apply_auto_assign(self):
+        if not self.auto_plan:
+            return
+        try:
+            assigned = self.auto_plan.apply()
+        except ConflictError:
+            messagebox.showwarning("Changed", "Patients were changed by another user in the meantime. "
+                                              "The plan has been recomputed; please review it again.")
+        else:
+            messagebox.showinfo("Assigned", f"{assigned} patient(s) assigned.")
+        self.plan_auto_assign()
 
     def show_relocate(self):
         """Screen for relocating a patient (same logic as assign)."""
@@ -421,47 +880,48 @@ class HospitalGUI:
         ttk.Label(top, text="Doctor:").grid(row=0, column=0, padx=5, pady=5)
         ttk.Label(top, text="Patient:").grid(row=0, column=2, padx=5, pady=5)
         ttk.Label(top, text="Date (YYYY-MM-DD):").grid(row=0, column=4, padx=5, pady=5)
+        ttk.Label(top, text="Start (HH:MM):").grid(row=1, column=0, padx=5, pady=5)
+        ttk.Label(top, text="Length (min):").grid(row=1, column=2, padx=5, pady=5)
 
-        self.appt_doc_var = tk.StringVar()
-        self.appt_pat_var = tk.StringVar()
         self.appt_date_var = tk.StringVar()
+        self.appt_start_var = tk.StringVar(value="09:00")
+        self.appt_length_var = tk.StringVar(value="30")
 
-        doc_names = [d.full_name() for d in self.doctors]
-        pat_names = [p.full_name() for p in self.patients]
-
-        self.doc_combo = ttk.Combobox(top, textvariable=self.appt_doc_var, values=doc_names, state="readonly")
+        # type-ahead: only the top matches for what has been typed are listed
+        self.doc_combo = AutocompleteBox(top, self.store.complete_doctors, self.doctor_label)
         self.doc_combo.grid(row=0, column=1, padx=5, pady=5)
 
-        self.pat_combo = ttk.Combobox(top, textvariable=self.appt_pat_var, values=pat_names, state="readonly")
+        self.pat_combo = AutocompleteBox(top, self.store.complete_patients, self.patient_label, width=30)
         self.pat_combo.grid(row=0, column=3, padx=5, pady=5)
 
         ttk.Entry(top, textvariable=self.appt_date_var).grid(row=0, column=5, padx=5, pady=5)
+        ttk.Entry(top, textvariable=self.appt_start_var).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Entry(top, textvariable=self.appt_length_var).grid(row=1, column=3, padx=5, pady=5)
 
         ttk.Button(top, text="Schedule", command=self.schedule_appointment_gui).grid(row=0, column=6, padx=5, pady=5)
+        ttk.Button(top, text="Free Slots", command=self.show_free_slots).grid(row=1, column=6, padx=5, pady=5)
 
-        cols = ("date", "doctor", "patient")
-        self.appt_tree = ttk.Treeview(self.content_frame, columns=cols, show="headings")
-        for c in cols:
-            self.appt_tree.heading(c, text=c.capitalize())
+        cols = ("date", "time", "doctor", "patient")
+        self.appt_tree = VirtualTable(self.content_frame, cols, self.appointment_row)
         self.appt_tree.pack(expand=True, fill="both", pady=5)
 
         self.refresh_appt_tree()
 
     def schedule_appointment_gui(self):
         """Create an Appointment object from GUI selections."""
-        doc_name = self.appt_doc_var.get()
-        pat_name = self.appt_pat_var.get()
+        doctor_id = self.doc_combo.selected_id()
+        patient_id = self.pat_combo.selected_id()
         date_str = self.appt_date_var.get()
 
-        if not doc_name or not pat_name or not date_str:
+        if not self.doc_combo.get() or not self.pat_combo.get() or not date_str:
             messagebox.showwarning("Missing", "Please select doctor, patient and date.")
             return
 
-        doctor = next((d for d in self.doctors if d.full_name() == doc_name), None)
-        patient = next((p for p in self.patients if p.full_name() == pat_name), None)
+        doctor = self.store.get_doctor(doctor_id) if doctor_id is not None else None
+        patient = self.store.get_patient(patient_id) if patient_id is not None else None
 
         if not doctor or not patient:
-            messagebox.showerror("Error", "Doctor or patient not found.")
+            messagebox.showerror("Error", "Doctor or patient not found. Pick them from the list.")
             return
 
         try:
@@ -470,110 +930,174 @@ class HospitalGUI:
             messagebox.showerror("Error", "Date format must be YYYY-MM-DD.")
             return
 
-        appt = Appointment(doctor, patient, date_obj)
-        self.appointments.append(appt)
-        doctor.add_appointment(appt)
+        try:
+            start = datetime.combine(date_obj, parse_time(self.appt_start_var.get()))
+            length = int(self.appt_length_var.get())
+            if length <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Start must be HH:MM and length a positive number of minutes.")
+            return
+
+        appt = Appointment(doctor, patient, start, start + timedelta(minutes=length))
+        if self.store.add_appointment(appt) is None:
+            clash = self.store.find_conflict(doctor, patient, appt.start, appt.end)
+            messagebox.showerror("Clash", f"That time clashes with:\n{clash}")
+            return
 
-        self.refresh_appt_tree()
         messagebox.showinfo("Scheduled", "Appointment scheduled.")
 
-    def refresh_appt_tree(self):
-        if not hasattr(self, "appt_tree"):
+    def show_free_slots(self):
+        """List the selected doctor's free slots on the chosen date."""
+        doctor_id = self.doc_combo.selected_id()
+        doctor = self.store.get_doctor(doctor_id) if doctor_id is not None else None
+        try:
+            date_obj = datetime.strptime(self.appt_date_var.get(), "%Y-%m-%d").date()
+        except ValueError:
+            date_obj = None
+        if doctor is None or date_obj is None:
+            messagebox.showwarning("Missing", "Please select a doctor and a date.")
             return
-        for item in self.appt_tree.get_children():
-            self.appt_tree.delete(item)
-        for a in self.appointments:
-            self.appt_tree.insert(
-                "", "end",
-                values=(a.date.strftime("%Y-%m-%d"), a.doctor.full_name(), a.patient.full_name())
-            )
+        slots = self.store.free_slots(doctor_id, date_obj)
+        text = "\n".join(f"{a:%H:%M} - {b:%H:%M}" for a, b in slots) or "No free slots."
+        messagebox.showinfo(f"Free slots: {doctor.full_name()} {date_obj}", text)
+
+    def refresh_appt_tree(self):
+        table = self.live_table("appt_tree")
+        if table:
+            table.set_keys(self.store.appointment_items())
 
     # ==================== FAMILIES (SURNAME GROUPING) ====================
 
     def show_families(self):
-        from collections import defaultdict
-
         self.clear_content()
         ttk.Label(self.content_frame, text="Families (Grouped by Surname)", font=("Arial", 16)).pack(pady=10)
 
-        text = tk.Text(self.content_frame, wrap="word")
-        text.pack(expand=True, fill="both", pady=5)
-
-        families = defaultdict(list)
-        for p in self.patients:
-            families[p.get_surname()].append(p)
-
-        if not families:
-            text.insert("end", "No patients available.\n")
-        else:
-            for surname, members in families.items():
-                text.insert("end", f"Family: {surname}\n")
-                for p in members:
-                    line = f"  - {p.full_name()} | Doctor: {p.get_doctor()} | Age: {p.get_age()} | Mobile: {p.get_mobile()} | Postcode: {p.get_postcode()}\n"
-                    text.insert("end", line)
-                text.insert("end", "\n")
+        self.family_surnames = self.store.family_surnames()
+        if not self.family_surnames:
+            ttk.Label(self.content_frame, text="No patients available.").pack(pady=10)
+            return
 
-        text.config(state="disabled")
+        frame = ttk.Frame(self.content_frame)
+        frame.pack(expand=True, fill="both", pady=5)
+        cols = ("doctor", "age", "mobile", "postcode")
+        tree = ttk.Treeview(frame, columns=cols, show="tree headings", selectmode="browse")
+        tree.heading("#0", text="Family / Patient")
+        for c in cols:
+            tree.heading(c, text=c.capitalize())
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=lambda first, last: self._on_family_scroll(scrollbar, first, last))
+        tree.pack(side="left", expand=True, fill="both")
+        scrollbar.pack(side="right", fill="y")
+        tree.bind("<<TreeviewOpen>>", self._open_family)
+
+        # families are added a page at a time as the list scrolls, members when opened
+        self.family_tree = tree
+        self.families_shown = 0
+        self.family_iids = {}   # surname -> tree row
+        self.family_of_iid = {}
+        self.family_opened = set()
+        self._add_family_page()
+
+    def _add_family_page(self):
+        tree = self.live_table("family_tree")
+        if not tree:
+            return
+        end = min(self.families_shown + self.FAMILY_PAGE, len(self.family_surnames))
+        for surname in self.family_surnames[self.families_shown:end]:
+            size = self.store.family_size(surname)
+            if size and surname not in self.family_iids:
+                self._insert_family(tree, surname, size)
+        self.families_shown = end
+
+    def _insert_family(self, tree, surname, size):
+        iid = tree.insert("", "end", text=f"{surname} ({size})", values=("", "", "", ""))
+        tree.insert(iid, "end", text="...")  # placeholder so the family can be opened
+        self.family_iids[surname] = iid
+        self.family_of_iid[iid] = surname
+
+    def _on_family_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if float(last) > 0.9 and self.families_shown < len(self.family_surnames):
+            self.root.after_idle(self._add_family_page)
+
+    def _open_family(self, event=None):
+        tree = self.family_tree
+        iid = tree.focus()
+        if iid in self.family_opened or tree.parent(iid):
+            return
+        self.family_opened.add(iid)
+        self._fill_family(tree, self.family_of_iid[iid], iid)
+
+    def _fill_family(self, tree, surname, iid):
+        tree.delete(*tree.get_children(iid))
+        rows = self.store.family_block(surname, family_rows)
+        for name, values in rows:
+            tree.insert(iid, "end", text=name, values=values)
+        add_rows(len(rows))
+
+    def _update_families(self, surnames):
+        """Bring the Families view in step after its members changed."""
+        tree = self.live_table("family_tree")
+        if not tree:
+            return
+        for surname in surnames:
+            iid = self.family_iids.get(surname)
+            size = self.store.family_size(surname)
+            if iid is None:
+                if not size:
+                    continue
+                # a new family shows now if every page is on screen, else when it scrolls in
+                if self.families_shown >= len(self.family_surnames):
+                    self._insert_family(tree, surname, size)
+                else:
+                    self.family_surnames.append(surname)
+            elif not size:
+                tree.delete(iid)
+                del self.family_iids[surname]
+                del self.family_of_iid[iid]
+                self.family_opened.discard(iid)
+            else:
+                tree.item(iid, text=f"{surname} ({size})")
+                if iid in self.family_opened:
+                    self._fill_family(tree, surname, iid)
 
     # ==================== REPORTS ====================
 
     def show_reports(self):
-        from collections import defaultdict
-
         self.clear_content()
         ttk.Label(self.content_frame, text="Management Report", font=("Arial", 16)).pack(pady=10)
 
         report_box = tk.Text(self.content_frame, wrap="word")
         report_box.pack(expand=True, fill="both", pady=5)
-
-        report_box.insert("end", f"1. Total Doctors: {len(self.doctors)}\n\n")
-
-        report_box.insert("end", "2. Patients per Doctor:\n")
-        patients_per_doc = {}
-        for d in self.doctors:
-            count = d.get_total_patients()
-            patients_per_doc[d.full_name()] = count
-            report_box.insert("end", f"   - {d.full_name()}: {count}\n")
-        report_box.insert("end", "\n")
-
-        report_box.insert("end", "3. Appointments per Month per Doctor:\n")
-        appts_per_month = defaultdict(lambda: defaultdict(int))
-        for a in self.appointments:
-            doctor_name = a.doctor.full_name()
-            ym = a.date.strftime("%Y-%m")
-            appts_per_month[doctor_name][ym] += 1
-
-        if not self.appointments:
-            report_box.insert("end", "   No appointments have been scheduled yet.\n\n")
-        else:
-            for doctor_name, months in appts_per_month.items():
-                report_box.insert("end", f"   - {doctor_name}:\n")
-                for ym, count in months.items():
-                    report_box.insert("end", f"       {ym}: {count} appointment(s)\n")
-            report_box.insert("end", "\n")
-
-        report_box.insert("end", "4. Patients by Illness Type:\n")
-        illness_count = defaultdict(int)
-        for p in self.patients:
-            for s in p.get_symptoms():
-                illness_count[s] += 1
-
-        if not illness_count:
-            report_box.insert("end", "   No symptoms/illness data recorded yet.\n")
-        else:
-            for illness, count in illness_count.items():
-                report_box.insert("end", f"   - {illness}: {count} patient(s)\n")
-
+        report_box.insert("end", "Preparing report...\n")
         report_box.config(state="disabled")
 
-        ttk.Button(
-            self.content_frame,
-            text="Show Charts (for reports)",
-            command=lambda: self.show_charts(patients_per_doc, illness_count, appts_per_month)
-        ).pack(pady=10)
-
-    def show_charts(self, patients_per_doc, illness_count, appts_per_month):
-        """Draw simple bar charts in a new Tkinter window."""
+        chart_button = ttk.Button(self.content_frame, text="Show Charts (for reports)", state="disabled")
+        chart_button.pack(pady=10)
+
+        since = months_back(11)
+
+        def done(result):
+            text, charts, archived = result
+            self.task_finished("Report ready.")
+            if not report_box.winfo_exists():
+                return  # the user has moved on to another screen
+            # discharges not archived yet are counted here, on the thread that owns the store
+            text += discharge_lines(self.store.discharges_per_month(since, archived=archived))
+            report_box.config(state="normal")
+            report_box.delete("1.0", "end")
+            report_box.insert("end", text)
+            report_box.config(state="disabled")
+            chart_button.config(state="normal", command=lambda: self.show_charts(*charts))
+
+        self.workers.submit("report", prepare_report, self.store.report, self.store.doctors(),
+                            self.store.archive, since, on_done=done, on_error=lambda e: self.task_finished(f"Report failed: {e}"),
+                            on_cancel=lambda: self.task_finished("Report cancelled."))
+        self.task_started("Preparing report...")
+
+    def show_charts(self, patients_per_doc, illness_count, appt_dict):
+        """Draw simple bar charts in a new Tkinter window (data from prepare_report)."""
         win = tk.Toplevel(self.root)
         win.title("Management Report Charts")
 
@@ -615,20 +1139,12 @@ class HospitalGUI:
                 canvas.create_text((bx1 + bx2) / 2, chart_bottom + 15, text=short_label, font=("Arial", 7), angle=45)
 
         # Chart 1: Patients per doctor
-        pd_clean = {k if k else "No doctor": v for k, v in patients_per_doc.items()}
-        draw_bar_chart(20, 20, 260, 180, pd_clean, "Patients per Doctor")
+        draw_bar_chart(20, 20, 260, 180, patients_per_doc, "Patients per Doctor")
 
         # Chart 2: Patients by illness
         draw_bar_chart(320, 20, 260, 180, illness_count, "Patients by Illness")
 
         # Chart 3: Appointments per month per doctor (flattened)
-        flat_labels = []
-        flat_counts = []
-        for doctor, months in appts_per_month.items():
-            for ym, count in months.items():
-                flat_labels.append(f"{doctor} {ym}")
-                flat_counts.append(count)
-        appt_dict = dict(zip(flat_labels, flat_counts))
         draw_bar_chart(620, 20, 260, 180, appt_dict, "Appointments per Month/Doctor")
 
     # ==================== ADMIN DETAILS ====================
@@ -663,11 +1179,88 @@ class HospitalGUI:
 
         ttk.Button(frame, text="Save Changes", command=save).grid(row=3, column=0, columnspan=2, pady=10)
 
+    # ==================== DIAGNOSTICS ====================
+
+    def show_diagnostics(self):
+        self.clear_content()
+        ttk.Label(self.content_frame, text="Diagnostics", font=("Arial", 16)).pack(pady=10)
+
+        if not INSTRUMENTED:
+            ttk.Label(self.content_frame, text="Instrumentation is off. Start the program with "
+                                               "HOSPITAL_PROFILE=1 (or =cprofile) to collect timings.").pack(pady=10)
+            return
+
+        cols = ("operation", "calls", "errors", "total", "p50", "p99", "rows")
+        headings = {"total": "Total (s)", "p50": "p50 (ms)", "p99": "p99 (ms)"}
+        tree = ttk.Treeview(self.content_frame, columns=cols, show="headings", height=20)
+        for c in cols:
+            tree.heading(c, text=headings.get(c, c.capitalize()))
+            tree.column(c, width=260 if c == "operation" else 80, anchor="w" if c == "operation" else "e")
+        tree.pack(expand=True, fill="both", pady=5)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for row in instruments.summaries():
+                tree.insert("", "end", values=(row['name'], row['calls'], row['errors'], f"{row['total']:.3f}",
+                                               f"{row['p50'] * 1000:.2f}", f"{row['p99'] * 1000:.2f}", row['rows']))
+
+        def reset():
+            instruments.reset()
+            refresh()
+
+        def save_profile():
+            filename = filedialog.asksaveasfilename(title="Save cProfile data", defaultextension=".prof",
+                                                    filetypes=[("Profile", "*.prof"), ("All files", "*.*")])
+            if filename:
+                try:
+                    instruments.dump_profile(filename)
+                except OSError as e:
+                    messagebox.showerror("Error", f"Error saving profile: {e}")
+                    return
+                self.status_var.set(f"Profile written to {filename}")
+
+        btn_frame = ttk.Frame(self.content_frame)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="Refresh", command=refresh).grid(row=0, column=0, padx=5)
+        ttk.Button(btn_frame, text="Reset", command=reset).grid(row=0, column=1, padx=5)
+        ttk.Button(btn_frame, text="Save Profile...", command=save_profile,
+                   state="normal" if instruments.profiler is not None else "disabled").grid(row=0, column=2, padx=5)
+        refresh()
+
     # ==================== SAVE & QUIT ====================
 
     def save_and_quit(self):
-        self.admin.save_patients_to_file(self.patients, 'patients.txt')
-        self.root.destroy()
+        if not self.patients_loaded:
+            if self.workers.active_tasks():
+                messagebox.showwarning("Busy", "Patients are still loading. Please wait.")
+                return
+            if messagebox.askyesno("Incomplete data",
+                                   "Not every patient was loaded, so saving would drop the rest.\n"
+                                   "Quit without saving?"):
+                self.workers.shutdown()
+                self.root.destroy()
+            return
+
+        # copy on the Tk thread, with other processes' changes merged in; the workers only write it
+        if self.store.journal is not None:
+            self.store.journal.catch_up()
+
+        def done(_):
+            self.workers.shutdown()
+            self.root.destroy()
+
+        def failed(error):
+            self.task_finished("Save failed.")
+            messagebox.showerror("Error", f"Error saving data: {error}")
+
+        self.save_in_background("save", on_done=done, on_error=failed,
+                                on_cancel=lambda: self.task_finished("Saved; quit cancelled."))
+        self.task_started("Saving...")
+
+
+# timed when HOSPITAL_PROFILE is set (see instrumentation.py)
+instrument_methods(HospitalGUI, 'gui', names=('run_patient_search', '_update_patient_rows'),
+                   predicate=lambda name: name.startswith(('show_', 'refresh_')))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+
+# HOSPITAL_PROFILE=1 turns the timers on; HOSPITAL_PROFILE=cprofile also records a cProfile
+MODE = os.environ.get('HOSPITAL_PROFILE', '').strip().lower()
+ENABLED = MODE not in ('', '0', 'off', 'false', 'no')
+PROFILING = MODE == 'cprofile'
+
+
+class OperationStats:
+    """Counters for one instrumented operation."""
+
+    # latencies kept for the percentiles; older ones are dropped
+    SAMPLES = 2048
+
+    __slots__ = ('name', 'calls', 'errors', 'total', 'rows', 'samples')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def record(self, seconds, rows, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total += seconds
+        self.rows += rows
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self):
+        return {'name': self.name, 'calls': self.calls, 'errors': self.errors, 'total': self.total,
+                'mean': self.total / self.calls if self.calls else 0.0,
+                'p50': self.percentile(50), 'p99': self.percentile(99), 'rows': self.rows}
+
+
+class Instruments:
+    """Timers and counters for the instrumented operations, plus the optional cProfile."""
+
+    def __init__(self, profiling=False):
+        self.__lock = threading.Lock()
+        self.__stats = {}
+        self.__local = threading.local()
+        self.profiler = cProfile.Profile() if profiling else None
+
+    def _stack(self):
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        return stack
+
+    def wrap(self, name, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            stack = self._stack()
+            frame = [0]  # rows touched while this call runs
+            stack.append(frame)
+            profile = (self.profiler is not None and len(stack) == 1
+                       and threading.current_thread() is threading.main_thread())
+            if profile:
+                self.profiler.enable()
+            failed = True
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                if profile:
+                    self.profiler.disable()
+                stack.pop()
+                self.record(name, elapsed, frame[0], failed)
+        return timed
+
+    def add_rows(self, count):
+        for frame in self._stack():
+            frame[0] += count
+
+    def record(self, name, seconds, rows=0, failed=False):
+        with self.__lock:
+            stats = self.__stats.get(name)
+            if stats is None:
+                stats = self.__stats[name] = OperationStats(name)
+            stats.record(seconds, rows, failed)
+
+    def summaries(self):
+        """One dict per operation (calls, errors, total/mean/p50/p99 seconds, rows), slowest total first."""
+        with self.__lock:
+            rows = [stats.summary() for stats in self.__stats.values()]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def reset(self):
+        with self.__lock:
+            self.__stats.clear()
+            if self.profiler is not None:
+                self.profiler = cProfile.Profile()
+
+    def report(self):
+        """The counters as a text table (plus the top of the profile in cProfile mode)."""
+        if not ENABLED:
+            return "Instrumentation is off; set HOSPITAL_PROFILE=1 (or =cprofile) and restart.\n"
+        lines = [f"{'Operation':40} {'Calls':>7} {'Errors':>6} {'Total s':>9} "
+                 f"{'p50 ms':>9} {'p99 ms':>9} {'Rows':>9}\n"]
+        for row in self.summaries():
+            lines.append(f"{row['name'][:40]:40} {row['calls']:7} {row['errors']:6} {row['total']:9.3f} "
+                         f"{row['p50'] * 1000:9.2f} {row['p99'] * 1000:9.2f} {row['rows']:9}\n")
+        if len(lines) == 1:
+            lines.append("No operations recorded yet.\n")
+        if self.profiler is not None:
+            lines.append("\n" + self.profile_text())
+        return "".join(lines)
+
+    def profile_text(self, limit=25):
+        out = io.StringIO()
+        try:
+            pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        except TypeError:  # nothing profiled yet
+            return "No profile recorded yet.\n"
+        return out.getvalue()
+
+    def dump_profile(self, filename):
+        """Write the cProfile data for pstats/snakeviz; False when not in cProfile mode."""
+        if self.profiler is None:
+            return False
+        self.profiler.dump_stats(filename)
+        return True
+
+
+instruments = Instruments(PROFILING)
+
+
+def instrument(name):
+    """Decorator timing a function as operation `name`; returns it untouched when disabled."""
+    def decorate(fn):
+        return instruments.wrap(name, fn) if ENABLED else fn
+    return decorate
+
+
+def instrument_methods(cls, prefix, names=None, predicate=None):
+    """Time the listed methods of `cls` (or those whose name passes `predicate`) as "prefix.method"."""
+    if not ENABLED:
+        return cls
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and (attr in (names or ()) or (predicate is not None and predicate(attr))):
+            setattr(cls, attr, instruments.wrap(f"{prefix}.{attr}", value))
+    return cls
+
+
+def add_rows(count):
+    """Count rows read or written by the operations running on this thread."""
+    if ENABLED:
+        instruments.add_rows(count)
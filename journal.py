@@ -0,0 +1,352 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from admin import Appointment
+from doctor import Doctor
+from loader import patient_from_record, patient_record
+
+
+class Journal:
+    """Append-only log of every change made to a HospitalStore, one JSON line each.
+
+    store.journal_seq is the last record the in-memory data reflects; replay()
+    applies the ones after it. Processes sharing the data make every change
+    inside writing() (see sharing.SharedDataset).
+    """
+
+    def __init__(self, path, store, sync_every=64, sync_interval=1.0, compact_every=50000):
+        """
+        Args:
+            path (string): the journal file
+            store (HospitalStore): the store being journalled
+            sync_every (int): records written between fsyncs
+            sync_interval (float): longest time in seconds between fsyncs
+            compact_every (int): journal length at which needs_compaction() says yes
+        """
+        self.path = path
+        self.store = store
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        # writes come from the Tk thread, truncation from the save worker
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__records = 0
+        self.__unsynced = 0
+        self.__last_sync = time.monotonic()
+        # how far into the file this process has read (its own records included)
+        self.__read_offset = 0
+        # set while applying records, so they are not journalled a second time
+        self.__applying = False
+        # lines of the batch in progress (see HospitalStore.batch), else None
+        self.__batch = None
+        self.__shared_lock = store.shared.lock if store.shared is not None else None
+        self.__writer = _Writing(self)
+
+    # ---------- sharing ----------
+
+    def writing(self):
+        """Context for one change (or a batch): shared lock held, other processes caught up."""
+        return self.__writer
+
+    def _begin_write(self):
+        lock = self.__shared_lock
+        if lock is not None:
+            lock.acquire()
+            if lock.depth() == 1:
+                try:
+                    self._reopen_if_replaced()
+                    self._read_new(replaying=False)
+                except BaseException:
+                    lock.release()
+                    raise
+
+    def _end_write(self):
+        if self.__shared_lock is not None:
+            self.__shared_lock.release()
+
+    def catch_up(self, wait=True):
+        """Apply the changes other processes journalled since we last looked; returns how many.
+
+        With `wait` off, gives up (returning 0) if another process is writing.
+        """
+        lock = self.__shared_lock
+        if lock is None:
+            return 0
+        if not lock.acquire(wait):
+            return 0
+        try:
+            return self._read_new(replaying=False)
+        finally:
+            lock.release()
+
+    @staticmethod
+    def touched(record):
+        """(kind, ID) of the record a journal entry changed."""
+        op = record['op']
+        if op in ('add_doctor', 'update_doctor', 'remove_doctor'):
+            return 'doctor', record['id']
+        if op in ('add_patient', 'add_discharged'):
+            return 'patient', record['id']
+        if op == 'add_appointment':
+            return 'appointment', record['id']
+        return 'patient', record['patient']
+
+    # ---------- recovery ----------
+
+    def replay(self):
+        """Apply the records the store has not seen yet; returns how many were applied.
+
+        A torn last line (the program died mid-write) is cut off. If the
+        journal does not continue from the loaded data (e.g. the snapshot
+        was lost and the text file loaded instead), it is set aside as
+        `path + '.orphan'` rather than applied to the wrong base.
+        """
+        lock = self.__shared_lock or contextlib.nullcontext()
+        with lock:
+            self.__read_offset = 0
+            self.__records = 0
+            return self._read_new(replaying=True)
+
+    def _read_new(self, replaying):
+        """Apply the complete records after the read offset (caller holds the shared lock)."""
+        applied = 0
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.__read_offset = 0
+            return 0
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self.__read_offset:
+                # compacted by a process that could not see this one (see SharedDataset.alone)
+                print("The journal was compacted by another process; re-reading it")
+                self.__read_offset = 0
+                self.__records = 0
+            if size == self.__read_offset:
+                return 0
+            f.seek(self.__read_offset)
+            good_end = self.__read_offset
+            torn = False
+            for line in f:
+                if not line.endswith(b'\n'):
+                    torn = True
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    torn = True
+                    break
+                seq = record['seq']
+                if seq > self.store.journal_seq + 1:
+                    if replaying:
+                        f.close()
+                        os.replace(self.path, self.path + '.orphan')
+                        print(f"Journal does not follow the saved data; moved it to {self.path}.orphan")
+                        self.__records = 0
+                        self.__read_offset = 0
+                        return applied
+                    print(f"Journal record {seq} does not follow {self.store.journal_seq}; "
+                          f"changes after it are not applied")
+                    break
+                good_end += len(line)
+                self.__records += 1
+                if seq <= self.store.journal_seq:
+                    continue  # already in the snapshot
+                self.__applying = True
+                try:
+                    self._apply(record)
+                finally:
+                    self.__applying = False
+                self.store.journal_seq = seq
+                self.store.versions[self.touched(record)] = seq
+                applied += 1
+            self.__read_offset = good_end
+        if torn:
+            # writes happen under the shared lock, so this is a writer that died mid-line
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+        return applied
+
+    def _apply(self, record):
+        store = self.store
+        op = record['op']
+        if op == 'add_doctor':
+            store.add_doctor(Doctor(record['first_name'], record['surname'], record['speciality'],
+                                    record['experience']), record['id'])
+        elif op == 'update_doctor':
+            store.update_doctor(record['id'], record['first_name'], record['surname'],
+                                record['speciality'], record['experience'])
+        elif op == 'remove_doctor':
+            store.remove_doctor(record['id'])
+        elif op == 'add_patient':
+            store.add_patient(patient_from_record(record), record['id'])
+        elif op == 'add_discharged':
+            store.add_discharged(patient_from_record(record), record['id'])
+        elif op == 'assign':
+            store.assign_patient(record['patient'], record['doctor'])
+        elif op == 'add_symptom':
+            store.add_symptom(record['patient'], record['symptom'])
+        elif op == 'discharge':
+            at = record.get('at')  # records from before discharge times were kept have none
+            store.discharge_patient(record['patient'], datetime.fromisoformat(at) if at else None)
+        elif op == 'add_appointment':
+            doctor = store.get_doctor(record['doctor'])
+            patient = store.get_any_patient(record['patient'])
+            if doctor is not None and patient is not None:
+                store.add_appointment(Appointment(doctor, patient, datetime.fromisoformat(record['start']),
+                                                  datetime.fromisoformat(record['end'])),
+                                      record['id'], check_conflicts=False)
+
+    # ---------- writing ----------
+
+    def append(self, record):
+        if self.__applying:
+            return
+        with self.__writer, self.__lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'ab')
+            self.store.journal_seq += 1
+            record['seq'] = self.store.journal_seq
+            line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+            self.store.versions[self.touched(record)] = record['seq']
+            self.__records += 1
+            self.__unsynced += 1
+            if self.__batch is not None:
+                self.__batch.append(line)
+                return
+            self.__file.write(line)
+            self.__file.flush()
+            self.__read_offset += len(line)
+            if (self.__unsynced >= self.sync_every
+                    or time.monotonic() - self.__last_sync >= self.sync_interval):
+                self._sync()
+
+    def _reopen_if_replaced(self):
+        """Drop the append handle if another process replaced (compacted) the file under it."""
+        with self.__lock:
+            if self.__file is None:
+                return
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(self.__file.fileno()).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if replaced:
+                self.__file.close()
+                self.__file = None
+
+    def sync(self):
+        """fsync everything written so far (call when the program goes idle)."""
+        with self.__lock:
+            if self.__unsynced:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.__file.fileno())
+        self.__unsynced = 0
+        self.__last_sync = time.monotonic()
+
+    def needs_compaction(self):
+        return self.__records >= self.compact_every
+
+    def truncate(self, up_to_seq):
+        """Drop the records up to `up_to_seq` once a snapshot holding them is on disk."""
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+            keep = []
+            with contextlib.suppress(FileNotFoundError), open(self.path, 'rb') as f:
+                # records written while the snapshot was being saved stay, and so do
+                # any another process added that this one has not applied yet
+                keep = [line for line in f if json.loads(line)['seq'] > up_to_seq]
+            tmp_name = self.path + '.tmp'
+            with open(tmp_name, 'wb') as f:
+                f.writelines(keep)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, self.path)
+            self.__records = len(keep)
+            seen = self.store.journal_seq
+            self.__read_offset = sum(len(line) for line in keep if json.loads(line)['seq'] <= seen)
+            self.__unsynced = 0
+
+    def close(self):
+        with self.__lock:
+            if self.__file is not None:
+                if self.__unsynced:
+                    self._sync()
+                self.__file.close()
+                self.__file = None
+
+    # ---------- store listener ----------
+
+    def on_batch_started(self):
+        self.__batch = []
+
+    def on_batch_finished(self):
+        lines, self.__batch = self.__batch, None
+        if lines:
+            data = b''.join(lines)
+            with self.__lock:
+                # a compaction may have swapped the file while the batch ran
+                if self.__file is None:
+                    self.__file = open(self.path, 'ab')
+                self.__file.write(data)
+                self.__file.flush()
+                self.__read_offset += len(data)
+                self._sync()
+
+    def on_doctor_added(self, doctor_id, doctor):
+        self.append({'op': 'add_doctor', 'id': doctor_id, 'first_name': doctor.get_first_name(),
+                     'surname': doctor.get_surname(), 'speciality': doctor.get_speciality(),
+                     'experience': doctor.get_experience()})
+
+    def on_doctor_updated(self, doctor_id, doctor, old_name):
+        self.append({'op': 'update_doctor', 'id': doctor_id, 'first_name': doctor.get_first_name(),
+                     'surname': doctor.get_surname(), 'speciality': doctor.get_speciality(),
+                     'experience': doctor.get_experience()})
+
+    def on_doctor_removed(self, doctor_id, doctor, released_patients):
+        self.append({'op': 'remove_doctor', 'id': doctor_id})
+
+    def on_patient_added(self, patient_id, patient):
+        self.append(dict(patient_record(patient), op='add_patient', id=patient_id))
+
+    def on_discharged_added(self, patient_id, patient):
+        self.append(dict(patient_record(patient), op='add_discharged', id=patient_id))
+
+    def on_patient_assigned(self, patient_id, patient, old_doctor, new_doctor):
+        self.append({'op': 'assign', 'patient': patient_id, 'doctor': self.store.doctor_id(new_doctor)})
+
+    def on_symptom_added(self, patient_id, patient, symptom):
+        self.append({'op': 'add_symptom', 'patient': patient_id, 'symptom': symptom})
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        at = self.store.discharged_at(patient_id)
+        self.append({'op': 'discharge', 'patient': patient_id, 'at': at.isoformat() if at else None})
+
+    def on_appointment_added(self, appointment_id, appointment):
+        self.append({'op': 'add_appointment', 'id': appointment_id,
+                     'doctor': self.store.doctor_id(appointment.doctor),
+                     'patient': self.store.patient_id(appointment.patient),
+                     'start': appointment.start.isoformat(), 'end': appointment.end.isoformat()})
+
+
+class _Writing:
+    """The reusable context manager behind Journal.writing(), cheap enough to wrap every change."""
+
+    __slots__ = ('journal',)
+
+    def __init__(self, journal):
+        self.journal = journal
+
+    def __enter__(self):
+        self.journal._begin_write()
+
+    def __exit__(self, *exc):
+        self.journal._end_write()
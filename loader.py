@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from patient import Patient
+
+
+# patients files are written and read as UTF-8 whatever the platform's locale
+ENCODING = 'utf-8'
+
+
+def split_patient_line(line):
+    """Split one line of patients.txt into plain fields, or None for blank/short lines.
+
+    Format: first_name,surname,age,mobile,postcode,doctor_name,symptom;symptom
+
+    Returns (first_name, surname, age, mobile, postcode, doctor_name, symptoms)
+    with symptoms a tuple; plain tuples are cheap to send between processes.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    parts = line.split(',')
+    if len(parts) < 6:
+        return None
+    first_name, surname, age_str, mobile, postcode, doctor_name = parts[:6]
+    symptoms_str = ",".join(parts[6:])  # in case there are extra commas
+
+    try:
+        age = int(age_str)
+    except ValueError:
+        age = 0
+
+    symptoms = ()
+    if symptoms_str:
+        symptoms = tuple(s for s in (s.strip() for s in symptoms_str.split(';')) if s)
+    return first_name, surname, age, mobile, postcode, doctor_name, symptoms
+
+
+def patient_from_fields(fields):
+    """Build a Patient from the tuple returned by split_patient_line."""
+    first_name, surname, age, mobile, postcode, doctor_name, symptoms = fields
+    patient = Patient(first_name, surname, age, mobile, postcode)
+
+    if doctor_name and doctor_name != 'None':
+        patient.link(doctor_name)
+    for symptom in symptoms:
+        patient.add_symptom(symptom)
+    return patient
+
+
+def patient_record(patient):
+    """A patient as the JSON object the journal and the discharge archive store."""
+    return {'first_name': patient.get_first_name(), 'surname': patient.get_surname(),
+            'age': patient.get_age(), 'mobile': patient.get_mobile(),
+            'postcode': patient.get_postcode(), 'doctor': patient.get_doctor(),
+            'symptoms': list(patient.get_symptoms())}
+
+
+def patient_from_record(record):
+    """Build a Patient from the object returned by patient_record."""
+    return patient_from_fields((record['first_name'], record['surname'], record['age'], record['mobile'],
+                                record['postcode'], record['doctor'], record['symptoms']))
+
+
+def parse_patient_line(line):
+    """Parse one line of patients.txt into a Patient, or None for blank/short lines."""
+    fields = split_patient_line(line)
+    return None if fields is None else patient_from_fields(fields)
+
+
+def iter_patients(filename):
+    """Yield patients from `filename` one at a time as lines are parsed."""
+    with open(filename, 'r', encoding=ENCODING) as f:
+        for line in f:
+            patient = parse_patient_line(line)
+            if patient is not None:
+                yield patient
+
+
+# below this size, starting worker processes costs more than it saves
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def shard_files(path):
+    """The patient files behind `path`: the file itself, or a directory's files in name order."""
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if not name.startswith('.') and not name.endswith('.tmp')
+            and os.path.isfile(os.path.join(path, name))]
+
+
+def line_ranges(filename, chunk_bytes=CHUNK_BYTES):
+    """Split a file into (start, end) byte ranges of about `chunk_bytes`, each ending on a line end."""
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    with open(filename, 'rb') as f:
+        while start < size:
+            end = start + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()  # move on to the start of the next line
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(filename, start, end):
+    """Worker: parse the lines in one byte range into split_patient_line tuples."""
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows = []
+    for line in data.decode(ENCODING).split('\n'):
+        fields = split_patient_line(line)
+        if fields is not None:
+            rows.append(fields)
+    return rows
+
+
+def iter_patients_parallel(path, workers=None, chunk_bytes=CHUNK_BYTES):
+    """Yield patients from a file or shard directory, parsed by a pool of processes.
+
+    The input is cut into line-aligned byte ranges which the workers parse
+    into plain tuples; Patients are built here in file order, so the result
+    is the same as iter_patients over the shards in name order. Only a few
+    ranges per worker are in flight at once, which bounds memory use.
+    """
+    ranges = [(f, start, end) for f in shard_files(path) for start, end in line_ranges(f, chunk_bytes)]
+    workers = workers or os.cpu_count() or 1
+    # spawn rather than fork: the GUI calls this from a worker thread
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        queued = iter(ranges)
+        pending = deque()
+        for args in queued:
+            pending.append(pool.submit(parse_range, *args))
+            if len(pending) == workers * 2:
+                break
+        while pending:
+            rows = pending.popleft().result()
+            args = next(queued, None)
+            if args is not None:
+                pending.append(pool.submit(parse_range, *args))
+            for fields in rows:
+                yield patient_from_fields(fields)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_patient_source(path, workers=None):
+    """Patients from a file or shard directory, in parallel when that pays off.
+
+    Raises FileNotFoundError when `path` does not exist.
+    """
+    files = shard_files(path)
+    size = sum(os.path.getsize(f) for f in files)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and size >= PARALLEL_MIN_BYTES:
+        return iter_patients_parallel(path, workers)
+    if len(files) == 1:
+        return iter_patients(files[0])
+    return (p for f in files for p in iter_patients(f))
+
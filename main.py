@@ -1,6 +1,7 @@
+import os
+
 from admin import Admin
-from doctor import Doctor
-from patient import Patient
+from store import checkpoint_store, create_default_store, save_store
 
 
 def main():
@@ -8,32 +9,8 @@ def main():
 
     admin = Admin('admin', '123', 'B1 1AB')  # username is 'admin', password is '123'
 
-    doctors = [
-        Doctor('John', 'Smith', 'Internal Med.'),
-        Doctor('Jone', 'Smith', 'Pediatrics'),
-        Doctor('Jone', 'Carlos', 'Cardiology')
-    ]
-
-    try:
-        patients = admin.load_patients_from_file('patients.txt')
-        if not patients:
-            raise FileNotFoundError
-    except (FileNotFoundError, Exception):
-        patients = [
-            Patient('Sara', 'Smith', 20, '07012345678', 'B1 234'),
-            Patient('Mike', 'Jones', 37, '07555551234', 'L2 2AB'),
-            Patient('Daivd', 'Smith', 15, '07123456789', 'C1 ABC')
-        ]
-
-    appointments = []
-
-    doctor_lookup = {d.full_name(): d for d in doctors}
-    for p in patients:
-        doc_name = p.get_doctor()
-        if doc_name in doctor_lookup:
-            doctor_lookup[doc_name].add_patient(p)
-
-    discharged_patients = []
+    # set HOSPITAL_DB to a path to keep the data in SQLite instead of patients.txt
+    store = create_default_store(admin, 'patients.txt', os.environ.get('HOSPITAL_DB'))
 
     while True:
         if admin.login():
@@ -53,55 +30,75 @@ def main():
         print(' 7- Management Report')
         print(' 8- Schedule Appointment')
         print(' 9- View patients grouped by surname (family)')
-        print('10- Quit')
+        print('10- Import patients from CSV/JSONL')
+        print('11- Search patients')
+        print('12- Diagnostics')
+        print('13- Assign doctors automatically')
+        print('14- Quit')
 
         op = input('Option: ')
 
         if op == '1':
-            admin.doctor_management(doctors)
+            admin.doctor_management(store)
 
         elif op == '2':
-            admin.view_patient(patients)
+            admin.view_patient(store.patient_items())
             while True:
                 op2 = input('Do you want to discharge a patient(Y/N):').lower()
                 if op2 in ('yes', 'y'):
-                    admin.discharge(patients, discharged_patients)
+                    admin.discharge(store)
                 elif op2 in ('no', 'n'):
                     break
                 else:
                     print('Please answer by yes or no.')
 
         elif op == '3':
-            admin.view_discharge(discharged_patients)
+            admin.view_discharge(store)
 
         elif op == '4':
-            admin.assign_doctor_to_patient(patients, doctors)
+            admin.assign_doctor_to_patient(store)
 
         elif op == '5':
             admin.update_details()
 
         elif op == '6':
-            admin.relocate_patient(patients, doctors)
+            admin.relocate_patient(store)
 
         elif op == '7':
-            admin.management_report(doctors, patients, appointments)
+            admin.management_report(store)
             input("Press Enter to return to the menu...")
 
         elif op == '8':
-            admin.schedule_appointment(doctors, patients, appointments)
+            admin.schedule_appointment(store)
 
         elif op == '9':
-            admin.view_patients_by_surname(patients)
+            admin.view_patients_by_surname(store)
 
         elif op == '10':
+            admin.import_patients(store)
+
+        elif op == '11':
+            admin.search_patients(store)
+
+        elif op == '12':
+            admin.diagnostics()
+
+        elif op == '13':
+            admin.auto_assign(store)
+
+        elif op == '14':
             print("Saving data...")
-            admin.save_patients_to_file(patients, 'patients.txt')
+            save_store(admin, store, 'patients.txt')
             running = False
             print("Goodbye!")
 
         else:
             print('Invalid option. Try again')
 
+        # every change is already in the journal; make it durable while the menu waits
+        if running:
+            checkpoint_store(admin, store, 'patients.txt')
+
 
 if __name__ == '__main__':
     main()
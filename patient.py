@@ -1,6 +1,13 @@
+import sys
+
+
 class Patient:
     """Patient class"""
 
+    # no per-instance __dict__: large rosters keep hundreds of thousands of these
+    __slots__ = ('__first_name', '__surname', '__age', '__mobile', '__postcode',
+                 '__doctor', '__symptoms')
+
     def __init__(self, first_name, surname, age, mobile, postcode):
         """
         Args:
@@ -18,7 +25,7 @@ class Patient:
         self.__postcode = postcode
 
         self.__doctor = 'None'
-        self.__symptoms = []
+        self.__symptoms = None  # list allocated on the first symptom
 
     def full_name(self):
         """full name is first_name and surname"""
@@ -54,10 +61,16 @@ class Patient:
             print(", ".join(self.__symptoms))
 
     def add_symptom(self, symptom):
-        self.__symptoms.append(symptom)
+        # symptoms repeat across patients, so share one string per distinct symptom
+        symptom = sys.intern(symptom)
+        if self.__symptoms is None:
+            self.__symptoms = [symptom]
+        else:
+            self.__symptoms.append(symptom)
 
     def get_symptoms(self):
-        return self.__symptoms
+        """The patient's symptoms (an empty tuple when there are none)."""
+        return self.__symptoms or ()
 
     def __str__(self):
         return f'{self.full_name():^30}|{self.__doctor:^30}|{self.__age:^5}|{self.__mobile:^15}|{self.__postcode:^10}'
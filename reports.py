@@ -0,0 +1,102 @@
+import threading
+from collections import defaultdict
+
+from analytics import WEEKDAYS, ReportEngine
+
+
+class ReportAggregator:
+    """Management report counts kept up to date as the store changes."""
+
+    def __init__(self, symptoms):
+        """
+        Args:
+            symptoms (SymptomIndex): the store's symptom index
+        """
+        self.__lock = threading.Lock()
+        self.__symptoms = symptoms
+        # doctor -> {(year, month): count}; doctors are keyed by object so renames carry over
+        self.__appts_per_month = {}
+        self.__appointment_total = 0
+        # Monday..Sunday
+        self.__appts_per_weekday = [0] * 7
+
+    # ---------- store listener ----------
+
+    def on_appointment_added(self, appointment_id, appointment):
+        key = (appointment.date.year, appointment.date.month)
+        with self.__lock:
+            months = self.__appts_per_month.setdefault(appointment.doctor, {})
+            months[key] = months.get(key, 0) + 1
+            self.__appointment_total += 1
+            self.__appts_per_weekday[appointment.date.weekday()] += 1
+
+    # ---------- report ----------
+
+    def appointment_total(self):
+        return self.__appointment_total
+
+    def patients_per_doctor(self, doctors):
+        """Doctor name -> number of assigned patients (rosters keep their own size)."""
+        return {d.full_name(): d.get_total_patients() for d in doctors}
+
+    def appointments_per_month(self):
+        """Doctor name -> {"YYYY-MM": count}, in the order they were first scheduled."""
+        result = defaultdict(lambda: defaultdict(int))
+        with self.__lock:
+            for doctor, months in self.__appts_per_month.items():
+                for (year, month), count in months.items():
+                    result[doctor.full_name()][f"{year:04d}-{month:02d}"] += count
+        return result
+
+    def appointments_per_weekday(self):
+        """"Mon".."Sun" -> appointments on that day of the week."""
+        with self.__lock:
+            return dict(zip(WEEKDAYS, self.__appts_per_weekday))
+
+    def illness_count(self):
+        """Symptom -> number of active patients reporting it."""
+        return defaultdict(int, self.__symptoms.illness_count())
+
+    def snapshot(self, doctors):
+        """(patients_per_doctor, appointments_per_month, illness_count) in one call.
+
+        Safe to call from a worker thread given a list of doctors taken on the
+        thread that owns the store.
+        """
+        return self.patients_per_doctor(doctors), self.appointments_per_month(), self.illness_count()
+
+    # ---------- consistency check ----------
+
+    def check(self, store):
+        """Compare the maintained counts with a full rescan of the store.
+
+        Returns a list of human-readable differences; empty means consistent.
+        """
+        problems = []
+        rescan = ReportEngine.from_store(store)
+
+        illness_count = rescan.illness_count()
+        maintained = dict(self.illness_count())
+        if illness_count != maintained:
+            problems.append(f"illness counts differ: maintained {maintained}, rescan {illness_count}")
+        problems.extend(self.__symptoms.check(store))
+
+        appts_per_month = rescan.appointments_per_month()
+        maintained = {name: dict(months) for name, months in self.appointments_per_month().items()}
+        if appts_per_month != maintained:
+            problems.append(f"appointments per month differ: maintained {maintained}, rescan {appts_per_month}")
+        weekdays = rescan.histogram('weekday')
+        if weekdays != self.appointments_per_weekday():
+            problems.append(f"appointments per weekday differ: maintained {self.appointments_per_weekday()}, "
+                            f"rescan {weekdays}")
+
+        on_roster = defaultdict(int)
+        for p in store.patient_items().values():
+            doctor = store.doctor_of(p)
+            if doctor is not None:
+                on_roster[doctor] += 1
+        for d in store.doctors():
+            if on_roster[d] != d.get_total_patients():
+                problems.append(f"{d.full_name()} has {d.get_total_patients()} patients, "
+                                f"rescan found {on_roster[d]}")
+        return problems
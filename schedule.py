@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+
+WORKDAY_START = time(9, 0)
+WORKDAY_END = time(17, 0)
+
+
+class Calendar:
+    """Bookings of one doctor (or patient), kept sorted by start time."""
+
+    def __init__(self):
+        self.__starts = []   # sorted start datetimes
+        self.__entries = []  # (start, end, appointment_id), same order
+        # set once two bookings overlap (e.g. loaded without a clash check); the
+        # quick lookups below assume none do, so they fall back to a scan
+        self.__overlapping = False
+
+    def __len__(self):
+        return len(self.__starts)
+
+    def add(self, start, end, appointment_id):
+        if not self.__overlapping and self.conflict(start, end) is not None:
+            self.__overlapping = True
+        index = bisect_right(self.__starts, start)
+        self.__starts.insert(index, start)
+        self.__entries.insert(index, (start, end, appointment_id))
+
+    def remove(self, start, appointment_id):
+        index = bisect_left(self.__starts, start)
+        while index < len(self.__entries) and self.__starts[index] == start:
+            if self.__entries[index][2] == appointment_id:
+                del self.__starts[index]
+                del self.__entries[index]
+                return True
+            index += 1
+        return False
+
+    def conflict(self, start, end):
+        """ID of a booking overlapping [start, end), or None."""
+        index = bisect_left(self.__starts, end)
+        if self.__overlapping:
+            for other_start, other_end, appointment_id in reversed(self.__entries[:index]):
+                if other_end > start:
+                    return appointment_id
+            return None
+        # without overlaps the booking starting latest before `end` is the only one that can reach past `start`
+        if index > 0:
+            other_start, other_end, appointment_id = self.__entries[index - 1]
+            if other_end > start:
+                return appointment_id
+        return None
+
+    def between(self, start, end):
+        """(start, end, appointment_id) for bookings starting in [start, end)."""
+        return self.__entries[bisect_left(self.__starts, start):bisect_left(self.__starts, end)]
+
+    def on_day(self, day):
+        first = datetime.combine(day, time.min)
+        return self.between(first, first + timedelta(days=1))
+
+    def free_slots(self, day, length=timedelta(minutes=30), day_start=WORKDAY_START, day_end=WORKDAY_END):
+        """Gaps of at least `length` between bookings within the working day."""
+        cursor = datetime.combine(day, day_start)
+        closing = datetime.combine(day, day_end)
+        # a booking from before the window may still be running at opening time
+        index = bisect_left(self.__starts, cursor)
+        if self.__overlapping:
+            cursor = max([cursor] + [end for _, end, _ in self.__entries[:index]])
+        elif index > 0:
+            cursor = max(cursor, self.__entries[index - 1][1])
+
+        slots = []
+        for start, end, _ in self.between(cursor, closing):
+            if start - cursor >= length:
+                slots.append((cursor, start))
+            cursor = max(cursor, end)
+        if closing - cursor >= length:
+            slots.append((cursor, closing))
+        return slots
+
+
+def parse_time(text):
+    """Parse "HH:MM" into a time, or raise ValueError."""
+    return datetime.strptime(text.strip(), "%H:%M").time()
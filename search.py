@@ -0,0 +1,189 @@
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Lower-case words of `text` ("Chest pain" -> ["chest", "pain"])."""
+    return TOKEN_RE.findall(text.casefold())
+
+
+def trigrams(token):
+    """Trigrams of a token padded at both ends, so short words still get a few."""
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PatientSearchIndex:
+    """Word index over active patients for the search boxes, with prefix and typo matching."""
+
+    # fuzzy matches need at least this share of trigrams in common
+    MIN_SIMILARITY = 0.2
+    # how many vocabulary words a prefix or fuzzy term may expand to
+    MAX_EXPANSIONS = 20
+
+    def __init__(self):
+        # token -> {patient ID: None}; dicts keep patients in insertion order
+        self.__postings = defaultdict(dict)
+        self.__words = []                       # sorted non-numeric tokens
+        self.__word_trigrams = defaultdict(set)  # trigram -> tokens
+        # new words wait here until the next query, so bulk loads do not
+        # pay for keeping the word list sorted one insert at a time
+        self.__new_words = {}
+
+    # ---------- store listener ----------
+
+    def on_patient_added(self, patient_id, patient):
+        for token in self.patient_tokens(patient):
+            self._add(token, patient_id)
+
+    def on_symptom_added(self, patient_id, patient, symptom):
+        for token in tokenize(symptom):
+            self._add(token, patient_id)
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        for token in self.patient_tokens(patient):
+            self._remove(token, patient_id)
+
+    @staticmethod
+    def patient_tokens(patient):
+        tokens = set(tokenize(patient.full_name()))
+        postcode = tokenize(patient.get_postcode())
+        tokens.update(postcode)
+        # "B1 1AB" is also searchable as "b11ab"
+        tokens.add(''.join(postcode))
+        mobile = patient.get_mobile()
+        tokens.add(mobile if mobile.isdigit() else ''.join(ch for ch in mobile if ch.isdigit()))
+        for symptom in patient.get_symptoms():
+            tokens.update(tokenize(symptom))
+        tokens.discard('')
+        return tokens
+
+    def _add(self, token, patient_id):
+        posting = self.__postings.get(token)
+        if posting is None:
+            posting = self.__postings[token] = {}
+            if not token.isdigit():
+                self.__new_words[token] = None
+        posting[patient_id] = None
+
+    def _remove(self, token, patient_id):
+        posting = self.__postings.get(token)
+        if posting is None:
+            return
+        posting.pop(patient_id, None)
+        if posting:
+            return
+        del self.__postings[token]
+        if token in self.__new_words:
+            del self.__new_words[token]
+        elif not token.isdigit():
+            del self.__words[bisect_left(self.__words, token)]
+            for gram in trigrams(token):
+                words = self.__word_trigrams[gram]
+                words.discard(token)
+                if not words:
+                    del self.__word_trigrams[gram]
+
+    def _add_new_words(self):
+        new_words = self.__new_words
+        if len(new_words) < 32:
+            for word in new_words:
+                insort(self.__words, word)
+        else:
+            # the list is already sorted, so this is a merge rather than a full sort
+            self.__words.extend(sorted(new_words))
+            self.__words.sort()
+        for word in new_words:
+            for gram in trigrams(word):
+                self.__word_trigrams[gram].add(word)
+        new_words.clear()
+
+    # ---------- queries ----------
+
+    def expand(self, term):
+        """Index tokens `term` can stand for, as (weight, token), best first.
+
+        An exact token weighs 1; words starting with the term 0.8; words
+        sharing enough trigrams (typos) up to 0.6, by similarity.
+        """
+        if self.__new_words:
+            self._add_new_words()
+        matches = {}
+        if term in self.__postings:
+            matches[term] = 1.0
+        if not term.isdigit():
+            i = bisect_left(self.__words, term)
+            words = self.__words
+            while i < len(words) and words[i].startswith(term) and len(matches) < self.MAX_EXPANSIONS:
+                matches.setdefault(words[i], 0.8)
+                i += 1
+            if not matches:
+                matches.update(self._fuzzy(term))
+        return sorted(((weight, token) for token, weight in matches.items()), reverse=True)
+
+    def _fuzzy(self, term):
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for word in self.__word_trigrams.get(gram, ()):
+                shared[word] += 1
+        scored = []
+        for word, count in shared.items():
+            similarity = count / (len(grams) + len(trigrams(word)) - count)
+            if similarity >= self.MIN_SIMILARITY:
+                scored.append((similarity, word))
+        scored.sort(reverse=True)
+        return {word: 0.6 * similarity for similarity, word in scored[:self.MAX_EXPANSIONS]}
+
+    def search(self, query, limit=50):
+        """IDs of active patients matching every word of `query`, best matches first.
+
+        The rarest term drives the scan and the others are membership
+        checks, so a query touches at most a few postings per result.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        expansions = [[(weight, self.__postings[token]) for weight, token in self.expand(term)]
+                      for term in terms]
+        if not all(expansions):
+            return []
+        expansions.sort(key=lambda e: sum(len(p) for _, p in e))
+        driver, others = expansions[0], expansions[1:]
+
+        scores = {}
+        for weight, posting in driver:
+            for patient_id in posting:
+                if patient_id in scores:
+                    continue
+                score = weight
+                for expansion in others:
+                    best = next((w for w, p in expansion if patient_id in p), 0)
+                    if not best:
+                        break
+                    score += best
+                else:
+                    scores[patient_id] = score
+                    if len(scores) >= limit:
+                        break
+            if len(scores) >= limit:
+                break
+        return sorted(scores, key=lambda i: (-scores[i], i))
+
+    def check(self, store):
+        """Compare the index with a rebuild from the store; returns a list of differences."""
+        rebuilt = PatientSearchIndex()
+        for patient_id, patient in store.patient_items().items():
+            rebuilt.on_patient_added(patient_id, patient)
+        for index in (self, rebuilt):
+            index._add_new_words()
+        problems = []
+        if {t: set(p) for t, p in self.__postings.items()} != {t: set(p) for t, p in rebuilt.__postings.items()}:
+            problems.append("search postings differ from a rebuild")
+        if self.__words != rebuilt.__words:
+            problems.append("search vocabulary differs from a rebuild")
+        return problems
@@ -0,0 +1,622 @@
+import asyncio
+import base64
+import binascii
+import contextlib
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+
+from admin import Admin, Appointment
+from schedule import parse_time
+from snapshot import pack_snapshot
+from store import create_default_store, save_store
+
+
+class HTTPError(Exception):
+    """Ends a request with an HTTP error status and a JSON {"error": message} body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'params')
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.params = {}
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        return data
+
+    def arg(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def int_arg(self, name, default=None):
+        value = self.arg(name)
+        if value is None:
+            return default
+        return to_int(value, name)
+
+
+def to_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+
+
+class EntityLocks:
+    """asyncio locks per record, e.g. ('patient', 7), created on demand."""
+
+    def __init__(self):
+        self.__locks = {}   # key -> [lock, users]
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *keys):
+        keys = sorted(set(keys))
+        entries = []
+        for key in keys:
+            entry = self.__locks.get(key)
+            if entry is None:
+                entry = self.__locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            entries.append((key, entry))
+        acquired = []
+        try:
+            for _, entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield
+        finally:
+            for lock in acquired:
+                lock.release()
+            for key, entry in entries:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.__locks[key]
+
+    def __len__(self):
+        return len(self.__locks)
+
+
+class HospitalService:
+    """HTTP/JSON front end to a HospitalStore, for several front desks at once.
+
+    Every route but /health needs the admin's login, sent with HTTP Basic
+    authentication. List endpoints are paged with `offset` and `limit`.
+
+    Routes:
+        GET  /health
+        GET  /doctors                      GET /doctors/{id}
+        GET  /doctors/{id}/free-slots?date=YYYY-MM-DD[&minutes=30]
+        GET  /patients[?q=search&surname=&symptom=a,b] GET /patients/{id}
+        GET  /patients/{id}/specialities
+        POST /patients/{id}/assign         {"doctor": id}
+        POST /patients/{id}/relocate       {"doctor": id}
+        POST /patients/{id}/discharge
+        GET  /discharged[?month=YYYY-MM]   not archived yet, or one archived month
+        GET  /discharged/months[?since=YYYY-MM&until=YYYY-MM]
+        GET  /appointments[?doctor=&patient=&date=]
+        POST /appointments                 {"doctor", "patient", "date", "time", "minutes"}
+        GET  /report
+        GET  /symptoms[?with=symptom]      patients per symptom, or co-occurrence
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+    MAX_BODY = 1 << 20
+    # keep-alive connections idle for longer than this are closed
+    IDLE_TIMEOUT = 30.0
+    # how often the journal is synced and, when long, compacted
+    CHECKPOINT_SECONDS = 5.0
+    # how often a change waiting for another process's lock on the files tries again
+    LOCK_RETRY_SECONDS = 0.05
+
+    def __init__(self, store, admin=None, filename='patients.txt'):
+        """
+        Args:
+            store (HospitalStore): the shared store
+            admin (Admin, optional): used for saving. Defaults to the standard admin
+            filename (string): the patients file the store is saved to
+        """
+        self.store = store
+        self.admin = admin or Admin('admin', '123', 'B1 1AB')
+        self.filename = filename
+        self.locks = EntityLocks()
+        self.server = None
+        self.__checkpointer = None
+        self.__saving = False
+        self.__connections = set()  # open (keep-alive) connection writers
+        self.routes = [
+            ('GET', r'/health', self.health),
+            ('GET', r'/doctors', self.list_doctors),
+            ('GET', r'/doctors/(?P<doctor>\d+)', self.get_doctor),
+            ('GET', r'/doctors/(?P<doctor>\d+)/free-slots', self.free_slots),
+            ('GET', r'/patients', self.list_patients),
+            ('GET', r'/patients/(?P<patient>\d+)', self.get_patient),
+            ('GET', r'/patients/(?P<patient>\d+)/specialities', self.patient_specialities),
+            ('POST', r'/patients/(?P<patient>\d+)/assign', self.assign),
+            ('POST', r'/patients/(?P<patient>\d+)/relocate', self.relocate),
+            ('POST', r'/patients/(?P<patient>\d+)/discharge', self.discharge),
+            ('GET', r'/discharged', self.list_discharged),
+            ('GET', r'/discharged/months', self.discharges_per_month),
+            ('GET', r'/appointments', self.list_appointments),
+            ('POST', r'/appointments', self.schedule),
+            ('GET', r'/report', self.report),
+            ('GET', r'/symptoms', self.symptoms),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in self.routes]
+
+    # ---------- JSON views ----------
+
+    def doctor_json(self, doctor_id, d):
+        return {'id': doctor_id, 'first_name': d.get_first_name(), 'surname': d.get_surname(),
+                'full_name': d.full_name(), 'speciality': d.get_speciality(),
+                'experience': d.get_experience(), 'patients': d.get_total_patients()}
+
+    def patient_json(self, patient_id, p):
+        return {'id': patient_id, 'first_name': p.get_first_name(), 'surname': p.get_surname(),
+                'full_name': p.full_name(), 'age': p.get_age(), 'mobile': p.get_mobile(),
+                'postcode': p.get_postcode(), 'doctor': p.get_doctor(), 'symptoms': list(p.get_symptoms())}
+
+    def appointment_json(self, appointment_id, a):
+        return {'id': appointment_id, 'doctor': self.store.doctor_id(a.doctor), 'doctor_name': a.doctor.full_name(),
+                'patient': self.store.patient_id(a.patient), 'patient_name': a.patient.full_name(),
+                'start': a.start.isoformat(timespec='minutes'), 'end': a.end.isoformat(timespec='minutes')}
+
+    def page(self, request, items, total, view):
+        """One page of `items` (an iterable of (id, record)) as {"items", "offset", "limit", "total", "next"}."""
+        offset = max(0, request.int_arg('offset', 0))
+        limit = min(max(1, request.int_arg('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        rows = [view(record_id, record) for record_id, record in islice(items, offset, offset + limit)]
+        end = offset + len(rows)
+        return {'items': rows, 'offset': offset, 'limit': limit, 'total': total,
+                'next': end if end < total else None}
+
+    def require_patient(self, request):
+        patient_id = int(request.params['patient'])
+        patient = self.store.get_patient(patient_id)
+        if patient is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "patient not found")
+        return patient_id, patient
+
+    def require_doctor(self, doctor_id):
+        doctor = self.store.get_doctor(doctor_id)
+        if doctor is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "doctor not found")
+        return doctor
+
+    @staticmethod
+    def parse_date(value, name='date'):
+        try:
+            return datetime.strptime(value or '', "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be YYYY-MM-DD")
+
+    # ---------- reads ----------
+
+    async def health(self, request):
+        return {'status': 'ok', 'doctors': len(self.store.doctor_items()),
+                'patients': self.store.patient_count(), 'journal_seq': self.store.journal_seq}
+
+    async def list_doctors(self, request):
+        doctors = self.store.doctor_items()
+        return self.page(request, iter(doctors.items()), len(doctors), self.doctor_json)
+
+    async def get_doctor(self, request):
+        doctor_id = int(request.params['doctor'])
+        return self.doctor_json(doctor_id, self.require_doctor(doctor_id))
+
+    async def free_slots(self, request):
+        doctor_id = int(request.params['doctor'])
+        self.require_doctor(doctor_id)
+        day = self.parse_date(request.arg('date'))
+        minutes = request.int_arg('minutes')
+        slots = self.store.free_slots(doctor_id, day, timedelta(minutes=minutes) if minutes else None)
+        return {'doctor': doctor_id, 'date': day.isoformat(),
+                'slots': [[start.strftime("%H:%M"), end.strftime("%H:%M")] for start, end in slots]}
+
+    async def list_patients(self, request):
+        store = self.store
+        query = (request.arg('q') or '').strip()
+        surname = request.arg('surname')
+        symptom = request.arg('symptom')
+        if query:
+            # search results are ranked, so a page is cut from the best MAX_LIMIT + offset
+            offset = max(0, request.int_arg('offset', 0))
+            ids = store.search_patients(query, offset + self.MAX_LIMIT)
+            items = ((i, store.get_patient(i)) for i in ids)
+            return self.page(request, items, len(ids), self.patient_json)
+        if surname is not None:
+            members = store.find_patients_by_surname(surname)
+            return self.page(request, ((store.patient_id(p), p) for p in members), len(members),
+                             self.patient_json)
+        if symptom is not None:
+            ids = store.symptoms.patients_with_all(s for s in symptom.split(',') if s.strip())
+            return self.page(request, ((i, store.get_patient(i)) for i in ids), len(ids), self.patient_json)
+        patients = store.patient_items()
+        return self.page(request, iter(patients.items()), len(patients), self.patient_json)
+
+    async def get_patient(self, request):
+        return self.patient_json(*self.require_patient(request))
+
+    async def patient_specialities(self, request):
+        patient_id, patient = self.require_patient(request)
+        return {'patient': patient_id, 'symptoms': list(patient.get_symptoms()),
+                'specialities': self.store.matching_specialities(patient_id)}
+
+    def discharged_json(self, patient_id, row):
+        patient, at = row
+        return dict(self.patient_json(patient_id, patient),
+                    discharged=at.isoformat(timespec='seconds') if at else None)
+
+    async def list_discharged(self, request):
+        store = self.store
+        month = request.arg('month')
+        if store.archive is None:
+            discharged = store.discharged_items()
+            return self.page(request, iter(discharged.items()), len(discharged), self.patient_json)
+        if month is None:
+            discharged = store.unarchived_items()
+            items = ((i, (p, store.discharged_at(i))) for i, p in discharged.items())
+            return self.page(request, items, len(discharged), self.discharged_json)
+        # one partition, read (and decompressed) in a thread
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [(i, (p, at)) for i, p, at in store.archive.patients(month, month)])
+        return self.page(request, iter(rows), len(rows), self.discharged_json)
+
+    async def discharges_per_month(self, request):
+        since, until = request.arg('since'), request.arg('until')
+        archived = None
+        if self.store.archive is not None:
+            archived = await asyncio.get_running_loop().run_in_executor(
+                None, self.store.archive.discharges_per_month, since, until)
+        counts = self.store.discharges_per_month(since, until, archived)
+        return {'since': since, 'until': until, 'months': {month or 'unknown': count
+                                                           for month, count in counts.items()}}
+
+    async def list_appointments(self, request):
+        store = self.store
+        doctor_id = request.int_arg('doctor')
+        patient_id = request.int_arg('patient')
+        day = request.arg('date')
+        if doctor_id is not None:
+            appointments = store.appointments_for_doctor(doctor_id)
+        elif patient_id is not None:
+            appointments = store.appointments_for_patient(patient_id)
+        elif day is not None:
+            appointments = store.appointments_on(self.parse_date(day))
+        else:
+            appointments = list(store.appointment_items().values())
+        if day is not None and (doctor_id is not None or patient_id is not None):
+            day = self.parse_date(day)
+            appointments = [a for a in appointments if a.date == day]
+        items = ((store.appointment_id(a), a) for a in appointments)
+        return self.page(request, items, len(appointments), self.appointment_json)
+
+    async def report(self, request):
+        patients_per_doctor, appointments_per_month, illness_count = \
+            self.store.report.snapshot(self.store.doctors())
+        return {'doctors': len(self.store.doctor_items()),
+                'patients_per_doctor': patients_per_doctor,
+                'appointments_per_month': {name: dict(months) for name, months in appointments_per_month.items()},
+                'illness_count': dict(illness_count)}
+
+    async def symptoms(self, request):
+        symptom = request.arg('with')
+        if symptom is not None:
+            return {'symptom': symptom, 'patients': len(self.store.symptoms.patients_with(symptom)),
+                    'co_occurrence': self.store.symptoms.co_occurrence(symptom)}
+        return {'illness_count': self.store.symptoms.illness_count()}
+
+    # ---------- changes ----------
+
+    @contextlib.asynccontextmanager
+    async def writing(self):
+        """Hold the lock shared with other processes, caught up with their changes.
+
+        The lock is polled so that the loop keeps serving while another
+        process (the GUI, or a save in a thread) holds it.
+        """
+        shared = self.store.shared
+        if shared is None:
+            yield
+            return
+        while not shared.lock.acquire(blocking=False):
+            await asyncio.sleep(self.LOCK_RETRY_SECONDS)
+        try:
+            if self.store.journal is not None:
+                self.store.journal.catch_up()
+            yield
+        finally:
+            shared.lock.release()
+
+    async def durable(self):
+        """Wait until the changes made so far are synced to the journal on disk."""
+        journal = self.store.journal
+        if journal is not None:
+            await asyncio.get_running_loop().run_in_executor(None, journal.sync)
+
+    async def assign(self, request, relocate=False):
+        patient_id = int(request.params['patient'])
+        doctor_id = to_int(request.json().get('doctor'), 'doctor')
+        async with self.locks.hold(('patient', patient_id), ('doctor', doctor_id)):
+            async with self.writing():
+                patient_id, patient = self.require_patient(request)
+                self.require_doctor(doctor_id)
+                if relocate and patient.get_doctor() == 'None':
+                    raise HTTPError(HTTPStatus.CONFLICT, "patient has no doctor to relocate from; assign instead")
+                self.store.assign_patient(patient_id, doctor_id)
+            await self.durable()
+            return self.patient_json(patient_id, patient)
+
+    async def relocate(self, request):
+        return await self.assign(request, relocate=True)
+
+    async def discharge(self, request):
+        patient_id = int(request.params['patient'])
+        async with self.locks.hold(('patient', patient_id)):
+            async with self.writing():
+                self.require_patient(request)
+                patient = self.store.discharge_patient(patient_id)
+            await self.durable()
+            return self.patient_json(patient_id, patient)
+
+    async def schedule(self, request):
+        data = request.json()
+        doctor_id = to_int(data.get('doctor'), 'doctor')
+        patient_id = to_int(data.get('patient'), 'patient')
+        day = self.parse_date(data.get('date'))
+        try:
+            start = datetime.combine(day, parse_time(str(data.get('time', '09:00'))))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "time must be HH:MM")
+        minutes = to_int(data.get('minutes', 30), 'minutes')
+        if minutes <= 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "minutes must be positive")
+
+        async with self.locks.hold(('doctor', doctor_id), ('patient', patient_id)):
+            async with self.writing():
+                doctor = self.require_doctor(doctor_id)
+                patient = self.store.get_patient(patient_id)
+                if patient is None:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, "patient not found")
+                appointment = Appointment(doctor, patient, start, start + timedelta(minutes=minutes))
+                appointment_id = self.store.add_appointment(appointment)
+                if appointment_id is None:
+                    clash = self.store.find_conflict(doctor, patient, appointment.start, appointment.end)
+                    raise HTTPError(HTTPStatus.CONFLICT, f"clashes with an existing appointment: {clash}")
+            await self.durable()
+            return self.appointment_json(appointment_id, appointment)
+
+    # ---------- persistence ----------
+
+    async def checkpoint(self):
+        """Periodically sync the journal, catch up with other processes and compact it off the loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.CHECKPOINT_SECONDS)
+            journal = self.store.journal
+            if journal is None:
+                continue
+            try:
+                await loop.run_in_executor(None, journal.sync)
+                # apply what other processes sharing the files changed, unless one is writing
+                journal.catch_up(wait=False)
+                if journal.needs_compaction() and not self.__saving:
+                    await self.save()
+            except Exception as e:
+                # keep checkpointing; the next round may succeed (e.g. once the disk has room)
+                print(f"Error at checkpoint: {e!r}", file=sys.stderr)
+
+    async def save(self):
+        """Save the store; the copies are taken on the loop, the archive and files are written in a thread."""
+        store = self.store
+        loop = asyncio.get_running_loop()
+        self.__saving = True
+        try:
+            if store.backend is None:
+                async with self.writing():
+                    rows, journal_seq = store.archive_rows(), store.journal_seq
+                await loop.run_in_executor(None, store.write_archive, rows, journal_seq)
+                async with self.writing():
+                    store.forget_archived(rows)
+                    patients, snapshot, journal_seq = store.patients(), pack_snapshot(store), store.journal_seq
+                await loop.run_in_executor(
+                    None, save_store, self.admin, store, self.filename, patients, snapshot, journal_seq)
+            else:
+                # the backend reads the store itself, so it runs on the loop
+                save_store(self.admin, store, self.filename)
+        finally:
+            self.__saving = False
+
+    # ---------- HTTP ----------
+
+    def authorized(self, request):
+        """True if the request carries the admin's login (HTTP Basic)."""
+        scheme, _, credentials = request.headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'basic':
+            return False
+        try:
+            username, _, password = base64.b64decode(credentials, validate=True).decode().partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        return self.admin.check_credentials(username, password)
+
+    async def dispatch(self, request):
+        if request.path != '/health' and not self.authorized(request):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "log in with the admin username and password (HTTP Basic)")
+        allowed = []
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if match:
+                if method == request.method:
+                    request.params = match.groupdict()
+                    return HTTPStatus.OK, await handler(request)
+                allowed.append(method)
+        if allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"use {' or '.join(allowed)}")
+        raise HTTPError(HTTPStatus.NOT_FOUND, "no such endpoint")
+
+    @staticmethod
+    async def read_line(reader):
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            # longer than the stream's 64 KiB limit
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "request line or header too long")
+
+    async def read_request(self, reader):
+        """The next request on a connection, or None once the client has gone."""
+        try:
+            line = await asyncio.wait_for(self.read_line(reader), self.IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+        headers = {}
+        while True:
+            line = await self.read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = to_int(headers.get('content-length', 0), 'Content-Length')
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must not be negative")
+        if length > self.MAX_BODY:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "body too large")
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        headers[':version'] = version
+        return Request(method.upper(), url.path.rstrip('/') or '/', parse_qs(url.query), headers, body)
+
+    @staticmethod
+    def keep_alive(request):
+        connection = request.headers.get('connection', '').lower()
+        if request.headers[':version'] == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def handle_connection(self, reader, writer):
+        self.__connections.add(writer)
+        try:
+            while True:
+                request = None
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = self.keep_alive(request)
+                    status, payload = await self.dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                    # a request that could not be read may have left bytes behind; do not reuse
+                    keep_alive = request is not None and self.keep_alive(request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    what = f"{request.method} {request.path}" if request is not None else "request"
+                    print(f"Error handling {what}: {e!r}", file=sys.stderr)
+                    status, payload, keep_alive = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal error'}, False
+                body = json.dumps(payload, separators=(',', ':')).encode()
+                challenge = ('WWW-Authenticate: Basic realm="hospital"\r\n'
+                             if status == HTTPStatus.UNAUTHORIZED else '')
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"{challenge}"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.__connections.discard(writer)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.__checkpointer = asyncio.create_task(self.checkpoint())
+        return self.server
+
+    async def stop(self, save=True):
+        if self.__checkpointer is not None:
+            self.__checkpointer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__checkpointer
+            self.__checkpointer = None
+        if self.server is not None:
+            self.server.close()
+            # idle keep-alive connections would otherwise wait out IDLE_TIMEOUT
+            for writer in list(self.__connections):
+                writer.close()
+            await self.server.wait_closed()
+            await asyncio.sleep(0)
+        if save:
+            await self.save()
+        if self.store.journal is not None:
+            self.store.journal.close()
+
+    async def serve_forever(self, host='127.0.0.1', port=8080):
+        server = await self.start(host, port)
+        addresses = ', '.join(str(sock.getsockname()[:2]) for sock in server.sockets)
+        print(f"Serving the hospital API on {addresses}")
+        try:
+            await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main(argv=None):
+    """Command line: python service.py [--host 127.0.0.1] [--port 8080] [--db PATH]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the hospital data over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on; clients log in with the admin username and password")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--file', default='patients.txt', help="patients file (default: patients.txt)")
+    parser.add_argument('--db', help="SQLite database to serve instead of the patients file")
+    args = parser.parse_args(argv)
+
+    admin = Admin('admin', '123', 'B1 1AB')
+    store = create_default_store(admin, args.file, args.db)
+    service = HospitalService(store, admin, args.file)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ConflictError(Exception):
+    """A record was changed (e.g. by another process) after the caller read it."""
+
+    def __init__(self, kind, record_id):
+        super().__init__(f"{kind} {record_id} was changed by someone else")
+        self.kind = kind
+        self.record_id = record_id
+
+
+def lock_file(f, exclusive=True, blocking=True):
+    """Take an advisory lock on an open file; returns False if `blocking` is off and it is taken."""
+    if fcntl is not None:
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            return False
+        return True
+    # msvcrt only has exclusive locks; lock the first byte
+    f.seek(0)
+    mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), mode, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            # LK_LOCK gives up after 10 seconds; keep waiting
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Exclusive lock between processes, through a lock file; re-entrant within a process."""
+
+    def __init__(self, path):
+        self.path = path
+        self.__thread_lock = threading.RLock()
+        self.__depth = 0
+        self.__file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with `blocking` off, returns False at once if another holder has it."""
+        if not self.__thread_lock.acquire(blocking):
+            return False
+        if self.__depth == 0:
+            try:
+                f = open(self.path, 'a+b')
+                if not lock_file(f, blocking=blocking):
+                    f.close()
+                    self.__thread_lock.release()
+                    return False
+            except BaseException:
+                self.__thread_lock.release()
+                raise
+            self.__file = f
+        self.__depth += 1
+        return True
+
+    def release(self):
+        self.__depth -= 1
+        if self.__depth == 0:
+            unlock_file(self.__file)
+            self.__file.close()
+            self.__file = None
+        self.__thread_lock.release()
+
+    def depth(self):
+        """How many times this process holds the lock (only meaningful while holding it)."""
+        return self.__depth
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class SharedDataset:
+    """The lock and user count of the processes working on one patients file."""
+
+    def __init__(self, filename='patients.txt'):
+        """
+        Args:
+            filename (string): the patients file the processes share
+        """
+        base = os.path.splitext(filename)[0]
+        self.lock = FileLock(base + '.lock')
+        self.users_path = base + '.users'
+        self.__users = None
+
+    def attach(self):
+        """Register this process as a user; call before reading the saved data."""
+        if self.__users is None:
+            users = open(self.users_path, 'a+b')
+            if fcntl is not None:
+                # waits while another process is compacting (see alone)
+                lock_file(users, exclusive=False)
+            self.__users = users
+
+    def detach(self):
+        if self.__users is not None:
+            if fcntl is not None:
+                unlock_file(self.__users)
+            self.__users.close()
+            self.__users = None
+
+    @contextlib.contextmanager
+    def alone(self):
+        """Yield True if no other process is attached; they are kept out until the block ends.
+
+        Without flock (Windows) the other users cannot be counted, so this
+        yields False and the journal is kept.
+        """
+        if fcntl is None or self.__users is None:
+            yield fcntl is not None
+            return
+        # flock cannot upgrade in place, so drop the shared lock and try for an exclusive one
+        unlock_file(self.__users)
+        alone = lock_file(self.__users, exclusive=True, blocking=False)
+        try:
+            yield alone
+        finally:
+            lock_file(self.__users, exclusive=False)
@@ -0,0 +1,332 @@
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+
+from admin import Appointment
+from doctor import Doctor
+from patient import Patient
+
+
+MAGIC = b'HMSSNAP\0'
+VERSION = 1
+
+# magic, version, next patient / doctor / appointment ID, number of sections
+HEADER = struct.Struct('<8sIIIII')
+# tag, byte offset, record count
+SECTION = struct.Struct('<4sQQ')
+
+# string table: (count + 1) end offsets into the UTF-8 blob that follows them
+STRING_OFFSET = struct.Struct('<Q')
+# id, first name, surname, speciality, experience (names are string table indexes)
+DOCTOR = struct.Struct('<IIIIi')
+# id, first name, surname, age, mobile, postcode, doctor name, doctor id (-1: none),
+# first symptom, symptom count
+PATIENT = struct.Struct('<IIIiIIIiII')
+# string index of each symptom; patients point at a run of these
+SYMPTOM = struct.Struct('<I')
+# id, doctor id, patient id, start, end (seconds since EPOCH)
+APPOINTMENT = struct.Struct('<IIIqq')
+# last journal record the snapshot includes (see journal.py); optional section
+META = struct.Struct('<Q')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class SnapshotError(Exception):
+    """Raised when a file is not a snapshot this version can read."""
+
+
+def _seconds(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+class _Section:
+    """Fixed-size records of one kind, sorted by ID, read straight from the map."""
+
+    def __init__(self, buf, record, offset, count):
+        self.buf = buf
+        self.record = record
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def fields(self, index):
+        return self.record.unpack_from(self.buf, self.offset + index * self.record.size)
+
+    def record_id(self, index):
+        # every record starts with its ID
+        return SYMPTOM.unpack_from(self.buf, self.offset + index * self.record.size)[0]
+
+    def find(self, record_id):
+        """Index of the record with `record_id`, or None (binary search, nothing decoded)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record_id(middle) < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.record_id(low) == record_id:
+            return low
+        return None
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    Records are sorted by ID and decoded only when asked for.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self.__file.close()
+            raise SnapshotError(f"{path} is empty")
+        buf = self.__map
+        if len(buf) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"{path} is not a snapshot")
+        magic, version, next_patient, next_doctor, next_appointment, sections = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"{path} is not a snapshot")
+        if version != VERSION:
+            self.close()
+            raise SnapshotError(f"{path} has snapshot version {version}, expected {VERSION}")
+        self.next_ids = {'patient': next_patient, 'doctor': next_doctor, 'appointment': next_appointment}
+
+        directory = {}
+        for i in range(sections):
+            tag, offset, count = SECTION.unpack_from(buf, HEADER.size + i * SECTION.size)
+            directory[tag] = (offset, count)
+        try:
+            self.__strings_at, self.__string_count = directory[b'STRS']
+            self.doctors = _Section(buf, DOCTOR, *directory[b'DOCS'])
+            self.patients = _Section(buf, PATIENT, *directory[b'PATS'])
+            self.discharged = _Section(buf, PATIENT, *directory[b'DISC'])
+            self.__symptoms_at, self.__symptom_count = directory[b'SYMS']
+            self.appointments = _Section(buf, APPOINTMENT, *directory[b'APPT'])
+        except KeyError as e:
+            self.close()
+            raise SnapshotError(f"{path} is missing section {e}")
+        self.journal_seq = META.unpack_from(buf, directory[b'META'][0])[0] if b'META' in directory else 0
+        self.__blob_at = self.__strings_at + (self.__string_count + 1) * STRING_OFFSET.size
+        self.__strings = {}
+
+    def close(self):
+        if not self.__map.closed:
+            self.__map.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- decoding ----------
+
+    def string(self, index):
+        text = self.__strings.get(index)
+        if text is None:
+            at = self.__strings_at + index * STRING_OFFSET.size
+            start = STRING_OFFSET.unpack_from(self.__map, at)[0]
+            end = STRING_OFFSET.unpack_from(self.__map, at + STRING_OFFSET.size)[0]
+            text = self.__strings[index] = str(self.__map[self.__blob_at + start:self.__blob_at + end], 'utf-8')
+        return text
+
+    def doctor(self, index):
+        """(doctor ID, Doctor) for the doctor at `index`."""
+        doctor_id, first_name, surname, speciality, experience = self.doctors.fields(index)
+        s = self.string
+        return doctor_id, Doctor(s(first_name), s(surname), s(speciality), experience)
+
+    def patient(self, index, discharged=False):
+        """(patient ID, Patient, doctor ID or None) for the patient at `index`."""
+        section = self.discharged if discharged else self.patients
+        (patient_id, first_name, surname, age, mobile, postcode, doctor_name, doctor_id,
+         first_symptom, symptom_count) = section.fields(index)
+        s = self.string
+        patient = Patient(s(first_name), s(surname), age, s(mobile), s(postcode))
+        doctor_name = s(doctor_name)
+        if doctor_name != 'None':
+            patient.link(doctor_name)
+        if symptom_count:
+            at = self.__symptoms_at + first_symptom * SYMPTOM.size
+            for symptom in struct.unpack_from(f'<{symptom_count}I', self.__map, at):
+                patient.add_symptom(s(symptom))
+        return patient_id, patient, (doctor_id if doctor_id >= 0 else None)
+
+    def appointment(self, index):
+        """(appointment ID, doctor ID, patient ID, start, end) for the appointment at `index`."""
+        appointment_id, doctor_id, patient_id, start, end = self.appointments.fields(index)
+        return (appointment_id, doctor_id, patient_id,
+                EPOCH + timedelta(seconds=start), EPOCH + timedelta(seconds=end))
+
+    def find_patient(self, patient_id):
+        """The active or discharged Patient with `patient_id`, or None."""
+        for discharged, section in ((False, self.patients), (True, self.discharged)):
+            index = section.find(patient_id)
+            if index is not None:
+                return self.patient(index, discharged)[1]
+        return None
+
+    # ---------- loading a store ----------
+
+    def all_strings(self):
+        """Decode the whole string table in one pass (used when loading everything)."""
+        count = self.__string_count
+        ends = struct.unpack_from(f'<{count + 1}Q', self.__map, self.__strings_at)
+        blob = self.__map[self.__blob_at:self.__blob_at + ends[-1]]
+        return [blob[ends[i]:ends[i + 1]].decode('utf-8') for i in range(count)]
+
+    def _records(self, section):
+        """Unpack every record of a section; far cheaper than one fields() call each."""
+        size = section.record.size
+        data = self.__map[section.offset:section.offset + section.count * size]
+        return section.record.iter_unpack(data)
+
+    def load(self, store):
+        """Fill `store` with every record in the snapshot, keeping their IDs."""
+        strings = self.all_strings()
+        symptoms = struct.unpack_from(f'<{self.__symptom_count}I', self.__map, self.__symptoms_at)
+
+        for doctor_id, first_name, surname, speciality, experience in self._records(self.doctors):
+            store.add_doctor(Doctor(strings[first_name], strings[surname], strings[speciality], experience),
+                             doctor_id)
+
+        for discharged, section in ((False, self.patients), (True, self.discharged)):
+            for (patient_id, first_name, surname, age, mobile, postcode, doctor_name, doctor_id,
+                 first_symptom, count) in self._records(section):
+                patient = Patient(strings[first_name], strings[surname], age, strings[mobile],
+                                  strings[postcode])
+                if strings[doctor_name] != 'None':
+                    patient.link(strings[doctor_name])
+                for symptom in symptoms[first_symptom:first_symptom + count]:
+                    patient.add_symptom(strings[symptom])
+                if discharged:
+                    store.add_discharged(patient, patient_id)
+                else:
+                    store.add_patient(patient, patient_id)
+                    if doctor_id >= 0:
+                        store.assign_patient(patient_id, doctor_id)
+
+        for appointment_id, doctor_id, patient_id, start, end in self._records(self.appointments):
+            doctor = store.get_doctor(doctor_id)
+            patient = store.get_any_patient(patient_id)
+            if doctor is None or patient is None:
+                continue
+            store.add_appointment(Appointment(doctor, patient, EPOCH + timedelta(seconds=start),
+                                              EPOCH + timedelta(seconds=end)),
+                                  appointment_id, check_conflicts=False)
+
+        store.reserve_ids(self.next_ids)
+        store.journal_seq = self.journal_seq
+        # everything just loaded is already on disk
+        store.take_changes()
+
+
+def load_snapshot(store, path):
+    """Load the snapshot at `path` into `store`."""
+    with Snapshot(path) as snapshot:
+        snapshot.load(store)
+
+
+def pack_snapshot(store):
+    """Encode every record in `store` as snapshot bytes.
+
+    Call on the thread that owns the store; writing the result out
+    (write_snapshot) may then happen anywhere.
+    """
+    strings = {}
+
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    doctors = bytearray()
+    for doctor_id in sorted(store.doctor_items()):
+        d = store.get_doctor(doctor_id)
+        doctors += DOCTOR.pack(doctor_id, intern(d.get_first_name()), intern(d.get_surname()),
+                               intern(d.get_speciality()), int(d.get_experience()))
+
+    symptoms = bytearray()
+    symptom_count = 0
+
+    def pack_patients(items):
+        nonlocal symptom_count
+        out = bytearray()
+        for patient_id in sorted(items):
+            p = items[patient_id]
+            doctor = store.doctor_of(p)
+            doctor_id = store.doctor_id(doctor) if doctor is not None else None
+            patient_symptoms = p.get_symptoms()
+            out += PATIENT.pack(patient_id, intern(p.get_first_name()), intern(p.get_surname()),
+                                p.get_age(), intern(p.get_mobile()), intern(p.get_postcode()),
+                                intern(p.get_doctor()), -1 if doctor_id is None else doctor_id,
+                                symptom_count, len(patient_symptoms))
+            for symptom in patient_symptoms:
+                symptoms.extend(SYMPTOM.pack(intern(symptom)))
+            symptom_count += len(patient_symptoms)
+        return out
+
+    patients = pack_patients(store.patient_items())
+    discharged = pack_patients(store.discharged_items())
+
+    appointments = bytearray()
+    for appointment_id in sorted(store.appointment_items()):
+        a = store.get_appointment(appointment_id)
+        appointments += APPOINTMENT.pack(appointment_id, store.doctor_id(a.doctor),
+                                         store.patient_id(a.patient), _seconds(a.start), _seconds(a.end))
+
+    offsets = bytearray(STRING_OFFSET.pack(0))
+    blob = bytearray()
+    for text in strings:  # dicts keep insertion order, i.e. index order
+        blob += text.encode('utf-8')
+        offsets += STRING_OFFSET.pack(len(blob))
+
+    sections = [
+        (b'STRS', offsets + blob, len(strings)),
+        (b'DOCS', doctors, len(store.doctor_items())),
+        (b'PATS', patients, store.patient_count()),
+        (b'DISC', discharged, len(store.discharged_items())),
+        (b'SYMS', symptoms, symptom_count),
+        (b'APPT', appointments, len(store.appointment_items())),
+        (b'META', META.pack(store.journal_seq), 1),
+    ]
+    next_ids = store.next_ids()
+    out = bytearray(HEADER.pack(MAGIC, VERSION, next_ids['patient'], next_ids['doctor'],
+                                next_ids['appointment'], len(sections)))
+    offset = HEADER.size + len(sections) * SECTION.size
+    for tag, data, count in sections:
+        out += SECTION.pack(tag, offset, count)
+        offset += len(data)
+    for _, data, _ in sections:
+        out += data
+    return bytes(out)
+
+
+def write_snapshot(path, data):
+    """Write packed snapshot bytes to `path`.
+
+    The file is written to `path + '.tmp'`, synced and renamed over `path`,
+    so readers only ever see a complete snapshot.
+    """
+    tmp_name = path + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, path)
+
+
+def save_snapshot(store, path):
+    write_snapshot(path, pack_snapshot(store))
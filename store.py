@@ -0,0 +1,856 @@
+import contextlib
+import functools
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from archive import DischargeArchive, month_of
+from autocomplete import DoctorNameIndex, PatientNameIndex
+from database import SQLiteBackend
+from families import FamilyBlocks
+from journal import Journal
+from doctor import Doctor
+from patient import Patient
+from reports import ReportAggregator
+from schedule import Calendar
+from search import PatientSearchIndex
+from sharing import ConflictError, SharedDataset
+from snapshot import SnapshotError, load_snapshot, pack_snapshot, write_snapshot
+from symptoms import SymptomIndex
+
+
+def writes(method):
+    """Run a mutating store method inside the journal's writing() context (see Journal.writing)."""
+    @functools.wraps(method)
+    def write(self, *args, **kwargs):
+        journal = self.journal
+        if journal is None:
+            return method(self, *args, **kwargs)
+        with journal.writing():
+            return method(self, *args, **kwargs)
+    return write
+
+
+class HospitalStore:
+    """In-memory store shared by the console and GUI front ends.
+
+    Records have stable integer IDs and should only be changed through this
+    class once added; changes are announced to listeners (see add_listener).
+    """
+
+    def __init__(self):
+        # optional persistence backend (see database.SQLiteBackend)
+        self.backend = None
+        # optional write-ahead journal (see journal.Journal) and the last
+        # journal record the data in memory reflects
+        self.journal = None
+        self.journal_seq = 0
+        # set when other processes may share the saved files (see sharing.SharedDataset)
+        self.shared = None
+        # (kind, ID) -> journal seq of the record's last change, see transaction()
+        self.versions = {}
+        # where discharged patients go when the store is saved (see archive_discharged)
+        self.archive = None
+        self.__next_ids = {'patient': 1, 'doctor': 1, 'appointment': 1}
+        # kind -> {id: None}; a removed record stays dirty so it gets deleted
+        self.__dirty = {'patient': {}, 'doctor': {}, 'appointment': {}}
+        # backends may collect changes from a worker thread (see gui_main)
+        self.__dirty_lock = threading.Lock()
+        self.__listeners = []
+        self.__batch_depth = 0
+
+        self.__patients: Dict[int, Patient] = {}
+        self.__discharged: Dict[int, Patient] = {}
+        # discharged patient ID -> discharge time (None: unknown), until archived
+        self.__discharged_at: Dict[int, Optional[datetime]] = {}
+        self.__doctors: Dict[int, Doctor] = {}
+        self.__appointments: Dict[int, "Appointment"] = {}
+
+        # record -> ID, keyed by identity (records do not define __eq__)
+        self.__patient_id_of: Dict[Patient, int] = {}
+        # active patient -> the doctor holding them
+        self.__doctor_of: Dict[Patient, Doctor] = {}
+        self.__doctor_id_of: Dict[Doctor, int] = {}
+        self.__appointment_id_of: Dict["Appointment", int] = {}
+
+        # secondary indexes: key -> {id: None}
+        self.__patients_by_name = defaultdict(dict)
+        self.__patients_by_surname = defaultdict(dict)
+        self.__patients_by_postcode = defaultdict(dict)
+        self.__doctors_by_name = defaultdict(dict)
+        self.__doctors_by_speciality = defaultdict(dict)
+        self.__appointments_by_doctor = defaultdict(dict)
+        self.__appointments_by_patient = defaultdict(dict)
+        self.__appointments_by_date = defaultdict(dict)
+        # doctor ID / patient ID -> Calendar of their bookings
+        self.__doctor_calendars = defaultdict(Calendar)
+        self.__patient_calendars = defaultdict(Calendar)
+
+        # symptom code -> patients, behind the illness counts and speciality hints
+        self.symptoms = SymptomIndex(self.doctor_of)
+        self.add_listener(self.symptoms)
+        # report counts maintained on every write
+        self.report = ReportAggregator(self.symptoms)
+        self.add_listener(self.report)
+        # word / typo-tolerant patient search, also maintained on every write
+        self.search_index = PatientSearchIndex()
+        self.add_listener(self.search_index)
+        # sorted name indexes behind the type-ahead boxes
+        self.doctor_names = DoctorNameIndex()
+        self.patient_names = PatientNameIndex()
+        self.add_listener(self.doctor_names)
+        self.add_listener(self.patient_names)
+        # rendered family (surname) blocks, dropped when a member changes
+        self.family_blocks = FamilyBlocks()
+        self.add_listener(self.family_blocks)
+
+    # ---------- listeners ----------
+
+    def add_listener(self, listener) -> None:
+        """Register an object to be told about changes.
+
+        Events (listener method -> arguments):
+            on_doctor_added(doctor_id, doctor)
+            on_doctor_updated(doctor_id, doctor, old_name)
+            on_doctor_removed(doctor_id, doctor, released_patients)
+            on_patient_added(patient_id, patient)
+            on_patient_assigned(patient_id, patient, old_doctor, new_doctor)
+            on_symptom_added(patient_id, patient, symptom)
+            on_patient_discharged(patient_id, patient, old_doctor)
+            on_discharged_added(patient_id, patient)
+            on_appointment_added(appointment_id, appointment)
+            on_batch_started(), on_batch_finished()   around a batch(), see there
+        """
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        self.__listeners.remove(listener)
+
+    def _emit(self, event, *args):
+        for listener in self.__listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(*args)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group many changes into one.
+
+        The changes are journalled under a single lock (see Journal.writing)
+        and still announced one by one, but between on_batch_started and
+        on_batch_finished a listener may collect them and do its own work
+        (redrawing a table, say) once at the end. Batches nest.
+        """
+        with self.journal.writing() if self.journal is not None else contextlib.nullcontext():
+            self.__batch_depth += 1
+            if self.__batch_depth == 1:
+                self._emit('on_batch_started')
+            try:
+                yield self
+            finally:
+                self.__batch_depth -= 1
+                if self.__batch_depth == 0:
+                    self._emit('on_batch_finished')
+
+    # ---------- concurrency ----------
+
+    def version(self, kind: str, record_id: int) -> int:
+        """Journal seq of the record's last change since this process started (0 if none)."""
+        return self.versions.get((kind, record_id), 0)
+
+    @contextlib.contextmanager
+    def transaction(self, expect=()):
+        """Make changes that no other process's changes can interleave with.
+
+        Changes journalled by other processes are applied first. `expect`
+        holds (kind, ID, version) for the records the caller read earlier
+        (see version); if any has changed since, ConflictError is raised
+        before anything is done.
+        """
+        with self.journal.writing() if self.journal is not None else contextlib.nullcontext():
+            for kind, record_id, version in expect:
+                if self.version(kind, record_id) != version:
+                    raise ConflictError(kind, record_id)
+            yield self
+
+    # ---------- ID / change tracking helpers ----------
+
+    def _new_id(self, kind, record_id=None):
+        """Allocate the next ID, or reserve an explicit one (used when loading)."""
+        if record_id is None:
+            record_id = self.__next_ids[kind]
+        self.__next_ids[kind] = max(self.__next_ids[kind], record_id + 1)
+        return record_id
+
+    def next_ids(self) -> Dict[str, int]:
+        """The next ID each kind will get (saved by snapshots so IDs are never reused)."""
+        return dict(self.__next_ids)
+
+    def reserve_ids(self, next_ids: Dict[str, int]) -> None:
+        """Make sure no ID below next_ids[kind] is handed out again."""
+        for kind, next_id in next_ids.items():
+            self.__next_ids[kind] = max(self.__next_ids[kind], next_id)
+
+    def _touch(self, kind, record_id):
+        with self.__dirty_lock:
+            self.__dirty[kind][record_id] = None
+
+    def take_changes(self) -> Dict[str, List[int]]:
+        """Return the IDs changed since the last call, per kind, and reset them."""
+        with self.__dirty_lock:
+            changes = {kind: list(ids) for kind, ids in self.__dirty.items()}
+            for ids in self.__dirty.values():
+                ids.clear()
+        return changes
+
+    def restore_changes(self, changes: Dict[str, List[int]]) -> None:
+        """Mark IDs from take_changes() dirty again, e.g. after a failed save."""
+        for kind, ids in changes.items():
+            for record_id in ids:
+                self._touch(kind, record_id)
+
+    def is_discharged(self, patient_id: int) -> bool:
+        return patient_id in self.__discharged
+
+    # ---------- index helpers ----------
+
+    @staticmethod
+    def _index_add(index, key, record_id):
+        index[key][record_id] = None
+
+    @staticmethod
+    def _index_remove(index, key, record_id):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(record_id, None)
+            if not bucket:
+                del index[key]
+
+    # ---------- doctors ----------
+
+    @writes
+    def add_doctor(self, doctor: Doctor, doctor_id: Optional[int] = None) -> int:
+        doctor_id = self._new_id('doctor', doctor_id)
+        self._touch('doctor', doctor_id)
+        self.__doctors[doctor_id] = doctor
+        self.__doctor_id_of[doctor] = doctor_id
+        self._index_doctor(doctor_id, doctor)
+        self._emit('on_doctor_added', doctor_id, doctor)
+        return doctor_id
+
+    def _index_doctor(self, doctor_id, doctor):
+        self._index_add(self.__doctors_by_name, doctor.full_name(), doctor_id)
+        self._index_add(self.__doctors_by_speciality, doctor.get_speciality(), doctor_id)
+
+    def _unindex_doctor(self, doctor_id, doctor):
+        self._index_remove(self.__doctors_by_name, doctor.full_name(), doctor_id)
+        self._index_remove(self.__doctors_by_speciality, doctor.get_speciality(), doctor_id)
+
+    @writes
+    def update_doctor(self, doctor_id: int, first_name=None, surname=None,
+                      speciality=None, experience=None) -> Optional[Doctor]:
+        """Change a doctor's details and re-index them. Fields left as None are kept."""
+        doctor = self.__doctors.get(doctor_id)
+        if doctor is None:
+            return None
+        old_name = doctor.full_name()
+        self._touch('doctor', doctor_id)
+        self._unindex_doctor(doctor_id, doctor)
+        if first_name is not None:
+            doctor.set_first_name(first_name)
+        if surname is not None:
+            doctor.set_surname(surname)
+        if speciality is not None:
+            doctor.set_speciality(speciality)
+        if experience is not None:
+            doctor.set_experience(experience)
+        self._index_doctor(doctor_id, doctor)
+        if doctor.full_name() != old_name:
+            for patient in doctor.get_patients():
+                patient.link(doctor.full_name())
+                self._touch('patient', self.__patient_id_of[patient])
+        self._emit('on_doctor_updated', doctor_id, doctor, old_name)
+        return doctor
+
+    @writes
+    def remove_doctor(self, doctor_id: int) -> Optional[Doctor]:
+        doctor = self.__doctors.pop(doctor_id, None)
+        if doctor is None:
+            return None
+        del self.__doctor_id_of[doctor]
+        self._touch('doctor', doctor_id)
+        self._unindex_doctor(doctor_id, doctor)
+        released = doctor.get_patients()
+        for patient in released:
+            self._touch('patient', self.__patient_id_of[patient])
+        for patient in released:
+            del self.__doctor_of[patient]
+        doctor.release_patients()
+        self._emit('on_doctor_removed', doctor_id, doctor, released)
+        return doctor
+
+    def get_doctor(self, doctor_id: int) -> Optional[Doctor]:
+        return self.__doctors.get(doctor_id)
+
+    def doctor_id(self, doctor: Doctor) -> Optional[int]:
+        return self.__doctor_id_of.get(doctor)
+
+    def doctors(self) -> List[Doctor]:
+        return list(self.__doctors.values())
+
+    def doctor_items(self):
+        """Mapping of doctor ID -> Doctor, in the order they were added."""
+        return self.__doctors
+
+    def find_doctors_by_name(self, full_name: str) -> List[Doctor]:
+        return [self.__doctors[i] for i in self.__doctors_by_name.get(full_name, ())]
+
+    def find_doctor_by_name(self, full_name: str) -> Optional[Doctor]:
+        for doctor_id in self.__doctors_by_name.get(full_name, ()):
+            return self.__doctors[doctor_id]
+        return None
+
+    def complete_doctors(self, prefix: str, k: int = 10) -> List[int]:
+        """IDs of up to `k` doctors whose first name or surname starts with `prefix`."""
+        return self.doctor_names.complete(prefix, k)
+
+    def find_doctors_by_speciality(self, speciality: str) -> List[Doctor]:
+        return [self.__doctors[i] for i in self.__doctors_by_speciality.get(speciality, ())]
+
+    # ---------- patients ----------
+
+    @writes
+    def add_patient(self, patient: Patient, patient_id: Optional[int] = None) -> int:
+        """Add a patient, linking them to the doctor named in their record if one exists."""
+        patient_id = self._new_id('patient', patient_id)
+        self._touch('patient', patient_id)
+        self.__patients[patient_id] = patient
+        self.__patient_id_of[patient] = patient_id
+        self._index_patient(patient_id, patient)
+
+        doctor = self.find_doctor_by_name(patient.get_doctor())
+        if doctor is not None:
+            doctor.add_patient(patient)
+            self.__doctor_of[patient] = doctor
+        self._emit('on_patient_added', patient_id, patient)
+        return patient_id
+
+    @writes
+    def load_patients(self, patients) -> None:
+        for patient in patients:
+            self.add_patient(patient)
+
+    def _index_patient(self, patient_id, patient):
+        self._index_add(self.__patients_by_name, patient.full_name(), patient_id)
+        self._index_add(self.__patients_by_surname, patient.get_surname(), patient_id)
+        self._index_add(self.__patients_by_postcode, patient.get_postcode(), patient_id)
+
+    def _unindex_patient(self, patient_id, patient):
+        self._index_remove(self.__patients_by_name, patient.full_name(), patient_id)
+        self._index_remove(self.__patients_by_surname, patient.get_surname(), patient_id)
+        self._index_remove(self.__patients_by_postcode, patient.get_postcode(), patient_id)
+
+    def get_patient(self, patient_id: int) -> Optional[Patient]:
+        return self.__patients.get(patient_id)
+
+    def get_any_patient(self, patient_id: int) -> Optional[Patient]:
+        """Look a patient up in the active roster or among the discharged."""
+        patient = self.__patients.get(patient_id)
+        return patient if patient is not None else self.__discharged.get(patient_id)
+
+    def patient_id(self, patient: Patient) -> Optional[int]:
+        return self.__patient_id_of.get(patient)
+
+    def doctor_of(self, patient: Patient) -> Optional[Doctor]:
+        """The doctor the patient is assigned to, if any."""
+        return self.__doctor_of.get(patient)
+
+    def patients(self) -> List[Patient]:
+        return list(self.__patients.values())
+
+    def patient_items(self):
+        """Mapping of patient ID -> Patient for the active roster."""
+        return self.__patients
+
+    def patient_count(self) -> int:
+        return len(self.__patients)
+
+    def find_patients_by_name(self, full_name: str) -> List[Patient]:
+        return [self.__patients[i] for i in self.__patients_by_name.get(full_name, ())]
+
+    def find_patients_by_surname(self, surname: str) -> List[Patient]:
+        return [self.__patients[i] for i in self.__patients_by_surname.get(surname, ())]
+
+    def find_patients_by_postcode(self, postcode: str) -> List[Patient]:
+        return [self.__patients[i] for i in self.__patients_by_postcode.get(postcode, ())]
+
+    def complete_patients(self, prefix: str, k: int = 10) -> List[int]:
+        """IDs of up to `k` active patients whose first name or surname starts with `prefix`."""
+        return self.patient_names.complete(prefix, k)
+
+    def search_patients(self, query: str, limit: int = 50) -> List[int]:
+        """IDs of active patients matching `query` (names, mobile, postcode, symptoms; typos allowed)."""
+        return self.search_index.search(query, limit)
+
+    def find_patients_by_symptom(self, symptom: str) -> List[Patient]:
+        """Active patients reporting `symptom`, whatever its case or spacing."""
+        return [self.__patients[i] for i in self.symptoms.patients_with(symptom)]
+
+    def matching_specialities(self, patient_id: int) -> Dict[str, int]:
+        """Specialities whose doctors look after patients with this patient's symptoms, best match first."""
+        patient = self.__patients.get(patient_id)
+        if patient is None:
+            return {}
+        return self.symptoms.specialities_for(patient.get_symptoms())
+
+    def families(self) -> Dict[str, List[Patient]]:
+        """Active patients grouped by surname."""
+        return {surname: [self.__patients[i] for i in ids]
+                for surname, ids in self.__patients_by_surname.items()}
+
+    def family_surnames(self) -> List[str]:
+        """Surnames of the active patients, in the order they first appeared."""
+        return list(self.__patients_by_surname)
+
+    def family_size(self, surname: str) -> int:
+        return len(self.__patients_by_surname.get(surname, ()))
+
+    def family_block(self, surname: str, render):
+        """render(surname, members) for one family, memoised until one of them changes."""
+        block = self.family_blocks.get(surname, render)
+        if block is None:
+            block = render(surname, self.find_patients_by_surname(surname))
+            self.family_blocks.put(surname, render, block)
+        return block
+
+    @writes
+    def assign_patient(self, patient_id: int, doctor_id: int) -> bool:
+        """Assign (or relocate) a patient to a doctor."""
+        patient = self.__patients.get(patient_id)
+        doctor = self.__doctors.get(doctor_id)
+        if patient is None or doctor is None:
+            return False
+        old_doctor = self.__doctor_of.get(patient)
+        if old_doctor is not doctor:
+            if old_doctor is not None:
+                old_doctor.remove_patient(patient)
+            doctor.add_patient(patient)
+            self.__doctor_of[patient] = doctor
+        patient.link(doctor.full_name())
+        self._touch('patient', patient_id)
+        self._emit('on_patient_assigned', patient_id, patient, old_doctor, doctor)
+        return True
+
+    def assign_patients(self, patient_ids, doctor_id: int) -> List[int]:
+        """Assign (or relocate) many patients to one doctor as a single batch; returns the IDs moved."""
+        if doctor_id not in self.__doctors:
+            return []
+        with self.batch():
+            return [i for i in patient_ids if self.assign_patient(i, doctor_id)]
+
+    @writes
+    def add_symptom(self, patient_id: int, symptom: str) -> bool:
+        patient = self.__patients.get(patient_id)
+        if patient is None:
+            return False
+        patient.add_symptom(symptom)
+        self._touch('patient', patient_id)
+        self._emit('on_symptom_added', patient_id, patient, symptom)
+        return True
+
+    @writes
+    def discharge_patient(self, patient_id: int, at: Optional[datetime] = None) -> Optional[Patient]:
+        """Move a patient from the active roster to the discharged list (discharged `at`, default now)."""
+        patient = self.__patients.pop(patient_id, None)
+        if patient is None:
+            return None
+        self._touch('patient', patient_id)
+        self._unindex_patient(patient_id, patient)
+        doctor = self.__doctor_of.pop(patient, None)
+        if doctor is not None:
+            doctor.remove_patient(patient)
+        self.__discharged[patient_id] = patient
+        self.__discharged_at[patient_id] = at or datetime.now().replace(microsecond=0)
+        self._emit('on_patient_discharged', patient_id, patient, doctor)
+        return patient
+
+    def discharge_patients(self, patient_ids) -> List[int]:
+        """Discharge many patients as a single batch; returns the IDs that were discharged."""
+        with self.batch():
+            return [i for i in patient_ids if self.discharge_patient(i) is not None]
+
+    @writes
+    def add_discharged(self, patient: Patient, patient_id: Optional[int] = None) -> int:
+        """Add an already discharged patient (used when loading saved data)."""
+        patient_id = self._new_id('patient', patient_id)
+        self._touch('patient', patient_id)
+        self.__discharged[patient_id] = patient
+        self.__patient_id_of[patient] = patient_id
+        self._emit('on_discharged_added', patient_id, patient)
+        return patient_id
+
+    def discharged_at(self, patient_id: int) -> Optional[datetime]:
+        """When a patient not yet archived was discharged (None if not known)."""
+        return self.__discharged_at.get(patient_id)
+
+    def unarchived_items(self):
+        """Mapping of patient ID -> Patient for the discharged patients not archived yet, oldest first."""
+        return {i: self.__discharged[i] for i in self.__discharged_at}
+
+    def queue_for_archive(self, patient_ids) -> None:
+        """Archive these discharged patients at the next save, discharge time unknown.
+
+        For patients loaded from data saved before there was an archive.
+        """
+        for patient_id in patient_ids:
+            if patient_id in self.__discharged:
+                self.__discharged_at.setdefault(patient_id, None)
+
+    def archive_discharged(self) -> int:
+        """Write the discharged patients not archived yet to the archive; returns how many.
+
+        Other processes' discharges are picked up first, and any already
+        archived by one of them (up to archive.last_seq()) are skipped. The
+        patients then leave memory, and so the snapshot, unless appointments
+        still refer to them. Partitions of past months are compressed.
+        """
+        if self.archive is None:
+            return 0
+        with self.shared.lock if self.shared is not None else contextlib.nullcontext():
+            if self.journal is not None:
+                self.journal.catch_up()
+            rows, journal_seq = self.archive_rows(), self.journal_seq
+            archived = self.write_archive(rows, journal_seq)
+        self.forget_archived(rows)
+        return archived
+
+    def archive_rows(self) -> List[Tuple]:
+        """(patient_id, patient, discharged_at, version) of the discharged patients not archived yet.
+
+        Taken on the thread changing the store, for write_archive() to run on another.
+        """
+        if self.archive is None:
+            return []
+        return [(patient_id, self.__discharged[patient_id], at, self.versions.get(('patient', patient_id), 0))
+                for patient_id, at in self.__discharged_at.items()]
+
+    def write_archive(self, rows, journal_seq=None) -> int:
+        """Append archive_rows() to the archive and compress past months; returns how many were written.
+
+        Only reads the rows and the archive's files, so it may run on a worker
+        thread. Rows another process archived already are skipped.
+        """
+        archive = self.archive
+        if archive is None:
+            return 0
+        with self.shared.lock if self.shared is not None else contextlib.nullcontext():
+            written = []
+            if rows:
+                last_seq = archive.last_seq()
+                written = [(patient_id, patient, at) for patient_id, patient, at, seq in rows
+                           if not seq or seq > last_seq]
+                archive.append(written, journal_seq if self.journal is not None else None)
+            archive.compress_old()
+        return len(written)
+
+    def forget_archived(self, rows) -> None:
+        """Drop the patients of written archive_rows() from memory, unless appointments still refer to them."""
+        for patient_id, patient, _, _ in rows:
+            if patient_id not in self.__discharged_at:
+                continue  # forgotten already
+            del self.__discharged_at[patient_id]
+            if not self.__appointments_by_patient.get(patient_id):
+                del self.__patient_id_of[self.__discharged.pop(patient_id)]
+
+    def discharges_per_month(self, since: Optional[str] = None, until: Optional[str] = None,
+                             archived: Optional[Dict] = None) -> Dict:
+        """"YYYY-MM" (None: unknown) -> patients discharged that month, archived or not.
+
+        Only the archive partitions for since..until are read. A caller that
+        has read the archive's counts elsewhere (off the thread changing the
+        store) passes them as `archived`.
+        """
+        counts = {}
+        last_seq = 0
+        if self.archive is not None:
+            counts = dict(archived) if archived is not None else self.archive.discharges_per_month(since, until)
+            last_seq = self.archive.last_seq()
+        for patient_id, at in self.__discharged_at.items():
+            seq = self.versions.get(('patient', patient_id), 0)
+            if seq and seq <= last_seq:
+                continue  # archived by another process already
+            month = month_of(at) if at is not None else None
+            if month is None or ((since is None or month >= since) and (until is None or month <= until)):
+                counts[month] = counts.get(month, 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: item[0] or '9999'))
+
+    def discharged(self) -> List[Patient]:
+        return list(self.__discharged.values())
+
+    def discharged_items(self):
+        """Mapping of patient ID -> Patient for discharged patients."""
+        return self.__discharged
+
+    # ---------- appointments ----------
+
+    def find_conflict(self, doctor, patient, start, end):
+        """Return an existing appointment that clashes with a new booking, or None.
+
+        Checks both the doctor's and the patient's calendar in O(log n).
+        """
+        doctor_id = self.__doctor_id_of.get(doctor)
+        patient_id = self.__patient_id_of.get(patient)
+        for calendars, key in ((self.__doctor_calendars, doctor_id), (self.__patient_calendars, patient_id)):
+            calendar = calendars.get(key)
+            if calendar is not None:
+                clash = calendar.conflict(start, end)
+                if clash is not None:
+                    return self.__appointments[clash]
+        return None
+
+    @writes
+    def add_appointment(self, appointment, appointment_id: Optional[int] = None,
+                        check_conflicts=True) -> Optional[int]:
+        """Book an appointment. Returns its ID, or None if it clashes with an existing one."""
+        if check_conflicts and self.find_conflict(appointment.doctor, appointment.patient,
+                                                  appointment.start, appointment.end):
+            return None
+        appointment_id = self._new_id('appointment', appointment_id)
+        self._touch('appointment', appointment_id)
+        self.__appointments[appointment_id] = appointment
+        self.__appointment_id_of[appointment] = appointment_id
+        appointment.doctor.add_appointment(appointment)
+
+        doctor_id = self.__doctor_id_of.get(appointment.doctor)
+        patient_id = self.__patient_id_of.get(appointment.patient)
+        self._index_add(self.__appointments_by_doctor, doctor_id, appointment_id)
+        self._index_add(self.__appointments_by_patient, patient_id, appointment_id)
+        self._index_add(self.__appointments_by_date, appointment.date, appointment_id)
+        self.__doctor_calendars[doctor_id].add(appointment.start, appointment.end, appointment_id)
+        self.__patient_calendars[patient_id].add(appointment.start, appointment.end, appointment_id)
+        self._emit('on_appointment_added', appointment_id, appointment)
+        return appointment_id
+
+    def doctor_schedule(self, doctor_id: int, day) -> list:
+        """The doctor's appointments on `day`, in time order."""
+        calendar = self.__doctor_calendars.get(doctor_id)
+        if calendar is None:
+            return []
+        return [self.__appointments[i] for _, _, i in calendar.on_day(day)]
+
+    def doctor_appointments_between(self, doctor_id: int, start, end) -> list:
+        calendar = self.__doctor_calendars.get(doctor_id)
+        if calendar is None:
+            return []
+        return [self.__appointments[i] for _, _, i in calendar.between(start, end)]
+
+    def free_slots(self, doctor_id: int, day, length=None) -> list:
+        """(start, end) gaps in the doctor's working day at least `length` long."""
+        calendar = self.__doctor_calendars.get(doctor_id) or Calendar()
+        if length is None:
+            return calendar.free_slots(day)
+        return calendar.free_slots(day, length)
+
+    def appointment_id(self, appointment) -> Optional[int]:
+        return self.__appointment_id_of.get(appointment)
+
+    def get_appointment(self, appointment_id: int):
+        return self.__appointments.get(appointment_id)
+
+    def appointments(self) -> list:
+        return list(self.__appointments.values())
+
+    def appointment_items(self):
+        """Mapping of appointment ID -> Appointment."""
+        return self.__appointments
+
+    def appointments_for_doctor(self, doctor_id: int) -> list:
+        return [self.__appointments[i] for i in self.__appointments_by_doctor.get(doctor_id, ())]
+
+    def appointments_for_patient(self, patient_id: int) -> list:
+        return [self.__appointments[i] for i in self.__appointments_by_patient.get(patient_id, ())]
+
+    def appointments_on(self, date) -> list:
+        return [self.__appointments[i] for i in self.__appointments_by_date.get(date, ())]
+
+
+def default_doctors() -> List[Doctor]:
+    return [
+        Doctor('John', 'Smith', 'Internal Med.'),
+        Doctor('Jone', 'Smith', 'Pediatrics'),
+        Doctor('Jone', 'Carlos', 'Cardiology')
+    ]
+
+
+def default_patients() -> List[Patient]:
+    return [
+        Patient('Sara', 'Smith', 20, '07012345678', 'B1 234'),
+        Patient('Mike', 'Jones', 37, '07555551234', 'L2 2AB'),
+        Patient('Daivd', 'Smith', 15, '07123456789', 'C1 ABC')
+    ]
+
+
+def snapshot_path(filename='patients.txt') -> str:
+    """The binary snapshot kept next to a patients file (patients.txt -> patients.snap)."""
+    return os.path.splitext(filename)[0] + '.snap'
+
+
+def snapshot_is_current(filename='patients.txt') -> bool:
+    """True when the snapshot exists and the patients file was not edited after it."""
+    try:
+        snap_time = os.path.getmtime(snapshot_path(filename))
+    except OSError:
+        return False
+    try:
+        return snap_time >= os.path.getmtime(filename)
+    except OSError:
+        return True
+
+
+def open_default_store(admin, filename='patients.txt', database=None):
+    """Build the store used by both front ends, without reading the patients file.
+
+    Returns (store, patients_pending). The data comes from `database` or
+    the snapshot next to `filename` when there is one; otherwise
+    patients_pending is True and the caller streams the patients in (see
+    load_default_patients).
+    """
+    store = HospitalStore()
+    backend = SQLiteBackend(database) if database else None
+    store.backend = backend
+    if backend is not None and not backend.is_empty():
+        backend.load(store)
+        return store, False
+
+    if backend is None:
+        # other processes may be using the same files; register before reading them
+        store.shared = SharedDataset(filename)
+        store.shared.attach()
+        store.archive = DischargeArchive(archive_path(filename))
+    if backend is None and snapshot_is_current(filename):
+        try:
+            load_snapshot(store, snapshot_path(filename))
+            if not store.archive.exists():
+                # saved before there was an archive: the snapshot holds every discharged patient
+                store.queue_for_archive(list(store.discharged_items()))
+            return store, False
+        except (SnapshotError, OSError) as e:
+            print(f"Could not read snapshot, loading {filename} instead: {e}")
+            shared, archive, store = store.shared, store.archive, HospitalStore()
+            store.shared, store.archive = shared, archive
+
+    for doctor in default_doctors():
+        store.add_doctor(doctor)
+    return store, True
+
+
+def load_default_patients(admin, store, filename='patients.txt'):
+    """Stream the patients saved in `filename` into the store."""
+    try:
+        store.load_patients(admin.iter_patients_from_file(filename))
+        print("Data Loaded.")
+    except FileNotFoundError:
+        print("No save file found.")
+    except Exception as e:
+        print(f"Error loading file: {e}")
+    ensure_patients(store)
+
+
+def ensure_patients(store):
+    """Fall back to the demo patients when nothing was loaded."""
+    if not store.patient_count():
+        store.load_patients(default_patients())
+
+
+def archive_path(filename='patients.txt') -> str:
+    return os.path.splitext(filename)[0] + '.archive'
+
+
+def journal_path(filename='patients.txt') -> str:
+    return os.path.splitext(filename)[0] + '.journal'
+
+
+def attach_journal(store, filename='patients.txt'):
+    """Replay the journal next to `filename` and start journalling every change.
+
+    Call once the saved data is fully loaded. A store with a SQLite backend
+    keeps its journal next to the database instead.
+    """
+    if store.journal is not None:
+        return
+    if store.backend is not None:
+        filename = store.backend.path
+    journal = Journal(journal_path(filename), store)
+    try:
+        applied = journal.replay()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error replaying journal: {e}")
+        applied = 0
+    if applied:
+        print(f"Recovered {applied} unsaved changes from the journal.")
+    store.journal = journal
+    store.add_listener(journal)
+
+
+def checkpoint_store(admin, store, filename='patients.txt'):
+    """Sync the journal, pick up other processes' changes, and fold a long journal into the base files."""
+    if store.journal is None:
+        return
+    store.journal.sync()
+    store.journal.catch_up()
+    if store.journal.needs_compaction():
+        save_store(admin, store, filename)
+
+
+def create_default_store(admin, filename='patients.txt', database=None) -> HospitalStore:
+    """Build the store used by both front ends, with the patients fully loaded.
+
+    See open_default_store for where the data comes from.
+    """
+    store, patients_pending = open_default_store(admin, filename, database)
+    if patients_pending:
+        load_default_patients(admin, store, filename)
+    attach_journal(store, filename)
+    return store
+
+
+def save_store(admin, store, filename='patients.txt', patients=None, snapshot=None, journal_seq=None):
+    """Save the store through its SQLite backend if it has one, else to `filename`.
+
+    Without a backend the snapshot is rewritten. Either way the journal
+    records now saved are dropped.
+    `patients`, `snapshot` and `journal_seq` are copies taken together by a
+    caller saving from a worker thread, after write_archive() and forget_archived().
+    """
+    if store.backend is None:
+        shared = store.shared
+        # one process saves at a time; the others' changes are merged in first
+        with shared.lock if shared is not None else contextlib.nullcontext():
+            if snapshot is None:
+                if store.journal is not None:
+                    store.journal.catch_up()
+                store.archive_discharged()
+                patients, snapshot, journal_seq = store.patients(), pack_snapshot(store), store.journal_seq
+            admin.save_patients_to_file(patients, filename)
+            try:
+                write_snapshot(snapshot_path(filename), snapshot)
+            except OSError as e:
+                print(f"Error saving snapshot: {e}")
+                return
+            if store.journal is not None:
+                # records another running process may still need are only dropped once it has gone
+                with shared.alone() if shared is not None else contextlib.nullcontext(True) as alone:
+                    if alone:
+                        store.journal.truncate(journal_seq)
+        return
+    try:
+        store.backend.save(store)
+        print("Data Saved Successfully.")
+    except sqlite3.Error as e:
+        print(f"Error saving database: {e}")
+        return
+    if store.journal is not None:
+        store.journal.truncate(store.backend.journal_seq)
@@ -0,0 +1,221 @@
+import threading
+
+
+def normalize_symptom(text):
+    """The key a symptom is counted under: case and spacing ignored ("Chest  Pain" -> "chest pain")."""
+    return ' '.join(text.split()).casefold()
+
+
+class SymptomVocabulary:
+    """Every distinct symptom seen, each with a small integer code."""
+
+    def __init__(self):
+        self.__codes = {}     # normalized symptom -> code
+        self.__names = []     # code -> display name
+        self.__spelling = {}  # exact text -> code, to skip normalizing text seen before
+
+    def code(self, symptom, add=True):
+        """The symptom's code; a new one if `add` is set and it is unseen, else None."""
+        code = self.__spelling.get(symptom)
+        if code is not None:
+            return code
+        key = normalize_symptom(symptom)
+        code = self.__codes.get(key)
+        if code is None:
+            if not add or not key:
+                return None
+            code = self.__codes[key] = len(self.__names)
+            self.__names.append(' '.join(symptom.split()))
+        if add:
+            self.__spelling[symptom] = code
+        return code
+
+    def name(self, code):
+        return self.__names[code]
+
+    def __len__(self):
+        return len(self.__names)
+
+
+class SymptomIndex:
+    """Symptom code -> the active patients reporting it, and the specialities looking after them."""
+
+    def __init__(self, doctor_of):
+        """
+        Args:
+            doctor_of (callable): patient -> their doctor or None (HospitalStore.doctor_of)
+        """
+        self.__doctor_of = doctor_of
+        self.__lock = threading.Lock()
+        self.vocabulary = SymptomVocabulary()
+        # code -> {patient ID: None}
+        self.__postings = {}
+        # code -> {speciality: active patients with the symptom under a doctor of that speciality}
+        self.__specialities = {}
+        # doctor -> speciality counted for their patients, to notice a change of speciality
+        self.__speciality_of = {}
+
+    # ---------- store listener ----------
+
+    def on_doctor_added(self, doctor_id, doctor):
+        with self.__lock:
+            speciality = self.__speciality_of[doctor] = doctor.get_speciality()
+            for patient in doctor.get_patients():
+                self._count_speciality(patient, speciality, 1)
+
+    def on_doctor_updated(self, doctor_id, doctor, old_name):
+        speciality = doctor.get_speciality()
+        with self.__lock:
+            old = self.__speciality_of.get(doctor)
+            if speciality == old:
+                return
+            self.__speciality_of[doctor] = speciality
+            for patient in doctor.get_patients():
+                self._count_speciality(patient, old, -1)
+                self._count_speciality(patient, speciality, 1)
+
+    def on_doctor_removed(self, doctor_id, doctor, released_patients):
+        with self.__lock:
+            speciality = self.__speciality_of.pop(doctor, None)
+            for patient in released_patients:
+                self._count_speciality(patient, speciality, -1)
+
+    def on_patient_added(self, patient_id, patient):
+        with self.__lock:
+            codes = self.codes(patient.get_symptoms())
+            for code in codes:
+                posting = self.__postings.get(code)
+                if posting is None:
+                    posting = self.__postings[code] = {}
+                posting[patient_id] = None
+            self._count_codes(codes, self.__doctor_of(patient), 1)
+
+    def on_patient_assigned(self, patient_id, patient, old_doctor, new_doctor):
+        if old_doctor is new_doctor:
+            return
+        with self.__lock:
+            codes = self.codes(patient.get_symptoms())
+            self._count_codes(codes, old_doctor, -1)
+            self._count_codes(codes, new_doctor, 1)
+
+    def on_symptom_added(self, patient_id, patient, symptom):
+        with self.__lock:
+            code = self.vocabulary.code(symptom)
+            if code is None:
+                return
+            posting = self.__postings.get(code)
+            if posting is None:
+                posting = self.__postings[code] = {}
+            elif patient_id in posting:
+                return  # the patient already had it under another spelling
+            posting[patient_id] = None
+            self._count_codes((code,), self.__doctor_of(patient), 1)
+
+    def on_patient_discharged(self, patient_id, patient, old_doctor):
+        with self.__lock:
+            codes = self.codes(patient.get_symptoms())
+            for code in codes:
+                posting = self.__postings[code]
+                del posting[patient_id]
+                if not posting:
+                    del self.__postings[code]
+            self._count_codes(codes, old_doctor, -1)
+
+    def codes(self, symptoms):
+        """The distinct codes of a list of symptoms (new ones are added to the vocabulary)."""
+        code = self.vocabulary.code
+        return {c for c in map(code, symptoms) if c is not None}
+
+    def _count_speciality(self, patient, speciality, delta):
+        self._count_codes(self.codes(patient.get_symptoms()), None, delta, speciality)
+
+    def _count_codes(self, codes, doctor, delta, speciality=None):
+        if speciality is None:
+            if doctor is None:
+                return
+            speciality = self.__speciality_of.get(doctor, doctor.get_speciality())
+        for code in codes:
+            counts = self.__specialities.setdefault(code, {})
+            count = counts.get(speciality, 0) + delta
+            if count:
+                counts[speciality] = count
+            else:
+                counts.pop(speciality, None)
+
+    # ---------- queries ----------
+
+    def patients_with(self, symptom):
+        """IDs of the active patients reporting `symptom` (any spelling), in the order they got it."""
+        code = self.vocabulary.code(symptom, add=False)
+        return list(self.__postings.get(code, ()))
+
+    def patients_with_all(self, symptoms):
+        """IDs of the active patients reporting every one of `symptoms`."""
+        postings = []
+        for symptom in symptoms:
+            posting = self.__postings.get(self.vocabulary.code(symptom, add=False))
+            if not posting:
+                return []
+            postings.append(posting)
+        if not postings:
+            return []
+        postings.sort(key=len)
+        # walk the rarest symptom's patients, probing the others
+        return [i for i in postings[0] if all(i in p for p in postings[1:])]
+
+    def illness_count(self):
+        """Symptom -> number of active patients reporting it, in the order symptoms were first seen."""
+        name = self.vocabulary.name
+        with self.__lock:
+            return {name(code): len(posting) for code, posting in sorted(self.__postings.items())}
+
+    def co_occurrence(self, symptom):
+        """Other symptom -> number of active patients reporting both it and `symptom`, most common first."""
+        posting = self.__postings.get(self.vocabulary.code(symptom, add=False))
+        if not posting:
+            return {}
+        counts = {}
+        for code, other in self.__postings.items():
+            if other is not posting:
+                small, large = (posting, other) if len(posting) <= len(other) else (other, posting)
+                both = sum(1 for i in small if i in large)
+                if both:
+                    counts[self.vocabulary.name(code)] = both
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def specialities_for(self, symptoms):
+        """Speciality -> how many patients with these symptoms its doctors look after, most first.
+
+        A patient with several of the symptoms counts once per symptom, so
+        specialities matching more of them come first.
+        """
+        totals = {}
+        with self.__lock:
+            for code in self.codes(symptoms):
+                for speciality, count in self.__specialities.get(code, {}).items():
+                    totals[speciality] = totals.get(speciality, 0) + count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    # ---------- consistency check ----------
+
+    def check(self, store):
+        """Compare the index with a rescan of the store; returns human-readable differences."""
+        postings = {}
+        specialities = {}
+        for patient_id, patient in store.patient_items().items():
+            doctor = store.doctor_of(patient)
+            for code in self.codes(patient.get_symptoms()):
+                postings.setdefault(code, set()).add(patient_id)
+                if doctor is not None:
+                    counts = specialities.setdefault(code, {})
+                    counts[doctor.get_speciality()] = counts.get(doctor.get_speciality(), 0) + 1
+        problems = []
+        name = self.vocabulary.name
+        for code in set(postings) | set(self.__postings):
+            if postings.get(code, set()) != set(self.__postings.get(code, ())):
+                problems.append(f"patients with {name(code)!r} differ from a rescan")
+            if specialities.get(code, {}) != self.__specialities.get(code, {}):
+                problems.append(f"specialities for {name(code)!r}: maintained "
+                                f"{self.__specialities.get(code, {})}, rescan {specialities.get(code, {})}")
+        return problems
+
@@ -0,0 +1,232 @@
+from tkinter import ttk
+
+from instrumentation import add_rows, instrument_methods
+
+
+class VirtualTable(ttk.Frame):
+    """A Treeview that only holds the rows currently on screen."""
+
+    def __init__(self, master, columns, row_values, headings=None, keys=(),
+                 selectmode="browse", height=20):
+        super().__init__(master)
+        self.row_values = row_values
+        self.tree = ttk.Treeview(self, columns=columns, show="headings",
+                                 selectmode=selectmode, height=height)
+        for c in columns:
+            self.tree.heading(c, text=(headings or {}).get(c, c.capitalize()))
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", expand=True, fill="both")
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.__keys = list(keys)
+        self.__top = 0
+        self.__rows = height
+        self.__selected = set()
+        self.__focus = None
+        self.__rendering = False
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-1, "pages"))
+        self.tree.bind("<Next>", lambda e: self.scroll(1, "pages"))
+        self.tree.bind("<Up>", lambda e: self._move_focus(-1))
+        self.tree.bind("<Down>", lambda e: self._move_focus(1))
+        self._render()
+
+    # ---------- data ----------
+
+    def set_keys(self, keys):
+        """Replace every row (e.g. after a reload); only the visible window is rebuilt."""
+        self.__keys = list(keys)
+        present = set(self.__keys)
+        self.__selected &= present
+        if self.__focus not in present:
+            self.__focus = None
+        self._render()
+
+    def keys(self):
+        return self.__keys
+
+    def insert_row(self, key, index=None):
+        if index is None:
+            index = len(self.__keys)
+        self.__keys.insert(index, key)
+        if index < self.__top + self.__rows:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def update_row(self, key):
+        iid = str(key)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.row_values(key))
+
+    def delete_row(self, key):
+        try:
+            index = self.__keys.index(key)
+        except ValueError:
+            return
+        del self.__keys[index]
+        self.__selected.discard(key)
+        if self.__focus == key:
+            self.__focus = None
+        if index < self.__top + self.__rows:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def delete_rows(self, keys):
+        """Delete many rows with one pass over the keys and one redraw."""
+        gone = set(keys)
+        if not gone:
+            return
+        self.__keys = [k for k in self.__keys if k not in gone]
+        self.__selected -= gone
+        if self.__focus in gone:
+            self.__focus = None
+        self._render()
+
+    # ---------- selection ----------
+
+    def focus_key(self):
+        """Key of the focused row, or None."""
+        return self.__focus
+
+    def selected_keys(self):
+        """Keys of every selected row, including ones scrolled out of view."""
+        return [k for k in self.__keys if k in self.__selected] if self.__selected else []
+
+    def _on_select(self, event=None):
+        if self.__rendering:
+            return
+        visible = set(self.__keys[self.__top:self.__top + self.__rows])
+        key_of = {str(k): k for k in visible}
+        if self.tree.cget("selectmode") == "browse" and self.tree.selection():
+            self.__selected = set()
+        else:
+            self.__selected = {k for k in self.__selected if k not in visible}
+        self.__selected.update(key_of[iid] for iid in self.tree.selection() if iid in key_of)
+        focus = self.tree.focus()
+        if focus in key_of:
+            self.__focus = key_of[focus]
+
+    def _move_focus(self, delta):
+        """Keyboard navigation that can move past the rendered window."""
+        if not self.__keys:
+            return "break"
+        try:
+            index = self.__keys.index(self.__focus) + delta
+        except ValueError:
+            index = self.__top
+        index = max(0, min(index, len(self.__keys) - 1))
+        self.__focus = self.__keys[index]
+        if self.tree.cget("selectmode") == "browse":
+            self.__selected = {self.__focus}
+        if index < self.__top:
+            self.__top = index
+        elif index >= self.__top + self.__rows:
+            self.__top = index - self.__rows + 1
+        self._render()
+        self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"
+
+    # ---------- scrolling / rendering ----------
+
+    def scroll(self, amount, what="units"):
+        step = self.__rows if what == "pages" else 1
+        self._scroll_to(self.__top + amount * step)
+        return "break"
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, len(self.__keys) - self.__rows))
+        if top != self.__top:
+            self.__top = top
+            self._render()
+
+    def _on_scrollbar(self, action, amount, what=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.__keys)))
+        else:
+            self.scroll(int(amount), what)
+
+    def _on_resize(self, event):
+        style = ttk.Style()
+        row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        rows = max(1, (event.height - 25) // row_height)
+        if rows != self.__rows:
+            self.__rows = rows
+            self._render()
+
+    def _render(self):
+        self.__top = max(0, min(self.__top, len(self.__keys) - self.__rows))
+        window = self.__keys[self.__top:self.__top + self.__rows]
+        self.__rendering = True
+        try:
+            children = self.tree.get_children()
+            if children:
+                self.tree.delete(*children)
+            for key in window:
+                self.tree.insert("", "end", iid=str(key), values=self.row_values(key))
+            add_rows(len(window))
+            shown = [str(k) for k in window if k in self.__selected]
+            self.tree.selection_set(shown)
+            if self.__focus is not None and self.tree.exists(str(self.__focus)):
+                self.tree.focus(str(self.__focus))
+        finally:
+            # selection_set queues a <<TreeviewSelect>>; ignore it once it arrives
+            self.after_idle(self._end_render)
+        self._update_scrollbar()
+
+    def _end_render(self):
+        self.__rendering = False
+
+    def _update_scrollbar(self):
+        total = len(self.__keys)
+        if total <= self.__rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.__top / total, min(1.0, (self.__top + self.__rows) / total))
+
+
+instrument_methods(VirtualTable, 'table', names=('set_keys', '_render'))
+
+
+class AutocompleteBox(ttk.Combobox):
+    """Editable combobox offering the top matches for what has been typed."""
+
+    def __init__(self, master, complete, label, k=10, delay_ms=150, **kwargs):
+        super().__init__(master, postcommand=self._refresh, **kwargs)
+        self.complete = complete
+        self.label = label
+        self.k = k
+        self.delay_ms = delay_ms
+        self.__ids = {}  # dropdown label -> ID
+        self.__job = None
+        self.bind("<KeyRelease>", self._on_key)
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self.__job is not None:
+            self.after_cancel(self.__job)
+        self.__job = self.after(self.delay_ms, self._refresh)
+
+    def _refresh(self):
+        self.__job = None
+        text = self.get()
+        if text in self.__ids:
+            return  # an entry was picked; keep the list it came from
+        ids = self.complete(text, self.k)
+        self.__ids = {self.label(i): i for i in ids}
+        self["values"] = list(self.__ids)
+
+    def selected_id(self):
+        """ID of the picked entry, or of the only match for the typed text, else None."""
+        text = self.get()
+        if text not in self.__ids:
+            ids = self.complete(text, 2)
+            return ids[0] if len(ids) == 1 else None
+        return self.__ids[text]
@@ -0,0 +1,106 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it notices it has been cancelled."""
+
+
+class Task:
+    """Handle for one piece of background work."""
+
+    def __init__(self, name, runner):
+        self.name = name
+        self.__runner = runner
+        self.__cancelled = threading.Event()
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def cancelled(self):
+        return self.__cancelled.is_set()
+
+    def check_cancelled(self):
+        """Call from the worker at safe points; stops the task if it was cancelled."""
+        if self.__cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+    def progress(self, done, total=None, message=''):
+        """Report progress from the worker; delivered to on_progress on the Tk thread."""
+        self.__runner.post(self, 'progress', (done, total, message))
+
+    def send(self, value):
+        """Send an intermediate result (e.g. a batch of records) to on_partial on the Tk thread."""
+        self.__runner.post(self, 'partial', value)
+
+
+class BackgroundRunner:
+    """Runs slow work on a small thread pool, off the Tk main thread."""
+
+    def __init__(self, root, max_workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hms-worker')
+        self.__messages = queue.Queue()
+        self.__callbacks = {}
+        self.__active = []
+        self.root.after(self.poll_ms, self._drain)
+
+    def submit(self, name, fn, *args, on_done=None, on_error=None, on_progress=None,
+               on_partial=None, on_cancel=None):
+        task = Task(name, self)
+        self.__callbacks[task] = {'done': on_done, 'error': on_error, 'progress': on_progress,
+                                  'partial': on_partial, 'cancelled': on_cancel}
+        self.__active.append(task)
+        self.__pool.submit(self._run, task, fn, args)
+        return task
+
+    def active_tasks(self):
+        return list(self.__active)
+
+    def cancel_all(self):
+        for task in self.__active:
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.__pool.shutdown(wait=False)
+
+    def post(self, task, kind, value):
+        self.__messages.put((task, kind, value))
+
+    def _run(self, task, fn, args):
+        try:
+            result = fn(task, *args)
+        except TaskCancelled:
+            self.post(task, 'cancelled', None)
+        except Exception as e:
+            self.post(task, 'error', e)
+        else:
+            self.post(task, 'cancelled' if task.cancelled() else 'done', result)
+
+    def _drain(self):
+        try:
+            while True:
+                try:
+                    task, kind, value = self.__messages.get_nowait()
+                except queue.Empty:
+                    break
+                callbacks = self.__callbacks.get(task)
+                if callbacks is None:
+                    continue
+                if kind in ('done', 'error', 'cancelled'):
+                    del self.__callbacks[task]
+                    self.__active.remove(task)
+                callback = callbacks[kind]
+                if callback is None:
+                    continue
+                if kind == 'cancelled':
+                    callback()
+                elif kind == 'progress':
+                    callback(*value)
+                else:
+                    callback(value)
+        finally:
+            self.root.after(self.poll_ms, self._drain)